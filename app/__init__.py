@@ -1,6 +1,8 @@
+import click
 from flask import Flask
 from flask_login import LoginManager, login_required
-from app.database import db
+from app.database import db, engine_options, read_database_url, server_url
+from app import routing
 from app.models import User
 import os
 import logging
@@ -11,7 +13,9 @@ login_manager.login_message = 'Please log in to access this page.'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    # Served from a short-lived in-process cache (USER_CACHE_TTL) without a SELECT when possible
+    from app.user_cache import get_user
+    return get_user(user_id)
 
 def create_app():
     app = Flask(__name__)
@@ -49,8 +53,15 @@ def create_app():
         # SQLite URLs: absolute paths need 4 slashes (sqlite:////path)
         # The path already starts with /, so sqlite:/// + /path = sqlite:////path
         db_url = f'sqlite:///{db_path}'
+    else:
+        db_url = server_url(db_url)
     
     app.config['SQLALCHEMY_DATABASE_URI'] = db_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(db_url)
+    # GET requests read from a read-only pool or replica when configured (see app/routing.py)
+    read_url = read_database_url(db_url)
+    if read_url:
+        app.config['SQLALCHEMY_BINDS'] = {routing.READ_BIND: dict(engine_options(read_url), url=read_url)}
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', 'static/uploads')
     
@@ -64,6 +75,26 @@ def create_app():
     db.init_app(app)
     login_manager.init_app(app)
     
+    # SQLite switches to WAL when GET requests read from a read-only pool (DB_READ_ONLY)
+    routing.init_app(app)
+    
+    # Multi-household mode (TENANT_MODE): bind each request to its household's database before
+    # any other request hook runs
+    from app import tenancy
+    tenancy.init_app(app)
+    
+    # Request timing, SQL query counts and slow-query log (SLOW_QUERY_MS); served at /metrics
+    from app import instrumentation
+    instrumentation.init_app(app)
+    
+    # gzip/brotli for JSON/HTML above COMPRESS_MIN_SIZE, ETag + 304 for GET JSON
+    from app import compression
+    compression.init_app(app)
+    
+    # New SQLite databases get auto_vacuum=INCREMENTAL so the maintenance job can shrink them
+    from app import maintenance
+    maintenance.init_app(app)
+    
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.users import users_bp
@@ -78,6 +109,8 @@ def create_app():
     from app.routes.shopping_lists import shopping_lists_bp
     from app.routes.store import store_bp
     from app.routes.notifications import notifications_bp
+    from app.routes.analytics import analytics_bp
+    from app.routes.archive import archive_bp
     
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(users_bp, url_prefix='/users')
@@ -92,6 +125,8 @@ def create_app():
     app.register_blueprint(shopping_lists_bp, url_prefix='/shopping-lists')
     app.register_blueprint(store_bp, url_prefix='/store')
     app.register_blueprint(notifications_bp, url_prefix='/notifications')
+    app.register_blueprint(analytics_bp, url_prefix='/analytics')
+    app.register_blueprint(archive_bp, url_prefix='/archive')
     
     # Serve uploaded files with cache control
     @app.route('/static/uploads/<path:filename>')
@@ -122,9 +157,77 @@ def create_app():
         from flask import render_template
         return render_template('dashboard.html')
     
+    def households():
+        # Each household in turn (printing its name) in multi-household mode; one pass with None otherwise
+        for tenant in tenancy.each(app):
+            if tenant:
+                print(f"Household {tenant}:")
+            yield tenant
+    
+    @app.cli.command('create-tenant')
+    @click.argument('name')
+    def create_tenant(name):
+        """Create and initialize a household database (multi-household mode, see app/tenancy.py)."""
+        try:
+            path = tenancy.create(app, name)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        print(f"Created household {name} at {path}")
+    
+    @app.cli.command('rebuild-analytics')
+    def rebuild_analytics():
+        """Recompute leaderboard totals from chore history, projects and cash-outs."""
+        from app.analytics import rebuild
+        for _ in households():
+            with db.session.get_bind().begin() as conn:
+                rebuild(conn)
+            print("Rebuilt user_daily_stats")
+    
+    @app.cli.command('sweep-overdue')
+    def sweep_overdue():
+        """Flag overdue chore entries, update accrued penalties and notify assignees once."""
+        from app import jobs
+        for tenant in households():
+            print(jobs.run_job(app, 'overdue-sweep', tenant))
+    
+    @app.cli.command('archive-old-rows')
+    def archive_old_rows():
+        """Move rows past their retention period into archived_rows."""
+        from app import jobs
+        for tenant in households():
+            for kind, moved in jobs.run_job(app, 'archive-old-rows', tenant).items():
+                print(f"{kind}: archived {moved} row(s)")
+    
+    @app.cli.command('maintain-db')
+    @click.option('--no-backup', is_flag=True, help='Only compact, do not take a backup first.')
+    @click.option('--full-vacuum', is_flag=True,
+                  help='Run a full VACUUM first (one-time switch to incremental auto_vacuum; blocks writers).')
+    @click.option('--dest', default=None, help='Backup directory (default BACKUP_DIR or backups/ next to the database).')
+    def maintain_db(no_backup, full_vacuum, dest):
+        """Back up the database online, then incremental VACUUM and ANALYZE."""
+        for _ in households():
+            _print_maintenance(maintenance.run(backup_first=not no_backup, full=full_vacuum, dest_dir=dest))
+    
     @app.route('/health')
     def health():
         """Health check for HA / load balancers."""
         return '', 200
     
     return app
+
+
+def _print_maintenance(report):
+    backup = report.get('backup') or {}
+    if 'path' in backup:
+        print(f"Backup: {backup['path']} ({backup['bytes'] / 1e6:.1f} MB, {backup['steps']} steps, "
+              f"{backup['seconds']:.2f}s); removed {len(backup['removed'])} old backup(s)")
+    elif backup:
+        print(f"Backup skipped: {backup['skipped']}")
+    compact = report['compact']
+    if 'bytes_before' in compact:
+        print(f"Vacuum ({compact['auto_vacuum']}): {compact['bytes_before'] / 1e6:.1f} MB -> "
+              f"{compact['bytes_after'] / 1e6:.1f} MB, reclaimed {compact['bytes_reclaimed'] / 1e6:.1f} MB "
+              f"in {compact['vacuum_seconds']:.2f}s")
+        if compact['auto_vacuum'] != 'incremental':
+            print("Incremental vacuum is off for this database; run once with --full-vacuum to enable it")
+    print(f"Analyze: {compact['analyze_seconds']:.2f}s")
@@ -0,0 +1,53 @@
+"""Single-process startup: python -m app
+
+Creates the Flask app once, initializes a missing database, applies pending migrations (a
+single-row schema_version check when the database is current; every household's database in
+multi-household mode, see app/tenancy.py) and serves on HOST:PORT
+(default 0.0.0.0:5050), with the periodic jobs in app/jobs.py running in a background thread
+(JOBS_ENABLED=0 turns them off). Replaces running init_db, migrate_database.py and flask run as three
+separate processes that each build the app.
+"""
+import os
+import sys
+
+from sqlalchemy import inspect
+
+from app import create_app, jobs, tenancy
+from app.database import init_db
+from app.migrations import SCHEMA_VERSION, MigrationError, current_version, migrate
+from app.models import db
+
+
+def prepare_database(app, tenant=None):
+    """Create and/or migrate the database (or one household's). Returns quickly when it is already current."""
+    with app.app_context():
+        if tenant:
+            tenancy.activate(tenant)
+        if current_version() >= SCHEMA_VERSION:
+            return
+        if not inspect(db.session.get_bind()).has_table('users'):
+            print(f"Initializing database{f' for {tenant}' if tenant else ''}...")
+            init_db(app, tenant)
+        try:
+            migrate()
+        except MigrationError:
+            # The failed migration was rolled back; refuse to serve a schema the code does not match
+            app.logger.exception('Migration failed')
+            sys.exit(1)
+
+
+def main():
+    app = create_app()
+    for tenant in (tenancy.names() if tenancy.enabled() else [None]):
+        prepare_database(app, tenant)
+    if os.environ.get('JOBS_ENABLED', '1') != '0':
+        jobs.start(app)
+    host = os.environ.get('HOST', '0.0.0.0')
+    port = int(os.environ.get('PORT', 5050))
+    print(f"Starting Flask on {host}:{port}...")
+    sys.stdout.flush()
+    app.run(host=host, port=port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
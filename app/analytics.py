@@ -0,0 +1,91 @@
+"""Per-user earnings aggregates behind the leaderboard and analytics API.
+
+Every place that pays or withholds tokens calls record() in the same transaction, which adds to
+that user's row in user_daily_stats with a single UPSERT. Reports then sum at most one row per
+user per day instead of scanning chore_history, projects and cash_out_requests.
+
+rebuild() recomputes the table from those source tables. It runs once when the table is created
+(historical late penalties were never stored, so they start at 0) and can be re-run with
+`flask rebuild-analytics` if the totals ever drift.
+"""
+from datetime import date
+
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import db, UserDailyStats
+
+STAT_COLUMNS = ('chores_completed', 'chore_tokens', 'penalty_tokens', 'projects_completed', 'project_tokens',
+                'cash_outs', 'cash_out_tokens', 'cash_out_dollars')
+
+_REBUILD_SQL = """
+INSERT INTO user_daily_stats (user_id, day, chores_completed, chore_tokens, penalty_tokens, projects_completed,
+                              project_tokens, cash_outs, cash_out_tokens, cash_out_dollars)
+SELECT user_id, day, SUM(chores), SUM(chore_tokens), 0, SUM(projects), SUM(project_tokens),
+       SUM(cash_outs), SUM(cash_out_tokens), SUM(cash_out_dollars)
+FROM (
+    SELECT assigned_user_id AS user_id, completed_date AS day, 1 AS chores, reward AS chore_tokens,
+           0 AS projects, 0 AS project_tokens, 0 AS cash_outs, 0 AS cash_out_tokens, 0 AS cash_out_dollars
+    FROM chore_history WHERE assigned_user_id IN (SELECT id FROM users)
+    UNION ALL
+    SELECT user_id, completed_date, 0, 0, 1, reward, 0, 0, 0
+    FROM projects WHERE completed AND completed_date IS NOT NULL AND user_id IN (SELECT id FROM users)
+    UNION ALL
+    SELECT user_id, date(created_at), 0, 0, 0, 0, 1, tokens, dollar_value
+    FROM cash_out_requests WHERE created_at IS NOT NULL AND user_id IN (SELECT id FROM users)
+) AS events
+GROUP BY user_id, day
+"""
+
+
+def record(user_id, day=None, **deltas):
+    """Add deltas (keyword per STAT_COLUMNS) to user_id's totals for day (default today)."""
+    if user_id is None or not deltas:
+        return
+    unknown = set(deltas) - set(STAT_COLUMNS)
+    if unknown:
+        raise ValueError(f'Unknown stat(s): {", ".join(sorted(unknown))}')
+    values = {c: deltas.get(c, 0) for c in STAT_COLUMNS}
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    stmt = dialect.insert(UserDailyStats.__table__).values(user_id=user_id, day=day or date.today(), **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'day'],
+        set_={c: UserDailyStats.__table__.c[c] + stmt.excluded[c] for c in deltas},
+    )
+    db.session.execute(stmt)
+
+
+def rebuild(conn):
+    """Recompute user_daily_stats from chore_history, projects and cash_out_requests on conn.
+
+    Cash-out requests moved to archived_rows by the retention job are added back in.
+    """
+    conn.execute(text('DELETE FROM user_daily_stats'))
+    conn.execute(text(_REBUILD_SQL))
+    if inspect(conn).has_table('archived_rows'):
+        _add_archived_cash_outs(conn)
+
+
+def _add_archived_cash_outs(conn):
+    from app.retention import archived_rows
+    users = set(conn.execute(text('SELECT id FROM users')).scalars())
+    totals = {}
+    for row in archived_rows(conn, 'cash_out_requests'):
+        if row.get('user_id') not in users or not row.get('created_at'):
+            continue
+        key = (row['user_id'], date.fromisoformat(row['created_at'][:10]))
+        sums = totals.setdefault(key, [0, 0.0, 0.0])
+        sums[0] += 1
+        sums[1] += row.get('tokens') or 0
+        sums[2] += row.get('dollar_value') or 0
+    if not totals:
+        return
+    dialect = postgresql if conn.dialect.name == 'postgresql' else sqlite
+    table = UserDailyStats.__table__
+    for (user_id, day), (count, tokens, dollars) in totals.items():
+        values = dict({c: 0 for c in STAT_COLUMNS}, cash_outs=count, cash_out_tokens=tokens, cash_out_dollars=dollars)
+        stmt = dialect.insert(table).values(user_id=user_id, day=day, **values)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id', 'day'],
+            set_={c: table.c[c] + stmt.excluded[c] for c in ('cash_outs', 'cash_out_tokens', 'cash_out_dollars')},
+        ))
@@ -0,0 +1,369 @@
+"""Async serving mode for the polling-heavy JSON API: python -m app.asgi
+
+Wall tablets poll /chores/api, /users/api, /notifications/api and /events/api all day. Under the
+threaded Flask server every in-flight request holds a thread; here those GET endpoints are async
+handlers on one event loop reading through an async SQLAlchemy engine (aiosqlite for SQLite), so
+hundreds of mostly idle clients cost a socket each rather than a thread. Everything else (pages,
+logins, writes) is the regular Flask app, mounted underneath and run in a thread pool.
+
+Queries and serialization are shared with the Flask routes: each handler runs the route's
+*_payload(session, args) function through AsyncSession.run_sync, so both modes return the same
+JSON, including ?fields= and ?format=columns. Users are authenticated from Flask's signed session
+cookie.
+
+/notifications/api/wait is served natively too: held requests wait on an asyncio future that
+app.notify resolves when a commit in this process (Flask routes or jobs) inserts a notification
+for that user, so they cost neither a thread nor a query while idle.
+
+Long-poll: send the ETag of the last response in If-None-Match together with ?wait=<seconds>
+(at most LONG_POLL_MAX_SECONDS, default 60) and the request is held until the payload changes or
+the wait runs out (then 304). Held requests are re-evaluated every LONG_POLL_INTERVAL seconds
+(default 2) on a shared clock, and concurrent requests for the same URL (and user) share one
+evaluation, so 500 idle tablets on /chores/api cost one query per interval in total.
+
+In multi-household mode (TENANT_MODE, see app/tenancy.py) the native endpoints pick the household
+the way Flask does (host name, /t/<name>/ prefix or the login session) and read through an async
+engine per household, at most TENANT_ENGINES of them, least recently used disposed first. A
+session cookie only counts for the household it was issued in.
+
+Needs the optional packages in requirements-async.txt (starlette, uvicorn, aiosqlite, a2wsgi).
+"""
+import asyncio
+import hashlib
+import math
+import os
+import sys
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+from app import notify, routing, tenancy
+from app.database import sqlite_read_only_url
+from app.models import User
+
+# psycopg 3 serves both the sync and the async engine on PostgreSQL
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+psycopg'}
+
+LONG_POLL_INTERVAL = float(os.environ.get('LONG_POLL_INTERVAL', 2))
+LONG_POLL_MAX_SECONDS = float(os.environ.get('LONG_POLL_MAX_SECONDS', 60))
+
+
+def async_database_url(url):
+    """The async-driver form of a sync SQLAlchemy URL (sqlite -> sqlite+aiosqlite)."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend}')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def _etag(body):
+    return 'W/"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def _flask_session(flask_app, request):
+    """Contents of the signed Flask session cookie ({} when missing or invalid)."""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if not cookie or serializer is None:
+        return {}
+    try:
+        return serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return {}
+
+
+def _session_user_id(session):
+    """User id from Flask-Login's entry in a Flask session, or None."""
+    try:
+        return int(session.get('_user_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _household(flask_app, request):
+    """(household, Flask session, error response) for a native request, as app.tenancy picks them.
+
+    The household is None when tenancy is off. A session issued in another household is ignored.
+    """
+    session = _flask_session(flask_app, request)
+    if not tenancy.enabled():
+        return None, session, None
+    if tenancy.MODE == 'host':
+        name = tenancy.host_household(request.headers.get('host', ''))
+    else:
+        name = request.path_params.get('household') or session.get('tenant')
+    if not tenancy.exists(name):
+        return None, None, JSONResponse({'error': 'Unknown household'}, status_code=404)
+    return name, session if session.get('tenant') == name else {}, None
+
+
+class _Databases:
+    """Async session factories for the native endpoints: the app's database (or its read-only pool
+    or replica), or one per household in multi-household mode, kept in a bounded LRU."""
+
+    def __init__(self, flask_app):
+        self._flask_app = flask_app
+        self._sessions = OrderedDict()  # household (None without tenancy) -> async_sessionmaker
+        self._disposing = set()
+
+    def _url(self, household):
+        config = self._flask_app.config
+        if household is None:
+            read = (config.get('SQLALCHEMY_BINDS') or {}).get(routing.READ_BIND)
+            return read['url'] if read else config['SQLALCHEMY_DATABASE_URI']
+        url = f'sqlite:///{tenancy.database_path(household)}'
+        return sqlite_read_only_url(url) if routing.reads_enabled(self._flask_app) else url
+
+    def sessions(self, household):
+        found = self._sessions.get(household)
+        if found is not None:
+            self._sessions.move_to_end(household)
+            return found
+        engine = create_async_engine(async_database_url(self._url(household)),
+                                     **self._flask_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        found = self._sessions[household] = async_sessionmaker(engine, expire_on_commit=False)
+        while len(self._sessions) > max(tenancy.MAX_ENGINES, 1):
+            # Sessions still using the engine finish normally; their connections close when returned
+            task = asyncio.ensure_future(self._sessions.popitem(last=False)[1].kw['bind'].dispose())
+            self._disposing.add(task)
+            task.add_done_callback(self._disposing.discard)
+        return found
+
+    async def dispose(self):
+        for maker in self._sessions.values():
+            await maker.kw['bind'].dispose()
+        self._sessions.clear()
+
+
+class _SharedEvaluations:
+    """Coalesces concurrent evaluations of the same key into one database round trip."""
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def run(self, key, compute):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+
+def _json_body(flask_app, payload):
+    # Same bytes as jsonify, so a tablet's ETag stays valid across both serving modes
+    return (flask_app.json.dumps(payload, separators=(',', ':')) + '\n').encode()
+
+
+class _NotificationWakeups:
+    """Resolves per-user futures on the event loop when app.notify publishes from any thread."""
+
+    def __init__(self):
+        self._loop = None
+        self._waiters = {}  # (household, user id) -> set of futures
+
+    def start(self, loop):
+        self._loop = loop
+        notify.add_listener(self._on_commit)
+
+    def stop(self):
+        notify.remove_listener(self._on_commit)
+
+    def _on_commit(self, household, user_ids):
+        self._loop.call_soon_threadsafe(self._wake, household, user_ids)
+
+    def _wake(self, household, user_ids):
+        for user_id in user_ids:
+            for future in self._waiters.pop((household, user_id), ()):
+                if not future.done():
+                    future.set_result(True)
+
+    async def wait(self, household, user_id, seen, timeout):
+        """Like notify.wait(), without blocking a thread."""
+        key = (household, user_id)
+        future = self._loop.create_future()
+        waiters = self._waiters.setdefault(key, set())
+        waiters.add(future)
+        try:
+            if notify.generation(user_id, household) != seen:
+                return True
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters.discard(future)
+            if not waiters and self._waiters.get(key) is waiters:
+                del self._waiters[key]
+
+
+def _wait_endpoint(flask_app, databases, shared, wakeups):
+    """GET /notifications/api/wait, with the same semantics as the Flask route.
+
+    Waiters for the same user and cursor (several tablets logged in as one person) are woken
+    together and share one query.
+    """
+    from app.routes.notifications import notifications_after, wait_args
+
+    async def fetch(sessions, user_id, after):
+        async with sessions() as session:
+            def run(sync_session):
+                if sync_session.get(User, user_id) is None:
+                    return None
+                return notifications_after(sync_session, user_id, after)
+            return await session.run_sync(run)
+
+    async def endpoint(request):
+        household, session, response = _household(flask_app, request)
+        if response is not None:
+            return response
+        user_id = _session_user_id(session)
+        if user_id is None:
+            return JSONResponse({'error': 'Login required'}, status_code=401)
+        after, timeout, error = wait_args(request.query_params)
+        if error:
+            return JSONResponse({'error': error}, status_code=400)
+        sessions = databases.sessions(household)
+        seen = notify.generation(user_id, household)
+        key = ('wait', household, user_id, after)
+        payload = await shared.run(key, lambda: fetch(sessions, user_id, after))
+        if payload is None:
+            return JSONResponse({'error': 'Login required'}, status_code=401)
+        if not payload['items'] and after is not None and timeout > 0:
+            if await wakeups.wait(household, user_id, seen, timeout):
+                payload = await shared.run(key, lambda: fetch(sessions, user_id, after))
+        return Response(_json_body(flask_app, payload), media_type='application/json')
+
+    return endpoint
+
+
+def _json_endpoint(flask_app, databases, shared, build, login=False):
+    """Async GET handler around build(sync_session, args, user_id) -> (payload, error)."""
+
+    async def evaluate(sessions, args, user_id):
+        async with sessions() as session:
+            def run(sync_session):
+                if login and (user_id is None or sync_session.get(User, user_id) is None):
+                    return 401, {'error': 'Login required'}
+                payload, error = build(sync_session, args, user_id)
+                return (400, {'error': error}) if error else (200, payload)
+            status, payload = await session.run_sync(run)
+        return status, _json_body(flask_app, payload)
+
+    async def endpoint(request):
+        household, session, response = _household(flask_app, request)
+        if response is not None:
+            return response
+        user_id = _session_user_id(session) if login else None
+        if login and user_id is None:
+            return JSONResponse({'error': 'Login required'}, status_code=401)
+        sessions = databases.sessions(household)
+        key = (household, request.url.path, str(request.query_params), user_id)
+        args = request.query_params
+        try:
+            wait = float(args.get('wait', 0))
+            if not math.isfinite(wait):
+                raise ValueError(wait)
+            wait = min(max(wait, 0.0), LONG_POLL_MAX_SECONDS)
+        except ValueError:
+            return JSONResponse({'error': 'wait must be a number of seconds'}, status_code=400)
+        known = {tag.strip() for tag in request.headers.get('if-none-match', '').split(',') if tag.strip()}
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            status, body = await shared.run(key, lambda: evaluate(sessions, args, user_id))
+            etag = _etag(body)
+            remaining = deadline - loop.time()
+            if status != 200 or etag not in known or remaining <= 0:
+                break
+            # Sleep to the next tick of a shared clock so waiters on the same URL evaluate together
+            await asyncio.sleep(min(remaining, LONG_POLL_INTERVAL - loop.time() % LONG_POLL_INTERVAL))
+
+        if status == 200 and etag in known:
+            return Response(status_code=304, headers={'ETag': etag})
+        headers = {'ETag': etag} if status == 200 else {}
+        return Response(body, status_code=status, media_type='application/json', headers=headers)
+
+    return endpoint
+
+
+def create_asgi_app(flask_app=None):
+    """ASGI app: async JSON endpoints in front of the Flask app (created if not given)."""
+    from app import create_app
+    from app.routes.chores import chores_payload
+    from app.routes.events import events_payload
+    from app.routes.notifications import notifications_payload
+    from app.routes.users import users_payload
+
+    flask_app = flask_app or create_app()
+    # The native endpoints only read, so they use the read-only pool or replica when there is one
+    databases = _Databases(flask_app)
+    shared = _SharedEvaluations()
+    wakeups = _NotificationWakeups()
+
+    def endpoint(build, login=False):
+        return _json_endpoint(flask_app, databases, shared, build, login)
+
+    native = [
+        Route('/chores/api', endpoint(lambda s, args, _: chores_payload(s, args)), methods=['GET']),
+        Route('/users/api', endpoint(lambda s, args, _: users_payload(s, args)), methods=['GET']),
+        Route('/events/api', endpoint(lambda s, args, _: events_payload(s, args)), methods=['GET']),
+        Route('/notifications/api', endpoint(lambda s, args, user_id: notifications_payload(s, user_id, args),
+                                             login=True), methods=['GET']),
+        Route('/notifications/api/wait', _wait_endpoint(flask_app, databases, shared, wakeups), methods=['GET']),
+    ]
+    routes = list(native)
+    if tenancy.MODE == 'path':
+        # /t/<household>/chores/api etc.; other prefixed paths fall through to Flask below
+        routes += [Route(f'/{tenancy.PATH_PREFIX}/{{household}}{r.path}', r.endpoint, methods=['GET']) for r in native]
+    routes += [
+        # Everything else, and non-GET methods on the paths above, falls through to Flask
+        Mount('/', app=WSGIMiddleware(flask_app, workers=int(os.environ.get('ASGI_WSGI_THREADS', 10)))),
+    ]
+
+    @asynccontextmanager
+    async def lifespan(app):
+        wakeups.start(asyncio.get_running_loop())
+        yield
+        wakeups.stop()
+        await databases.dispose()
+
+    return Starlette(
+        routes=routes,
+        middleware=[Middleware(GZipMiddleware, minimum_size=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)))],
+        lifespan=lifespan,
+    )
+
+
+def main():
+    import uvicorn
+    from app import create_app, jobs, tenancy
+    from app.__main__ import prepare_database
+
+    flask_app = create_app()
+    for tenant in (tenancy.names() if tenancy.enabled() else [None]):
+        prepare_database(flask_app, tenant)
+    if os.environ.get('JOBS_ENABLED', '1') != '0':
+        jobs.start(flask_app)
+    host = os.environ.get('HOST', '0.0.0.0')
+    port = int(os.environ.get('PORT', 5050))
+    print(f"Starting ASGI server on {host}:{port}...")
+    sys.stdout.flush()
+    uvicorn.run(create_asgi_app(flask_app), host=host, port=port,
+                log_level=os.environ.get('LOG_LEVEL', 'info').lower(), access_log=False,
+                # Idle keep-alive sockets are cheap here, so tablets polling every few seconds keep theirs
+                timeout_keep_alive=int(os.environ.get('KEEPALIVE_SECONDS', 75)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Versioned in-process cache of the Chore Store catalog.
+
+The store page and the admin item list serve the same few rows to every visitor, so the
+serialized JSON body of each view is kept per catalog version instead of querying and
+serializing StoreItem on every request. Any commit that inserts, changes or deletes a StoreItem
+(ORM or bulk UPDATE/DELETE) bumps the version, which drops the cached bodies; entries also
+expire after CATALOG_CACHE_TTL seconds (default 300, 0 disables the cache) to pick up changes
+made by other processes. In multi-household mode (app/tenancy.py) bodies are kept per household.
+"""
+import json
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import tenancy
+from app.models import StoreItem
+
+_lock = threading.Lock()
+_version = 0
+_bodies = {}  # (household, view) -> (version, expires_at, body bytes, {item id: item dict})
+_ttl = float(os.environ.get('CATALOG_CACHE_TTL', 300))
+
+
+def _item_dict(item):
+    return {
+        'id': item.id,
+        'title': item.title,
+        'description': item.description or '',
+        'rules': item.rules or '',
+        'cost_tokens': float(item.cost_tokens),
+        'active': item.active,
+        'sort_order': item.sort_order or 0,
+    }
+
+
+def version():
+    with _lock:
+        return _version
+
+
+def _load(view):
+    q = StoreItem.query.filter_by(active=True) if view == 'active' else StoreItem.query
+    items = [_item_dict(i) for i in q.order_by(StoreItem.sort_order, StoreItem.id)]
+    body = json.dumps(items, separators=(',', ':'), sort_keys=True).encode() + b'\n'
+    return body, {i['id']: i for i in items}
+
+
+def get(view):
+    """(body, {item id: item dict}) for 'active' (store page) or 'all' (admins) items, in store order."""
+    if _ttl <= 0:
+        return _load(view)
+    key = (tenancy.current(), view)
+    with _lock:
+        seen = _version
+        entry = _bodies.get(key)
+    if entry and entry[0] == seen and entry[1] > time.monotonic():
+        return entry[2], entry[3]
+    body, items = _load(view)
+    with _lock:
+        # Only cache if no commit invalidated the catalog while this was loading
+        if _version == seen:
+            _bodies[key] = (seen, time.monotonic() + _ttl, body, items)
+    return body, items
+
+
+def invalidate():
+    global _version
+    with _lock:
+        _version += 1
+        _bodies.clear()
+
+
+def _mark(session):
+    session.info['_catalog_stale'] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_item_changes(session, flush_context):
+    if any(isinstance(obj, StoreItem) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        _mark(session)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_item_writes(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert) and \
+            any(m.class_ is StoreItem for m in orm_execute_state.all_mappers):
+        _mark(orm_execute_state.session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    if session.info.pop('_catalog_stale', False):
+        invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop('_catalog_stale', None)
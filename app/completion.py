@@ -0,0 +1,226 @@
+"""Reward and late-penalty engine shared by every chore completion path.
+
+complete_trackers() pays out one or many completed trackers in the caller's transaction: it
+writes a ChoreHistory row, credits the chore's assignee (minus any late penalty), records the
+analytics totals and marks the chore's rooms cleaned. Chores, assignees, room names, rooms and
+the "already rewarded today" check are fetched with one query each for the whole batch, so
+approving hundreds of trackers costs a handful of statements rather than several per tracker.
+
+The late penalty comes from SiteSettings (see PENALTY_SETTINGS):
+    late_penalty_per_day      tokens withheld per day past the due date (default 2)
+    late_penalty_grace_days   days late before the penalty starts (default 0)
+    late_penalty_max_percent  most of a chore's reward a penalty can take, in percent (default 100)
+
+sweep_overdue() runs periodically (app/jobs.py) so lateness is a stored column rather than
+something each dashboard works out per row: it flags open trackers past due_by_datetime as
+is_overdue, keeps their accrued_penalty current and notifies each assignee once about chores
+that just became overdue.
+"""
+from datetime import date, datetime
+
+from app import analytics
+from app.models import db, Chore, ChoreHistory, ChoreTracker, Notification, Room, SiteSettings, room_chores
+
+# Tracker statuses that can still become (or stay) overdue
+OPEN_STATUSES = ('pending', 'pending_approval')
+
+PENALTY_SETTINGS = {
+    'late_penalty_per_day': '2',
+    'late_penalty_grace_days': '0',
+    'late_penalty_max_percent': '100',
+}
+
+
+def _number(value, default):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+class PenaltyPolicy:
+    """How many tokens a late completion loses."""
+
+    def __init__(self, per_day=2.0, grace_days=0.0, max_percent=100.0):
+        self.per_day = per_day
+        self.grace_days = grace_days
+        self.max_percent = max_percent
+
+    @classmethod
+    def load(cls):
+        """The policy currently configured in SiteSettings (one query)."""
+        stored = dict(db.session.query(SiteSettings.key, SiteSettings.value)
+                      .filter(SiteSettings.key.in_(PENALTY_SETTINGS)).all())
+        values = {k: _number(stored.get(k), default) for k, default in PENALTY_SETTINGS.items()}
+        return cls(values['late_penalty_per_day'], values['late_penalty_grace_days'], values['late_penalty_max_percent'])
+
+    @staticmethod
+    def days_late(tracker, today):
+        """Whole days between the tracker's due date (due_by_datetime, else its date) and today."""
+        due = (tracker.due_by_datetime.date() if tracker.due_by_datetime else None) or tracker.date
+        return max(0, (today - due).days) if due else 0
+
+    def penalty(self, reward, days_late):
+        counted = max(0.0, days_late - self.grace_days)
+        return min(self.per_day * counted, reward * self.max_percent / 100.0, reward)
+
+
+def _room_names(chores):
+    """{chore id: room name} from the legacy room_id, else the chore's first linked room (one query)."""
+    legacy = {c.id: c.room_id for c in chores if c.room_id}
+    linked = [c.id for c in chores if not c.room_id]
+    conds = []
+    if legacy:
+        conds.append(Room.id.in_(set(legacy.values())))
+    if linked:
+        conds.append(room_chores.c.chore_id.in_(linked))
+    if not conds:
+        return {}
+    rows = db.session.query(Room.id, Room.name, room_chores.c.chore_id).outerjoin(
+        room_chores, db.and_(room_chores.c.room_id == Room.id, room_chores.c.chore_id.in_(linked or [-1]))
+    ).filter(db.or_(*conds)).order_by(Room.id).all()
+    names = {room_id: name for room_id, name, _ in rows}
+    out = {chore_id: names.get(room_id) for chore_id, room_id in legacy.items()}
+    for room_id, name, chore_id in rows:
+        if chore_id is not None:
+            out.setdefault(chore_id, name)
+    return out
+
+
+def complete_trackers(trackers, today=None, policy=None):
+    """Pay out completed trackers. Returns one result dict per tracker, in order.
+
+    A chore is rewarded at most once per day: trackers whose chore already has a ChoreHistory row
+    for today (or appears earlier in the batch) are returned with rewarded False. The caller
+    sets tracker status and commits.
+    """
+    if not trackers:
+        return []
+    today = today or date.today()
+    policy = policy or PenaltyPolicy.load()
+
+    chore_ids = {t.chore_id for t in trackers}
+    chores = {c.id: c for c in Chore.query.options(db.joinedload(Chore.assigned_user)).filter(Chore.id.in_(chore_ids))}
+    room_names = _room_names(chores.values())
+    done_today = set(db.session.scalars(db.select(ChoreHistory.chore_id).where(
+        ChoreHistory.chore_id.in_(chore_ids), ChoreHistory.completed_date == today)))
+
+    results, per_user = [], {}
+    for tracker in trackers:
+        chore = chores.get(tracker.chore_id)
+        days_late = policy.days_late(tracker, today)
+        result = {'tracker_id': tracker.id, 'chore_id': tracker.chore_id, 'days_late': days_late,
+                  'user_id': chore.assigned_user_id if chore else None,
+                  'reward': 0.0, 'penalty': 0.0, 'rewarded': False}
+        results.append(result)
+        tracker.is_overdue = False
+        tracker.accrued_penalty = 0.0
+        if chore is None or chore.id in done_today:
+            continue
+        done_today.add(chore.id)
+
+        reward = float(chore.reward or 0)
+        penalty = policy.penalty(reward, days_late)
+        earned = reward - penalty
+        room_name = room_names.get(chore.id)
+        user = chore.assigned_user
+        db.session.add(ChoreHistory(
+            chore_id=chore.id,
+            task=chore.task,
+            frequency=chore.frequency,
+            assigned_user_id=chore.assigned_user_id,
+            assigned_user_name=user.name if user else None,
+            room_id=chore.room_id,
+            room_name=room_name,
+            reward=earned,
+            completed_date=today,
+        ))
+        if user:
+            user.bank += earned
+            totals = per_user.setdefault(user.id, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += earned
+            totals[2] += penalty
+        tracker.accrued_penalty = penalty
+        result.update(reward=earned, penalty=penalty, rewarded=True)
+
+    for user_id, (count, earned, penalty) in per_user.items():
+        analytics.record(user_id, today, chores_completed=count, chore_tokens=earned, penalty_tokens=penalty)
+    _mark_rooms_cleaned([r for r in results if r['rewarded']], trackers, chores, today)
+    return results
+
+
+def _mark_rooms_cleaned(rewarded, trackers, chores, today):
+    """A completed chore counts as a regular cleaning of its rooms: bump last_cleaned and reschedule (one query)."""
+    if not rewarded:
+        return
+    chore_ids = {r['chore_id'] for r in rewarded}
+    tracker_ids = {r['tracker_id'] for r in rewarded}
+    direct = {chores[cid].room_id for cid in chore_ids if chores[cid].room_id}
+    direct |= {t.room_id for t in trackers if t.id in tracker_ids and t.room_id}
+    linked = db.select(room_chores.c.room_id).where(room_chores.c.chore_id.in_(chore_ids))
+    rooms = Room.query.options(db.lazyload(Room.chores)).filter(
+        db.or_(Room.id.in_(direct), Room.id.in_(linked)),
+        db.or_(Room.last_cleaned.is_(None), Room.last_cleaned < today),
+    ).all()
+    for room in rooms:
+        room.last_cleaned = today
+        room.schedule(today)
+
+
+def _overdue_message(tasks):
+    if len(tasks) == 1:
+        return f'"{tasks[0]}" is overdue.'
+    shown = ', '.join(f'"{t}"' for t in tasks[:5])
+    more = f' and {len(tasks) - 5} more' if len(tasks) > 5 else ''
+    return f'{len(tasks)} chores are overdue: {shown}{more}.'[:500]
+
+
+def sweep_overdue(now=None, policy=None):
+    """Flag open trackers past due_by_datetime, refresh their accrued penalty and notify assignees.
+
+    Uses one indexed SELECT, one bulk UPDATE and one batched notification INSERT however many
+    trackers are overdue. Only pending trackers that were not flagged yet trigger a notification,
+    grouped into one per assignee. Returns counts; the caller commits.
+    """
+    now = now or datetime.now()
+    policy = policy or PenaltyPolicy.load()
+    t, c = ChoreTracker.__table__.c, Chore.__table__.c
+
+    # Entries that are flagged but no longer open/overdue (completed, rescheduled) are cleared first
+    cleared = db.session.execute(
+        db.update(ChoreTracker.__table__)
+        .where(t.is_overdue.is_(True),
+               db.or_(t.status.notin_(OPEN_STATUSES), t.due_by_datetime.is_(None), t.due_by_datetime >= now))
+        .values(is_overdue=False,
+                accrued_penalty=db.case((t.status.in_(OPEN_STATUSES), 0.0), else_=t.accrued_penalty))
+    ).rowcount
+
+    rows = db.session.execute(
+        db.select(t.id, t.chore_id, t.status, t.date, t.due_by_datetime, t.is_overdue, t.accrued_penalty,
+                  db.func.coalesce(t.assigned_user_id, c.assigned_user_id).label('user_id'), c.reward, c.task)
+        .join(Chore.__table__, c.id == t.chore_id)
+        .where(t.status.in_(OPEN_STATUSES), t.due_by_datetime < now)
+    ).all()
+
+    today = now.date()
+    changes, newly_overdue = [], {}
+    for row in rows:
+        penalty = policy.penalty(float(row.reward or 0), policy.days_late(row, today))
+        if not row.is_overdue or penalty != row.accrued_penalty:
+            changes.append({'id': row.id, 'is_overdue': True, 'accrued_penalty': penalty})
+        if not row.is_overdue and row.status == 'pending' and row.user_id:
+            newly_overdue.setdefault(row.user_id, []).append(row)
+    if changes:
+        db.session.execute(db.update(ChoreTracker), changes)
+
+    notifications = []
+    for user_id, overdue in newly_overdue.items():
+        link = f'/dashboard?highlight_chore={overdue[0].chore_id}' if len(overdue) == 1 else '/dashboard'
+        notifications.append({'user_id': user_id, 'message': _overdue_message([r.task for r in overdue]),
+                              'link': link, 'read': False, 'created_at': datetime.utcnow()})
+    if notifications:
+        db.session.execute(db.insert(Notification), notifications)
+
+    return {'overdue': len(rows), 'updated': len(changes), 'cleared': cleared,
+            'newly_overdue': sum(len(v) for v in newly_overdue.values()), 'notified': len(notifications)}
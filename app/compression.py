@@ -0,0 +1,141 @@
+"""Negotiated gzip/brotli compression for JSON, HTML and text responses.
+
+Responses of a compressible type at least COMPRESS_MIN_SIZE bytes long (default 1024) are
+compressed with the best encoding the client accepts: brotli when the optional `brotli` package
+is installed, otherwise gzip. Streamed responses are compressed chunk by chunk, flushing after
+each chunk so clients still receive data as it is produced.
+
+Successful GET JSON responses get a weak ETag and answer If-None-Match with 304, so polling
+clients skip the body entirely when nothing changed. Compressed bodies of responses carrying an
+ETag are kept in a small LRU cache (COMPRESS_CACHE_BYTES, default 8 MB), so repeat polls of an
+unchanged payload skip recompression.
+"""
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: pip install -r requirements-compression.txt
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'text/html', 'text/plain', 'text/css', 'text/csv',
+    'application/javascript', 'text/javascript', 'image/svg+xml',
+}
+
+_min_size = 1024
+_gzip_level = 6
+_brotli_quality = 5
+
+
+class _CompressedCache:
+    """LRU of compressed bodies keyed by (ETag, encoding), bounded by total bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+cache = _CompressedCache(8 * 1024 * 1024)
+
+
+def _encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=_brotli_quality)
+    comp = zlib.compressobj(_gzip_level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    return comp.compress(data) + comp.flush()
+
+
+def _stream(chunks, encoding):
+    """Compress an iterable of chunks, flushing after each so streaming stays incremental."""
+    if encoding == 'br':
+        comp = brotli.Compressor(quality=_brotli_quality)
+        process, flush, finish = comp.process, comp.flush, comp.finish
+    else:
+        comp = zlib.compressobj(_gzip_level, zlib.DEFLATED, 31)
+        process, flush, finish = comp.compress, (lambda: comp.flush(zlib.Z_SYNC_FLUSH)), comp.flush
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if chunk:
+            yield process(chunk) + flush()
+    yield finish()
+
+
+def _add_etag(response):
+    """Weak ETag + 304 for GET JSON, so unchanged polls send no body at all."""
+    if (request.method == 'GET' and response.status_code == 200 and response.mimetype == 'application/json'
+            and not response.is_streamed and 'ETag' not in response.headers):
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+
+
+def _compress_response(response):
+    _add_etag(response)
+    if (request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(_encodings())
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    data = response.get_data()
+    if len(data) < _min_size:
+        return response
+    etag, _ = response.get_etag()
+    key = (etag, encoding) if etag else None
+    body = cache.get(key) if key else None
+    if body is None:
+        body = compress(data, encoding)
+        if key:
+            cache.put(key, body)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Compress responses after every request (COMPRESS_MIN_SIZE, COMPRESS_LEVEL, COMPRESS_CACHE_BYTES)."""
+    global _min_size, _gzip_level
+    _min_size = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    _gzip_level = int(os.environ.get('COMPRESS_LEVEL', 6))
+    cache.max_bytes = int(os.environ.get('COMPRESS_CACHE_BYTES', 8 * 1024 * 1024))
+    app.after_request(_compress_response)
@@ -1,15 +1,61 @@
 from app.models import db, User
 from app.auth import hash_password
+from urllib.parse import quote
 import os
 
-def init_db():
-    """Initialize the database with tables and default admin user"""
-    from app import create_app
-    app = create_app()
+def server_url(db_url):
+    """Use psycopg 3 (requirements-postgres.txt) for plain PostgreSQL URLs, including the postgres://
+    form hosting providers hand out; postgresql+<driver>:// URLs are left alone"""
+    if db_url.startswith(('postgres://', 'postgresql://')):
+        return 'postgresql+psycopg://' + db_url.split('://', 1)[1]
+    return db_url
+
+def sqlite_read_only_url(db_url):
+    """A sqlite:///path URL opened read-only (mode=ro): its connections can never take the write lock"""
+    path = db_url[len('sqlite:///'):]
+    return f'sqlite:///file:{quote(path)}?mode=ro&uri=true'
+
+def read_database_url(db_url):
+    """URL of the pool GET requests read from (see app.routing), or None to read from db_url too
+    DATABASE_READ_URL: a read replica of a server database
+    DB_READ_ONLY=1: a second, read-only pool on the same SQLite file
+    """
+    if os.environ.get('DATABASE_READ_URL'):
+        return server_url(os.environ['DATABASE_READ_URL'])
+    if os.environ.get('DB_READ_ONLY', '0') == '0':
+        return None
+    if not db_url.startswith('sqlite:///') or db_url.endswith(':memory:'):
+        raise ValueError('DB_READ_ONLY needs a SQLite database file; use DATABASE_READ_URL for a replica')
+    return sqlite_read_only_url(db_url)
+
+def engine_options(db_url):
+    """Connection pool settings for server databases such as PostgreSQL (SQLite keeps SQLAlchemy's defaults)
+    DB_POOL_SIZE / DB_MAX_OVERFLOW: connections kept open / extra ones allowed under load
+    DB_POOL_RECYCLE: seconds before a connection is replaced; DB_POOL_TIMEOUT: seconds to wait for one
+    DB_POOL_PRE_PING=0 skips the liveness check made when a connection is taken from the pool
+    """
+    if db_url.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') != '0',
+    }
+
+def init_db(app=None, tenant=None):
+    """Initialize the database (or a household's, see app.tenancy) with tables and default admin user"""
+    if app is None:
+        from app import create_app
+        app = create_app()
     
     with app.app_context():
+        if tenant:
+            from app import tenancy
+            tenancy.activate(tenant)
         # Create all tables
-        db.create_all()
+        db.metadata.create_all(db.session.get_bind())
         
         # Check if admin user exists
         admin = User.query.filter_by(username='admin').first()
@@ -0,0 +1,207 @@
+"""Request timing, SQL query counting and slow-query logging.
+
+Every request records its duration, endpoint, status, number of SQL statements and time spent
+in SQL. Totals are kept in-process and served in Prometheus text format at /metrics (admins, or
+a scraper presenting METRICS_TOKEN as a bearer token). Statements slower than SLOW_QUERY_MS are
+logged with their SQL.
+"""
+import hmac
+import logging
+import os
+import threading
+import time
+
+from flask import g, has_app_context, request, jsonify, Response
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import tenancy
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) for the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Metrics:
+    """Thread-safe in-process counters, keyed by (method, endpoint, status)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}  # (method, endpoint, status) -> [count, seconds, queries, sql_seconds]
+            self.buckets = {}  # (method, endpoint) -> [count per DURATION_BUCKETS bound]
+            self.slow_queries = 0
+            self.background_queries = 0
+            self.background_sql_seconds = 0.0
+
+    def observe_request(self, method, endpoint, status, seconds, queries, sql_seconds):
+        with self._lock:
+            totals = self.requests.setdefault((method, endpoint, status), [0, 0.0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += queries
+            totals[3] += sql_seconds
+            buckets = self.buckets.setdefault((method, endpoint), [0] * len(DURATION_BUCKETS))
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+
+    def observe_background_query(self, seconds):
+        with self._lock:
+            self.background_queries += 1
+            self.background_sql_seconds += seconds
+
+    def observe_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def snapshot(self):
+        """Copy of the request totals, for callers that diff before/after (e.g. benchmarks)."""
+        with self._lock:
+            return {key: list(val) for key, val in self.requests.items()}
+
+    def render_prometheus(self):
+        def labels(**kw):
+            return '{' + ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in kw.items()) + '}'
+
+        with self._lock:
+            requests = sorted(self.requests.items())
+            buckets = sorted(self.buckets.items())
+            slow, bg_queries, bg_seconds = self.slow_queries, self.background_queries, self.background_sql_seconds
+
+        lines = [
+            '# HELP thechores_http_requests_total HTTP requests handled.',
+            '# TYPE thechores_http_requests_total counter',
+        ]
+        lines += ['thechores_http_requests_total%s %d' % (labels(method=m, endpoint=e, status=s), v[0]) for (m, e, s), v in requests]
+        lines += [
+            '# HELP thechores_sql_queries_total SQL statements executed while handling requests.',
+            '# TYPE thechores_sql_queries_total counter',
+        ]
+        lines += ['thechores_sql_queries_total%s %d' % (labels(method=m, endpoint=e, status=s), v[2]) for (m, e, s), v in requests]
+        lines += [
+            '# HELP thechores_sql_duration_seconds_total Time spent in SQL while handling requests.',
+            '# TYPE thechores_sql_duration_seconds_total counter',
+        ]
+        lines += ['thechores_sql_duration_seconds_total%s %.6f' % (labels(method=m, endpoint=e, status=s), v[3]) for (m, e, s), v in requests]
+
+        lines += [
+            '# HELP thechores_http_request_duration_seconds Request latency.',
+            '# TYPE thechores_http_request_duration_seconds histogram',
+        ]
+        totals = {}
+        for (m, e, _s), v in requests:
+            t = totals.setdefault((m, e), [0, 0.0])
+            t[0] += v[0]
+            t[1] += v[1]
+        for (m, e), counts in buckets:
+            for bound, count in zip(DURATION_BUCKETS, counts):
+                lines.append('thechores_http_request_duration_seconds_bucket%s %d' % (labels(method=m, endpoint=e, le=bound), count))
+            count, seconds = totals.get((m, e), (0, 0.0))
+            lines.append('thechores_http_request_duration_seconds_bucket%s %d' % (labels(method=m, endpoint=e, le='+Inf'), count))
+            lines.append('thechores_http_request_duration_seconds_sum%s %.6f' % (labels(method=m, endpoint=e), seconds))
+            lines.append('thechores_http_request_duration_seconds_count%s %d' % (labels(method=m, endpoint=e), count))
+
+        lines += [
+            '# HELP thechores_sql_slow_queries_total SQL statements slower than SLOW_QUERY_MS.',
+            '# TYPE thechores_sql_slow_queries_total counter',
+            'thechores_sql_slow_queries_total %d' % slow,
+            '# HELP thechores_sql_background_queries_total SQL statements executed outside a request.',
+            '# TYPE thechores_sql_background_queries_total counter',
+            'thechores_sql_background_queries_total %d' % bg_queries,
+            '# HELP thechores_sql_background_duration_seconds_total Time spent in SQL outside a request.',
+            '# TYPE thechores_sql_background_duration_seconds_total counter',
+            'thechores_sql_background_duration_seconds_total %.6f' % bg_seconds,
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+_slow_query_seconds = 0.2
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own execution context: a statement that raises never reaches
+    # after_cursor_execute, and must not leave a start time behind for the next one
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    in_request = has_app_context() and '_perf_start' in g
+    if in_request:
+        g._sql_count += 1
+        g._sql_seconds += elapsed
+    else:
+        metrics.observe_background_query(elapsed)
+    if elapsed >= _slow_query_seconds:
+        metrics.observe_slow_query()
+        where = request.endpoint if in_request else 'background'
+        logger.warning('Slow query (%.1f ms, %s): %s', elapsed * 1000, where, ' '.join(statement.split())[:2000])
+
+
+def _start_request():
+    g._perf_start = time.perf_counter()
+    g._sql_count = 0
+    g._sql_seconds = 0.0
+
+
+def _finish_response(response):
+    g._perf_status = response.status_code
+    if '_perf_start' in g:
+        elapsed = time.perf_counter() - g._perf_start
+        response.headers['Server-Timing'] = 'app;dur=%.1f, db;dur=%.1f;desc="%d queries"' % (
+            elapsed * 1000, g._sql_seconds * 1000, g._sql_count)
+    return response
+
+
+def _record_request(exc):
+    if '_perf_start' not in g:
+        return
+    elapsed = time.perf_counter() - g._perf_start
+    status = g.get('_perf_status', 500)
+    endpoint = request.endpoint or 'unmatched'
+    metrics.observe_request(request.method, endpoint, status, elapsed, g._sql_count, g._sql_seconds)
+    logger.debug('%s %s %s %.1fms %d queries %.1fms sql', request.method, endpoint, status,
+                 elapsed * 1000, g._sql_count, g._sql_seconds * 1000)
+
+
+def metrics_view():
+    """Prometheus exposition of request and SQL metrics. Admin only, or Bearer METRICS_TOKEN.
+
+    In multi-household mode the counters span every household, so only the token is accepted.
+    """
+    token = os.environ.get('METRICS_TOKEN')
+    auth = request.headers.get('Authorization', '')
+    token_ok = bool(token) and auth.startswith('Bearer ') and hmac.compare_digest(auth[7:], token)
+    if not token_ok and tenancy.enabled():
+        return jsonify({'error': 'Bearer METRICS_TOKEN required'}), 401
+    if not token_ok:
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Authentication required'}), 401
+        if not current_user.is_admin:
+            return jsonify({'error': 'Access denied'}), 403
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Install request hooks, SQL listeners and the /metrics endpoint."""
+    global _slow_query_seconds
+    _slow_query_seconds = float(os.environ.get('SLOW_QUERY_MS', 200)) / 1000.0
+    # Listen on the Engine class so every engine (including ones created later) is covered
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_response)
+    app.teardown_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,101 @@
+"""Periodic background jobs, run by a daemon thread in the serving process.
+
+    @job('overdue-sweep', 'OVERDUE_SWEEP_SECONDS', 300)
+    def overdue_sweep():
+        ...
+
+`python -m app` calls start(app) unless JOBS_ENABLED=0. Each job runs in its own app context: the
+session is committed when the job returns and rolled back (and the error logged) if it raises,
+so one failing job never stops the others. In multi-household mode (app/tenancy.py) each job runs
+once per household, each in its own transaction. The interval comes from the named environment
+variable; 0 disables that job. Jobs can also be run once from the command line (see
+create_app's CLI commands), e.g. from cron when several worker processes serve the app and only
+one of them should sweep.
+"""
+import os
+import threading
+import time
+
+from app import tenancy
+from app.models import db
+
+JOBS = []  # (name, interval seconds, function)
+
+
+def job(name, interval_env, default_seconds):
+    """Register a periodic job that runs every $interval_env seconds (default_seconds if unset)."""
+    def register(fn):
+        interval = float(os.environ.get(interval_env, default_seconds))
+        JOBS.append((name, interval, fn))
+        return fn
+    return register
+
+
+def run_job(app, name, tenant=None):
+    """Run one job now, in its own app context and transaction. Returns the job's result.
+
+    tenant runs it against that household's database (see app.tenancy).
+    """
+    fn = next((f for n, _, f in JOBS if n == name), None)
+    if fn is None:
+        raise KeyError(name)
+    with app.app_context():
+        if tenant:
+            tenancy.activate(tenant)
+        try:
+            result = fn()
+            db.session.commit()
+            return result
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def _loop(app, stop):
+    due = {name: time.monotonic() for name, interval, _ in JOBS if interval > 0}
+    while not stop.is_set():
+        now = time.monotonic()
+        for name, interval, _ in JOBS:
+            if name not in due or due[name] > now:
+                continue
+            for tenant in (tenancy.names() if tenancy.enabled() else [None]):
+                label = f'{name} [{tenant}]' if tenant else name
+                started = time.perf_counter()
+                try:
+                    result = run_job(app, name, tenant)
+                    app.logger.info('Job %s finished in %.0f ms: %s', label, (time.perf_counter() - started) * 1000, result)
+                except Exception:
+                    app.logger.exception('Job %s failed', label)
+            due[name] = time.monotonic() + interval
+        if not due:
+            return
+        stop.wait(max(0.0, min(due.values()) - time.monotonic()))
+
+
+def start(app):
+    """Start the scheduler thread. Returns an Event that stops it when set."""
+    stop = threading.Event()
+    threading.Thread(target=_loop, args=(app, stop), name='thechores-jobs', daemon=True).start()
+    return stop
+
+
+@job('overdue-sweep', 'OVERDUE_SWEEP_SECONDS', 300)
+def overdue_sweep():
+    """Flag overdue chore entries, update accrued penalties and notify assignees."""
+    from app.completion import sweep_overdue
+    return sweep_overdue()
+
+
+@job('archive-old-rows', 'ARCHIVE_SECONDS', 86400)
+def archive_old_rows():
+    """Move rows past their retention period (RETENTION_*_DAYS) into archived_rows."""
+    from app.retention import archive
+    return archive()
+
+
+# Registered after archive-old-rows so the pages it frees are reclaimed in the same round
+@job('db-maintenance', 'DB_MAINTENANCE_SECONDS', 86400)
+def db_maintenance():
+    """Back up the database, return free pages to the filesystem and refresh planner statistics."""
+    from app import maintenance
+    return maintenance.run()
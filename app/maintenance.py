@@ -0,0 +1,184 @@
+"""Online backup and compaction for the SQLite database.
+
+backup() copies the live database with SQLite's online backup API, BACKUP_STEP_PAGES pages at
+a time with a short pause in between, so requests keep reading and writing while it runs. A
+write from another connection makes SQLite restart the copy, so the result is always a
+consistent snapshot; if that happens more than BACKUP_MAX_RESTARTS times the rest is copied in
+one step, which holds off writers only for that copy. The copy is written next to the final
+name and renamed once it passes PRAGMA quick_check; the newest BACKUP_KEEP files (default 7) in
+BACKUP_DIR (default backups/ next to the database) are kept.
+
+compact() returns free pages to the filesystem with incremental VACUUM, in chunks of
+VACUUM_STEP_PAGES so it never holds the write lock for long, then refreshes planner statistics
+with a bounded ANALYZE. Incremental vacuum needs auto_vacuum=INCREMENTAL: databases created by
+this version get it automatically (see init_app); older ones need a single full VACUUM, which
+`flask maintain-db --full-vacuum` runs (it blocks writers and needs free disk space equal to the
+database size while it runs).
+
+Both run daily as the 'db-maintenance' job (DB_MAINTENANCE_SECONDS) and on demand with
+`flask maintain-db`. On other databases backup is skipped (use the server's own tools) and
+compact() only runs ANALYZE.
+"""
+import glob
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.models import db
+
+BACKUP_STEP_PAGES = int(os.environ.get('BACKUP_STEP_PAGES', 256))
+BACKUP_STEP_SLEEP = 0.005
+BACKUP_MAX_RESTARTS = 3
+BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', 7))
+VACUUM_STEP_PAGES = int(os.environ.get('VACUUM_STEP_PAGES', 1000))
+ANALYSIS_LIMIT = 1000  # rows sampled per index by ANALYZE
+
+
+def _set_incremental_vacuum(dbapi_connection, connection_record):
+    # Only takes effect on a brand-new database file, so skip the others (including read-only
+    # connections from app.routing, which may not run it)
+    if isinstance(dbapi_connection, sqlite3.Connection) and \
+            dbapi_connection.execute('PRAGMA page_count').fetchone()[0] == 0:
+        dbapi_connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+
+
+def init_app(app):
+    """New SQLite databases are created with auto_vacuum=INCREMENTAL so compact() can shrink them."""
+    if not event.contains(Engine, 'connect', _set_incremental_vacuum):
+        event.listen(Engine, 'connect', _set_incremental_vacuum)
+
+
+def database_path():
+    """Filesystem path of the SQLite database, or None for other databases and :memory:."""
+    url = db.session.get_bind().url
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return None
+    return os.path.abspath(url.database)
+
+
+def _connect(path):
+    # Autocommit, and wait up to 30 s for a writer rather than failing with "database is locked"
+    return sqlite3.connect(path, timeout=30, isolation_level=None)
+
+
+def _pragma(conn, name):
+    return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def backup_dir(path=None):
+    path = path or database_path()
+    return os.environ.get('BACKUP_DIR') or os.path.join(os.path.dirname(path), 'backups')
+
+
+def backup(dest_dir=None, keep=None):
+    """Take a consistent online snapshot. Returns a report dict."""
+    path = database_path()
+    if path is None:
+        return {'skipped': 'backup only supports SQLite databases'}
+    dest_dir = dest_dir or backup_dir(path)
+    keep = BACKUP_KEEP if keep is None else keep
+    os.makedirs(dest_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    final = os.path.join(dest_dir, f'{name}-{datetime.now():%Y%m%d-%H%M%S}.db')
+    partial = final + '.partial'
+
+    started = time.perf_counter()
+    progress = {'steps': 0, 'restarts': 0, 'remaining': None}
+
+    def on_progress(status, remaining, total):
+        progress['steps'] += 1
+        if progress['remaining'] is not None and remaining > progress['remaining']:
+            progress['restarts'] += 1
+            if progress['restarts'] > BACKUP_MAX_RESTARTS:
+                raise _TooManyRestarts()
+        progress['remaining'] = remaining
+
+    src, dst = _connect(path), sqlite3.connect(partial)
+    try:
+        try:
+            src.backup(dst, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP, progress=on_progress)
+        except _TooManyRestarts:
+            # Writes keep invalidating the stepped copy; finish in one step under a single read lock
+            src.backup(dst, pages=-1)
+        check = _pragma(dst, 'quick_check')
+    finally:
+        dst.close()
+        src.close()
+    if check != 'ok':
+        os.remove(partial)
+        raise RuntimeError(f'Backup failed quick_check: {check}')
+    os.replace(partial, final)
+
+    removed = []
+    if keep > 0:
+        # Exact timestamp shape, so alpha's rotation never touches alpha-2's backups in a shared BACKUP_DIR
+        stamp = '[0-9]' * 8 + '-' + '[0-9]' * 6
+        existing = sorted(glob.glob(os.path.join(dest_dir, f'{name}-{stamp}.db')), reverse=True)
+        for old in existing[keep:]:
+            os.remove(old)
+            removed.append(os.path.basename(old))
+    return {'path': final, 'bytes': os.path.getsize(final), 'steps': progress['steps'], 'restarts': progress['restarts'],
+            'seconds': round(time.perf_counter() - started, 3), 'removed': removed}
+
+
+def compact(full=False):
+    """Incremental VACUUM in short steps, then ANALYZE. Returns a report dict.
+
+    full=True first switches the database to auto_vacuum=INCREMENTAL with a full VACUUM.
+    """
+    path = database_path()
+    if path is None:
+        started = time.perf_counter()
+        with db.session.get_bind().begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+        return {'analyze_seconds': round(time.perf_counter() - started, 3)}
+
+    conn = _connect(path)
+    try:
+        page_size = _pragma(conn, 'page_size')
+        size_before = _pragma(conn, 'page_count') * page_size
+        report = {'bytes_before': size_before}
+
+        started = time.perf_counter()
+        if full:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            report['full_vacuum'] = True
+        mode = _pragma(conn, 'auto_vacuum')
+        report['auto_vacuum'] = {0: 'none', 1: 'full', 2: 'incremental'}.get(mode, mode)
+        if mode == 2:
+            while _pragma(conn, 'freelist_count'):
+                # Each step holds the write lock only briefly. executescript() steps the pragma to
+                # completion; execute() would free a single page per call
+                conn.executescript(f'PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});')
+                time.sleep(BACKUP_STEP_SLEEP)
+        report['free_pages_left'] = _pragma(conn, 'freelist_count')
+        report['vacuum_seconds'] = round(time.perf_counter() - started, 3)
+
+        started = time.perf_counter()
+        conn.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}')
+        conn.execute('ANALYZE')
+        report['analyze_seconds'] = round(time.perf_counter() - started, 3)
+
+        size_after = _pragma(conn, 'page_count') * page_size
+    finally:
+        conn.close()
+    report.update(bytes_after=size_after, bytes_reclaimed=size_before - size_after)
+    return report
+
+
+def run(backup_first=True, full=False, dest_dir=None):
+    """Backup (unless backup_first is False) then compact. Returns the combined report."""
+    report = {}
+    if backup_first:
+        report['backup'] = backup(dest_dir)
+    report['compact'] = compact(full)
+    return report
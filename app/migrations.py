@@ -0,0 +1,461 @@
+"""Versioned schema migrations.
+
+Migrations are registered in order with @migration(version, name). Each one runs inside a single
+transaction together with the schema_version row that records it, so a migration either applies
+completely or not at all, and never runs twice. A database that is already current costs a
+single-row SELECT at startup.
+
+Migrations receive a MigrationContext: add columns and indexes through it (both are no-ops when
+already present, so databases created by db.create_all() pass through cleanly) and backfill data
+with backfill()/backfill_sql(), which walk the table by id in chunks and print progress instead
+of updating rows one at a time.
+
+Migrations run on SQLite and PostgreSQL alike: column DDL must be valid on both (TIMESTAMP rather
+than DATETIME, TRUE/FALSE for boolean defaults, single-quoted string literals), and SQL that
+differs between them branches on m.dialect.
+"""
+import time
+from datetime import datetime
+from sqlalchemy import inspect, text, func, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app.models import db, SchemaVersion
+
+# Rows per statement for data backfills
+BACKFILL_CHUNK = 5000
+
+MIGRATIONS = []  # (version, name, function), ascending by version
+
+
+class MigrationError(Exception):
+    """A migration failed and was rolled back; the database stays at the previous version."""
+
+
+def migration(version, name):
+    """Register a migration function. Versions must be unique and only ever increase."""
+    def register(fn):
+        if any(v == version for v, _, _ in MIGRATIONS):
+            raise ValueError(f'Duplicate migration version {version}')
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+class MigrationContext:
+    """Connection and helpers handed to a migration. Everything runs in the migration's transaction."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.dialect = conn.dialect.name
+        self._columns = {}
+
+    def execute(self, sql, params=None):
+        return self.conn.execute(text(sql), params or {})
+
+    def has_table(self, table):
+        return inspect(self.conn).has_table(table)
+
+    def columns(self, table):
+        if table not in self._columns:
+            self._columns[table] = {col['name'] for col in inspect(self.conn).get_columns(table)}
+        return self._columns[table]
+
+    def add_column(self, table, column, ddl):
+        """ALTER TABLE ... ADD COLUMN unless the column exists. Returns True if it was added."""
+        if column in self.columns(table):
+            return False
+        self.execute(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+        self._columns[table].add(column)
+        print(f"Added {column} to {table}")
+        return True
+
+    def create_index(self, name, table, columns, unique=False):
+        kind = 'UNIQUE INDEX' if unique else 'INDEX'
+        self.execute(f'CREATE {kind} IF NOT EXISTS {name} ON {table} ({", ".join(columns)})')
+
+    def create_missing_tables(self):
+        """Create model tables that do not exist yet (with their indexes). Returns their names."""
+        missing = [t for t in db.metadata.sorted_tables if not self.has_table(t.name)]
+        if missing:
+            db.metadata.create_all(self.conn, tables=missing, checkfirst=False)
+            for t in missing:
+                print(f"Created {t.name} table")
+        return {t.name for t in missing}
+
+    def make_autoincrement(self, table):
+        """SQLite: rebuild a model table with AUTOINCREMENT, so ids of deleted rows are never handed
+        out again. Keeps its rows and any columns the model no longer declares, and recreates the
+        model's indexes. Returns True if the table was rebuilt (never on other databases, whose
+        sequences do not reuse ids)."""
+        if self.dialect != 'sqlite' or not self.has_table(table):
+            return False
+        ddl = self.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :t", {'t': table}).scalar()
+        if 'AUTOINCREMENT' in ddl.upper():
+            return False
+        existing = inspect(self.conn).get_columns(table)
+        old = f'{table}_old'
+        self.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        indexes = self.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t AND sql IS NOT NULL",
+                               {'t': old}).scalars().all()
+        for name in indexes:
+            self.execute(f'DROP INDEX {name}')
+        model = db.metadata.tables[table]
+        model.create(self.conn)
+        for col in existing:
+            if col['name'] not in model.c:
+                self.execute(f'ALTER TABLE {table} ADD COLUMN {col["name"]} {col["type"].compile(self.conn.dialect)}')
+        names = ', '.join(col['name'] for col in existing)
+        self.execute(f'INSERT INTO {table} ({names}) SELECT {names} FROM {old}')
+        self.execute(f'DROP TABLE {old}')
+        self._columns.pop(table, None)
+        print(f"Rebuilt {table} with AUTOINCREMENT ids")
+        return True
+
+    def backfill(self, table, columns, compute, where=None, chunk=BACKFILL_CHUNK):
+        """Set values computed in Python: compute(row) -> {column: value} for each row selected
+        (id plus `columns`), applied with one executemany UPDATE per chunk of rows."""
+        cond = f' AND ({where})' if where else ''
+        total = self._count(table, where)
+        done, last_id = 0, 0
+        while True:
+            rows = self.execute(
+                f'SELECT id, {", ".join(columns)} FROM {table} WHERE id > :last{cond} ORDER BY id LIMIT :n',
+                {'last': last_id, 'n': chunk}
+            ).fetchall()
+            if not rows:
+                break
+            updates = [dict(compute(row), _id=row[0]) for row in rows]
+            assignments = ', '.join(f'{col} = :{col}' for col in updates[0] if col != '_id')
+            self.conn.execute(text(f'UPDATE {table} SET {assignments} WHERE id = :_id'), updates)
+            done += len(rows)
+            last_id = rows[-1][0]
+            _progress(table, done, total)
+
+    def backfill_sql(self, table, assignments, where=None, chunk=BACKFILL_CHUNK):
+        """UPDATE table SET assignments [WHERE where], one id range of `chunk` rows per statement."""
+        cond = f' AND ({where})' if where else ''
+        lo, hi = self.execute(f'SELECT MIN(id), MAX(id) FROM {table}').first()
+        if lo is None:
+            return
+        total, done = self._count(table, where), 0
+        for start in range(lo, hi + 1, chunk):
+            result = self.execute(f'UPDATE {table} SET {assignments} WHERE id >= :lo AND id < :hi{cond}',
+                                  {'lo': start, 'hi': start + chunk})
+            done += result.rowcount
+            _progress(table, done, total)
+
+    def _count(self, table, where=None):
+        return self.execute(f'SELECT COUNT(*) FROM {table}' + (f' WHERE {where}' if where else '')).scalar()
+
+
+def _progress(table, done, total):
+    print(f"  {table}: {done}/{total} rows")
+
+
+def current_version():
+    """Highest applied schema version, or 0 for databases that predate schema_version."""
+    try:
+        return db.session.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        return 0
+
+
+def applied_versions():
+    try:
+        return {row[0] for row in db.session.execute(text('SELECT version FROM schema_version'))}
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        return set()
+
+
+def migrate():
+    """Apply pending migrations in order. Returns True if anything ran. Needs an app context.
+
+    Raises MigrationError when a migration fails; earlier migrations stay applied.
+    """
+    if current_version() >= SCHEMA_VERSION:
+        print(f"Database schema is current (version {SCHEMA_VERSION})")
+        return False
+    applied = applied_versions()
+    db.session.close()  # release the session's connection before taking the write lock
+    SchemaVersion.__table__.create(db.session.get_bind(), checkfirst=True)
+    ran = False
+    for version, name, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"Applying migration {version}: {name}")
+        started = time.perf_counter()
+        try:
+            ran = _apply(version, name, fn) or ran
+        except Exception as e:
+            raise MigrationError(f'Migration {version} ({name}) failed: {e}') from e
+        print(f"Migration {version} done in {time.perf_counter() - started:.2f}s")
+    print("\nMigration completed successfully!")
+    return ran
+
+
+def _apply(version, name, fn):
+    """Run one migration and record it in one transaction. False if another process got there first."""
+    with db.session.get_bind().connect() as conn:
+        sqlite = conn.dialect.name == 'sqlite'
+        if sqlite:
+            # pysqlite commits implicitly around DDL; drive the transaction ourselves so schema
+            # and data changes commit together. IMMEDIATE takes the write lock up front.
+            conn.execution_options(isolation_level='AUTOCOMMIT')
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+        else:
+            conn.begin()
+            if conn.dialect.name == 'postgresql':
+                # Serialize migrating processes, as BEGIN IMMEDIATE does on SQLite
+                conn.execute(text('LOCK TABLE schema_version IN EXCLUSIVE MODE'))
+        try:
+            done = conn.execute(text('SELECT 1 FROM schema_version WHERE version = :v'), {'v': version}).first()
+            if done is None:
+                fn(MigrationContext(conn))
+                conn.execute(SchemaVersion.__table__.insert(),
+                             {'version': version, 'name': name, 'applied_at': datetime.utcnow()})
+            if sqlite:
+                conn.exec_driver_sql('COMMIT')
+            else:
+                conn.commit()
+            return done is None
+        except Exception:
+            if sqlite:
+                conn.exec_driver_sql('ROLLBACK')
+            else:
+                conn.rollback()
+            raise
+
+
+# Columns added to existing tables by releases before versioned migrations: (table, column, DDL)
+LEGACY_COLUMNS = [
+    ('users', 'profile_image', 'VARCHAR(255)'),
+    ('users', 'background_image', 'VARCHAR(255)'),
+    ('users', 'background_gradient', 'VARCHAR(100)'),
+    ('users', 'color_scheme', "VARCHAR(50) DEFAULT 'default'"),
+    ('users', 'background_position', "VARCHAR(50) DEFAULT 'centered'"),
+    ('users', 'color_code', 'VARCHAR(7)'),
+    ('users', 'status', 'VARCHAR(50)'),
+    ('users', 'title', 'VARCHAR(100)'),
+    ('users', 'quick_chores', 'TEXT'),
+    ('users', 'quick_events', 'TEXT'),
+    ('stores', 'image', 'VARCHAR(255)'),
+    ('stores', 'color_code', 'VARCHAR(20)'),
+    ('stores', 'categories_text', 'VARCHAR(255)'),
+    ('stores', 'logo', 'VARCHAR(255)'),
+    ('items', 'image', 'VARCHAR(255)'),
+    ('items', 'store_id', 'INTEGER REFERENCES stores(id)'),
+    ('events', 'event_type', 'VARCHAR(50)'),
+    ('events', 'updated_at', 'TIMESTAMP'),
+    ('events', 'updated_by_id', 'INTEGER REFERENCES users(id)'),
+    ('events', 'recurrence', 'VARCHAR(20)'),
+    ('events', 'recurrence_interval', 'INTEGER DEFAULT 1'),
+    ('events', 'recurrence_until', 'DATE'),
+    ('shopping_lists', 'budget', 'FLOAT DEFAULT 0.0'),
+    ('shopping_lists', 'actual_spent', 'FLOAT DEFAULT 0.0'),
+    ('projects', 'completed', 'BOOLEAN DEFAULT FALSE'),
+    ('projects', 'completed_date', 'DATE'),
+    ('projects', 'assignee_notes', 'TEXT'),
+    ('projects', 'completed_photo', 'VARCHAR(255)'),
+    ('projects', 'completed_by_id', 'INTEGER REFERENCES users(id)'),
+    ('chore_tracker', 'updated_at', 'TIMESTAMP'),
+    ('chore_tracker', 'updated_by_id', 'INTEGER REFERENCES users(id)'),
+    ('chore_tracker', 'due_by_date', 'DATE'),
+    ('chore_tracker', 'assigner_notes', 'TEXT'),
+    ('chore_tracker', 'approved_by_id', 'INTEGER REFERENCES users(id)'),
+    ('chore_tracker', 'frequency', 'VARCHAR(50)'),
+    ('chore_tracker', 'assigned_user_id', 'INTEGER REFERENCES users(id)'),
+    ('chore_tracker', 'room_id', 'INTEGER REFERENCES rooms(id)'),
+    ('chore_tracker', 'due_by_datetime', 'TIMESTAMP'),
+    ('chores', 'assigned_by_id', 'INTEGER REFERENCES users(id)'),
+    ('chores', 'description', 'TEXT'),
+]
+
+DEFAULT_SETTINGS = [('tokens_per_dollar', '100'), ('cash_out_interest_rate', '1.0')]
+
+EXAMPLE_STORE_ITEMS = [
+    ('No-No', "When used on a parent or event, the parent cannot say 'No'.", "Must be used within reason. Cannot be used to ask for monetary prizes unless cashing in.\nMust be used within 30 days of purchase. Cannot be extended.\nThe physical ticket should be presented to a parent when cashing in.", 1000),
+    ('Chore Forwarder', "When used, Person A can forward a chore to another person. Unless Person B has a 'No-No' or 'Chore Free' ticket.", '', 50),
+    ('Chore Free', "When used the recipient is exempt from all chores for 24 hours. The chores are reassigned to another user for the duration.", '', 50),
+]
+
+
+@migration(1, 'baseline schema')
+def baseline(m):
+    """Everything migrate_database.py used to check on every start, for pre-versioning databases."""
+    from app.models import normalize_item_name, item_stores, project_users, SiteSettings, StoreItem
+    created = m.create_missing_tables()
+
+    added = {(table, column) for table, column, ddl in LEGACY_COLUMNS
+             if table not in created and m.add_column(table, column, ddl)}
+
+    if 'item_stores' in created:
+        m.execute('INSERT INTO item_stores (item_id, store_id) SELECT id, store_id FROM items WHERE store_id IS NOT NULL')
+        print("Backfilled item_stores from items.store_id")
+    if m.conn.execute(select(func.count()).select_from(project_users)).scalar() == 0:
+        m.execute('INSERT INTO project_users (project_id, user_id) SELECT id, user_id FROM projects WHERE user_id IS NOT NULL')
+        print("Backfilled project_users from user_id")
+    if ('chore_tracker', 'due_by_datetime') in added:
+        # Existing due dates become end-of-day deadlines
+        end_of_day = ("datetime(due_by_date || ' 23:59:59')" if m.dialect == 'sqlite'
+                      else "due_by_date + TIME '23:59:59'")
+        m.backfill_sql('chore_tracker', f"due_by_datetime = {end_of_day}",
+                       where='due_by_date IS NOT NULL AND due_by_datetime IS NULL')
+        print("Migrated due_by_date to due_by_datetime")
+    if m.add_column('items', 'name_normalized', 'VARCHAR(100)'):
+        m.backfill('items', ['name'], lambda row: {'name_normalized': normalize_item_name(row[1])})
+
+    # Calendar range queries, calendar chore feed and shopping list item matching
+    m.create_index('ix_events_date', 'events', ['date'])
+    m.create_index('ix_chore_tracker_due_by_datetime', 'chore_tracker', ['due_by_datetime'])
+    m.create_index('ix_items_name_normalized', 'items', ['name_normalized'])
+
+    settings = SiteSettings.__table__
+    have = set(m.conn.execute(select(settings.c.key)).scalars())
+    for key, value in DEFAULT_SETTINGS:
+        if key not in have:
+            m.conn.execute(settings.insert(), {'key': key, 'value': value})
+            print(f"Added default {key} = {value}")
+
+    store_items = StoreItem.__table__
+    if m.conn.execute(select(func.count()).select_from(store_items)).scalar() == 0:
+        m.conn.execute(store_items.insert(), [
+            {'title': title, 'description': desc, 'rules': rules or None, 'cost_tokens': cost, 'active': True, 'sort_order': order}
+            for order, (title, desc, rules, cost) in enumerate(EXAMPLE_STORE_ITEMS)
+        ])
+        print("Added example Chore Store items")
+
+
+@migration(2, 'quick chores/events link tables')
+def quick_links(m):
+    """Move the JSON id lists in users.quick_chores / quick_events into ordered link tables."""
+    import json
+    m.create_missing_tables()
+    m.create_index('ix_chore_tracker_chore_id_date', 'chore_tracker', ['chore_id', 'date'])
+    for column, table, fk, target in [('quick_chores', 'user_quick_chores', 'chore_id', 'chores'),
+                                      ('quick_events', 'user_quick_events', 'event_id', 'events')]:
+        if m.execute(f'SELECT COUNT(*) FROM {table}').scalar():
+            continue
+        rows = []
+        for user_id, raw in m.execute(f"SELECT id, {column} FROM users WHERE {column} IS NOT NULL AND {column} != ''"):
+            try:
+                ids = [int(i) for i in json.loads(raw)]
+            except (ValueError, TypeError):
+                continue
+            ids = list(dict.fromkeys(ids))[:8]
+            rows += [{'u': user_id, 'i': target_id, 'p': pos} for pos, target_id in enumerate(ids)]
+        if rows:
+            # Skip ids whose chore/event has since been deleted
+            m.conn.execute(text(f'INSERT INTO {table} (user_id, {fk}, position) '
+                                f'SELECT CAST(:u AS INTEGER), CAST(:i AS INTEGER), CAST(:p AS INTEGER) '
+                                f'WHERE EXISTS (SELECT 1 FROM {target} WHERE id = :i)'), rows)
+            print(f"Backfilled {table} from users.{column}")
+
+
+@migration(3, 'covering index for chores available today')
+def available_today_index(m):
+    m.create_index('ix_chore_tracker_date_status_chore_id', 'chore_tracker', ['date', 'status', 'chore_id', 'approved_by_id'])
+
+
+
+@migration(4, 'user daily stats')
+def user_daily_stats(m):
+    """Aggregate table behind the leaderboard, seeded from existing history."""
+    from app.analytics import rebuild
+    m.create_missing_tables()
+    if not m.execute('SELECT COUNT(*) FROM user_daily_stats').scalar():
+        rebuild(m.conn)
+        print("Backfilled user_daily_stats")
+
+
+
+@migration(5, 'overdue tracking')
+def overdue_tracking(m):
+    """Columns and indexes for the overdue sweep; the first sweep fills them in."""
+    m.add_column('chore_tracker', 'is_overdue', 'BOOLEAN NOT NULL DEFAULT FALSE')
+    m.add_column('chore_tracker', 'accrued_penalty', 'FLOAT NOT NULL DEFAULT 0')
+    m.create_index('ix_chore_tracker_status_due_by_datetime', 'chore_tracker', ['status', 'due_by_datetime'])
+    m.create_index('ix_chore_tracker_is_overdue', 'chore_tracker', ['is_overdue'])
+
+
+
+@migration(6, 'room cleaning schedule')
+def room_schedule(m):
+    """Per-room cleaning intervals and the indexed next_due_date behind /rooms/api/stale."""
+    from datetime import date
+    from app.models import room_next_due
+    m.add_column('rooms', 'clean_interval_days', 'INTEGER DEFAULT 7')
+    m.add_column('rooms', 'deep_clean_interval_days', 'INTEGER DEFAULT 90')
+    if m.add_column('rooms', 'next_due_date', 'DATE'):
+        def as_date(value):
+            return date.fromisoformat(str(value)[:10]) if value else None
+
+        def compute(row):
+            due = room_next_due(as_date(row[1]), as_date(row[2]), row[3], row[4])
+            return {'next_due_date': due.isoformat() if due else None}
+        m.backfill('rooms', ['last_cleaned', 'last_deep_cleaned', 'clean_interval_days', 'deep_clean_interval_days'], compute)
+    m.create_index('ix_rooms_next_due_date', 'rooms', ['next_due_date'])
+
+
+
+@migration(7, 'notification cursor index')
+def notification_cursor_index(m):
+    m.create_index('ix_notifications_user_id_id', 'notifications', ['user_id', 'id'])
+
+
+
+@migration(8, 'archived rows')
+def archived_rows(m):
+    m.create_missing_tables()
+
+
+
+@migration(9, 'purchase idempotency keys')
+def purchase_idempotency(m):
+    m.add_column('user_purchases', 'idempotency_key', 'VARCHAR(64)')
+    m.create_index('uq_user_purchases_user_id_idempotency_key', 'user_purchases', ['user_id', 'idempotency_key'],
+                   unique=True)
+
+
+
+@migration(10, 'cash-out request indexes')
+def cash_out_indexes(m):
+    """Keyset pages of /store/api/cash-out-requests, with and without a status filter."""
+    m.create_index('ix_cash_out_requests_created_at_id', 'cash_out_requests', ['created_at', 'id'])
+    m.create_index('ix_cash_out_requests_status_created_at_id', 'cash_out_requests', ['status', 'created_at', 'id'])
+
+
+
+@migration(11, 'completed projects index')
+def completed_projects_index(m):
+    """Day-grouped pages of /projects/api/completed."""
+    m.create_index('ix_projects_completed_completed_date', 'projects', ['completed', 'completed_date'])
+
+
+@migration(12, 'never reuse archived ids')
+def archived_ids(m):
+    """Archived tables stop handing out the ids of archived rows again. Rows that already took an
+    archived id move to a fresh one, so archiving them later cannot collide in archived_rows."""
+    from app.retention import POLICIES
+    for policy in POLICIES.values():
+        table = policy.table.name
+        m.make_autoincrement(table)
+        floor = m.execute('SELECT MAX(row_id) FROM archived_rows WHERE table_name = :t', {'t': table}).scalar()
+        if floor is None:
+            continue
+        top = max(floor, m.execute(f'SELECT MAX(id) FROM {table}').scalar() or 0)
+        reused = m.execute(f'SELECT id FROM {table} WHERE id IN '
+                           f'(SELECT row_id FROM archived_rows WHERE table_name = :t) ORDER BY id', {'t': table}).scalars().all()
+        for top, row_id in enumerate(reused, top + 1):
+            m.execute(f'UPDATE {table} SET id = :new WHERE id = :old', {'new': top, 'old': row_id})
+        if reused:
+            print(f"Renumbered {len(reused)} {table} rows that reused archived ids")
+        if m.dialect == 'sqlite':
+            m.execute('DELETE FROM sqlite_sequence WHERE name = :t', {'t': table})
+            m.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (:t, :s)', {'t': table, 's': top})
+        elif m.dialect == 'postgresql' and reused:
+            m.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), :s)", {'s': top})
+
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
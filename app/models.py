@@ -1,8 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from app.projection import raw_fields
+from app.routing import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession sends each app context's queries to the database it is bound to (app.tenancy)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Junction table for many-to-many relationship between Rooms and Chores
 room_chores = db.Table('room_chores',
@@ -29,8 +32,8 @@ class User(UserMixin, db.Model):
     color_code = db.Column(db.String(7), nullable=True)  # hex e.g. #ff5733 for family member display
     status = db.Column(db.String(50), nullable=True)  # at_school, at_work, overnight_stay, grocery_shopping, or custom
     title = db.Column(db.String(100), nullable=True)  # optional title/label
-    quick_chores = db.Column(db.Text, nullable=True)  # JSON array of chore IDs for quick chores (max 8)
-    quick_events = db.Column(db.Text, nullable=True)  # JSON array of event IDs for quick events (max 8)
+    quick_chores = db.Column(db.Text, nullable=True)  # Legacy JSON array of chore IDs; superseded by user_quick_chores
+    quick_events = db.Column(db.Text, nullable=True)  # Legacy JSON array of event IDs; superseded by user_quick_events
     
     # Security questions
     security_question_1 = db.Column(db.String(255))
@@ -48,6 +51,14 @@ class User(UserMixin, db.Model):
         return f'<User {self.username}>'
 
 
+class SchemaVersion(db.Model):
+    """Applied schema migrations; the highest version tells startup whether migrating is needed."""
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class SiteSettings(db.Model):
     """Key-value store for app-wide settings (e.g. token conversion rate)."""
     __tablename__ = 'site_settings'
@@ -58,6 +69,11 @@ class SiteSettings(db.Model):
 class CashOutRequest(db.Model):
     """User request to convert tokens to dollars at current rate."""
     __tablename__ = 'cash_out_requests'
+    __table_args__ = (
+        db.Index('ix_cash_out_requests_created_at_id', 'created_at', 'id'),
+        db.Index('ix_cash_out_requests_status_created_at_id', 'status', 'created_at', 'id'),
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     tokens = db.Column(db.Float, nullable=False)
@@ -67,6 +83,23 @@ class CashOutRequest(db.Model):
     user = db.relationship('User', backref=db.backref('cash_out_requests', lazy=True))
 
 
+class UserDailyStats(db.Model):
+    """Per-user, per-day earnings totals, incremented as rewards are paid (see app/analytics.py)."""
+    __tablename__ = 'user_daily_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    chores_completed = db.Column(db.Integer, nullable=False, default=0)
+    chore_tokens = db.Column(db.Float, nullable=False, default=0.0)
+    penalty_tokens = db.Column(db.Float, nullable=False, default=0.0)  # withheld for late completion
+    projects_completed = db.Column(db.Integer, nullable=False, default=0)
+    project_tokens = db.Column(db.Float, nullable=False, default=0.0)
+    cash_outs = db.Column(db.Integer, nullable=False, default=0)
+    cash_out_tokens = db.Column(db.Float, nullable=False, default=0.0)
+    cash_out_dollars = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (db.Index('ix_user_daily_stats_day', 'day'),)
+
+
 class StoreItem(db.Model):
     """Item in the Chore Store that users can buy with tokens."""
     __tablename__ = 'store_items'
@@ -82,18 +115,45 @@ class StoreItem(db.Model):
 class UserPurchase(db.Model):
     """Record of a user purchasing a store item."""
     __tablename__ = 'user_purchases'
+    # A retried purchase with the same key returns the first one instead of charging again
+    __table_args__ = (db.Index('uq_user_purchases_user_id_idempotency_key', 'user_id', 'idempotency_key', unique=True),
+                      {'sqlite_autoincrement': True})
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     store_item_id = db.Column(db.Integer, db.ForeignKey('store_items.id'), nullable=False)
     purchased_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='pending')  # pending, used, expired
+    idempotency_key = db.Column(db.String(64), nullable=True)  # client-supplied, unique per user
     user = db.relationship('User', backref=db.backref('purchases', lazy=True))
     store_item = db.relationship('StoreItem', backref=db.backref('purchases', lazy=True))
 
 
+class ArchivedRow(db.Model):
+    """A row moved out of a busy table by the retention job (see app/retention.py).
+
+    data is the original row as zlib-compressed JSON; user_id and created_at are copied out so
+    the history endpoints can filter and page without decompressing. The archived tables are
+    AUTOINCREMENT on SQLite, so an archived row's id is never handed to a new row.
+    """
+    __tablename__ = 'archived_rows'
+    __table_args__ = (
+        db.UniqueConstraint('table_name', 'row_id', name='uq_archived_rows_table_row'),
+        db.Index('ix_archived_rows_table_user_row', 'table_name', 'user_id', 'row_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(64), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)  # no foreign key: archives outlive deleted users
+    created_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+
 class Notification(db.Model):
     """In-app notification for a user (e.g. project needs more details)."""
     __tablename__ = 'notifications'
+    # Serves /notifications/api/wait?after=<id> (new rows for one user past a cursor)
+    __table_args__ = (db.Index('ix_notifications_user_id_id', 'user_id', 'id'), {'sqlite_autoincrement': True})
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     message = db.Column(db.String(500), nullable=False)
@@ -110,6 +170,7 @@ class Category(db.Model):
     name = db.Column(db.String(100), unique=True, nullable=False)
     type = db.Column(db.String(20), nullable=False)  # 'store', 'item'
     
+    @raw_fields('id', 'name', 'type')
     def to_dict(self):
         return {
             'id': self.id,
@@ -149,6 +210,7 @@ class Store(db.Model):
     # Many-to-many relationship with Categories
     categories = db.relationship('Category', secondary=store_categories, lazy='subquery', backref=db.backref('stores', lazy=True))
     
+    @raw_fields('id', 'name', 'budget', 'image', 'logo', 'color_code', 'categories_text')
     def to_dict(self):
         return {
             'id': self.id,
@@ -161,11 +223,16 @@ class Store(db.Model):
             'category_names': [cat.name for cat in self.categories]
         }
 
+def normalize_item_name(name):
+    """Case-folded, whitespace-collapsed item name used to match list entries to items."""
+    return ' '.join((name or '').split()).casefold()
+
 class Item(db.Model):
     __tablename__ = 'items'
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    name_normalized = db.Column(db.String(100), nullable=True, index=True)  # normalize_item_name(name), kept in sync
     quantity = db.Column(db.Float, default=0.0)
     full_amount = db.Column(db.Integer, default=0)
     low_amount = db.Column(db.Integer, default=0)
@@ -182,6 +249,13 @@ class Item(db.Model):
     # Multiple stores (many-to-many)
     stores = db.relationship('Store', secondary=item_stores, lazy='subquery', backref=db.backref('item_list', lazy=True))
     
+    @db.validates('name')
+    def _sync_name_normalized(self, key, value):
+        self.name_normalized = normalize_item_name(value)
+        return value
+    
+    @raw_fields('id', 'name', 'quantity', 'full_amount', 'low_amount', 'purchase_frequency', 'last_purchase_date',
+                'purchase_unit_type', 'usage_frequency', 'image', 'store_id')
     def to_dict(self):
         store_list = getattr(self, 'stores', None) or []
         store_ids = [s.id for s in store_list]
@@ -208,6 +282,9 @@ class Item(db.Model):
             'category_names': [cat.name for cat in self.categories]
         }
 
+DEFAULT_CLEAN_INTERVAL_DAYS = 7
+DEFAULT_DEEP_CLEAN_INTERVAL_DAYS = 90
+
 class Room(db.Model):
     __tablename__ = 'rooms'
     
@@ -215,19 +292,57 @@ class Room(db.Model):
     name = db.Column(db.String(100), nullable=False)
     last_deep_cleaned = db.Column(db.Date)
     last_cleaned = db.Column(db.Date)
+    clean_interval_days = db.Column(db.Integer, default=DEFAULT_CLEAN_INTERVAL_DAYS)  # 0 = no regular cleaning schedule
+    deep_clean_interval_days = db.Column(db.Integer, default=DEFAULT_DEEP_CLEAN_INTERVAL_DAYS)  # 0 = no deep cleaning schedule
+    next_due_date = db.Column(db.Date, nullable=True, index=True)  # earliest of the two, kept by schedule()
     
     # Many-to-many relationship with Chores
     chores = db.relationship('Chore', secondary=room_chores, lazy='subquery', backref=db.backref('rooms', lazy=True))
     
+    def clean_due(self, today=None):
+        return _next_due(self.last_cleaned, self.clean_interval_days, today)
+    
+    def deep_clean_due(self, today=None):
+        return _next_due(self.last_deep_cleaned, self.deep_clean_interval_days, today)
+    
+    def schedule(self, today=None):
+        """Recompute next_due_date; call after changing last_*cleaned or an interval."""
+        self.next_due_date = room_next_due(self.last_cleaned, self.last_deep_cleaned,
+                                           self.clean_interval_days, self.deep_clean_interval_days, today)
+    
+    @raw_fields('id', 'name', 'last_deep_cleaned', 'last_cleaned', 'clean_interval_days', 'deep_clean_interval_days',
+                'next_due_date')
     def to_dict(self):
+        clean_due, deep_clean_due = self.clean_due(), self.deep_clean_due()
         return {
             'id': self.id,
             'name': self.name,
             'last_deep_cleaned': self.last_deep_cleaned.isoformat() if self.last_deep_cleaned else None,
             'last_cleaned': self.last_cleaned.isoformat() if self.last_cleaned else None,
+            'clean_interval_days': self.clean_interval_days,
+            'deep_clean_interval_days': self.deep_clean_interval_days,
+            'clean_due': clean_due.isoformat() if clean_due else None,
+            'deep_clean_due': deep_clean_due.isoformat() if deep_clean_due else None,
+            'next_due_date': self.next_due_date.isoformat() if self.next_due_date else None,
             'chore_ids': [chore.id for chore in self.chores]
         }
 
+
+def _next_due(last, interval_days, today=None):
+    """Date a cleaning is next due: last + interval, or today when never done; None without a schedule."""
+    if not interval_days:
+        return None
+    if last is None:
+        return today or date.today()
+    return last + timedelta(days=interval_days)
+
+
+def room_next_due(last_cleaned, last_deep_cleaned, clean_interval_days, deep_clean_interval_days, today=None):
+    """Earliest due date of a room's regular and deep cleaning (None when neither is scheduled)."""
+    dues = [d for d in (_next_due(last_cleaned, clean_interval_days, today),
+                        _next_due(last_deep_cleaned, deep_clean_interval_days, today)) if d]
+    return min(dues) if dues else None
+
 class Chore(db.Model):
     __tablename__ = 'chores'
     
@@ -244,6 +359,7 @@ class Chore(db.Model):
     tracker_entries = db.relationship('ChoreTracker', backref='chore', lazy=True, cascade='all, delete-orphan')
     assigned_by = db.relationship('User', foreign_keys=[assigned_by_id], backref='chores_created_by_me')
     
+    @raw_fields('id', 'task', 'description', 'frequency', 'assigned_user_id', 'assigned_by_id', 'reward', 'room_id')
     def to_dict(self):
         room_names = [r.name for r in self.rooms] if self.rooms else []
         return {
@@ -268,11 +384,13 @@ class ChoreTracker(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     chore_id = db.Column(db.Integer, db.ForeignKey('chores.id'), nullable=False)
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
-    due_by_datetime = db.Column(db.DateTime, nullable=True)  # Changed to datetime to include time
+    due_by_datetime = db.Column(db.DateTime, nullable=True, index=True)  # Changed to datetime to include time
     frequency = db.Column(db.String(50), nullable=True)  # Frequency for this assignment (daily, weekly, etc.)
     assigned_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Assignment-specific user
     room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=True)  # Assignment-specific room
     status = db.Column(db.String(20), default='pending')  # pending, pending_approval, completed, skipped
+    is_overdue = db.Column(db.Boolean, nullable=False, default=False)  # set by the overdue sweep (app/jobs.py)
+    accrued_penalty = db.Column(db.Float, nullable=False, default=0.0)  # late penalty if approved today; final penalty once completed
     assigner_notes = db.Column(db.Text, nullable=True)  # Notes from assigner when reinstating
     approved_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Who approved the completion
     updated_at = db.Column(db.DateTime, nullable=True)
@@ -282,6 +400,19 @@ class ChoreTracker(db.Model):
     assigned_user = db.relationship('User', foreign_keys=[assigned_user_id], backref='chore_assignments')
     room = db.relationship('Room', foreign_keys=[room_id], backref='chore_tracker_entries')
 
+    __table_args__ = (
+        # Today's status of a given chore (quick chores, dashboard)
+        db.Index('ix_chore_tracker_chore_id_date', 'chore_id', 'date'),
+        # "Completed today" anti-join for the available-chores list; covers every column it reads
+        db.Index('ix_chore_tracker_date_status_chore_id', 'date', 'status', 'chore_id', 'approved_by_id'),
+        # Overdue sweep: open entries past their deadline, and entries still flagged overdue
+        db.Index('ix_chore_tracker_status_due_by_datetime', 'status', 'due_by_datetime'),
+        db.Index('ix_chore_tracker_is_overdue', 'is_overdue'),
+        {'sqlite_autoincrement': True},
+    )
+
+    @raw_fields('id', 'chore_id', 'date', 'due_by_datetime', 'frequency', 'assigned_user_id', 'room_id', 'status',
+                'assigner_notes', 'approved_by_id', 'updated_at', 'updated_by_id')
     def to_dict(self):
         return {
             'id': self.id,
@@ -297,6 +428,8 @@ class ChoreTracker(db.Model):
             'room_id': self.room_id,
             'room_name': self.room.name if self.room_id and hasattr(self, 'room') and self.room else None,
             'status': self.status,
+            'is_overdue': bool(self.is_overdue),
+            'accrued_penalty': self.accrued_penalty or 0.0,
             'assigner_notes': self.assigner_notes,
             'approved_by_id': self.approved_by_id,
             'approved_by_name': self.approved_by.name if self.approved_by else None,
@@ -339,14 +472,19 @@ class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
-    date = db.Column(db.Date, nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)  # first occurrence for recurring events
     time = db.Column(db.Time, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     event_type = db.Column(db.String(50), nullable=True)  # shopping, appointment, birthday, meeting, reminder, travel, event
+    recurrence = db.Column(db.String(20), nullable=True)  # None (one-off), daily, weekly, monthly, yearly
+    recurrence_interval = db.Column(db.Integer, default=1)  # every N days/weeks/months/years
+    recurrence_until = db.Column(db.Date, nullable=True)  # last possible occurrence (inclusive)
     updated_at = db.Column(db.DateTime, nullable=True)
     updated_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     updated_by = db.relationship('User', foreign_keys=[updated_by_id])
 
+    @raw_fields('id', 'title', 'description', 'date', 'time', 'user_id', 'event_type', 'recurrence', 'recurrence_until',
+                'updated_at', 'updated_by_id')
     def to_dict(self):
         return {
             'id': self.id,
@@ -356,11 +494,27 @@ class Event(db.Model):
             'time': self.time.strftime('%H:%M') if self.time else None,
             'user_id': self.user_id,
             'event_type': self.event_type,
+            'recurrence': self.recurrence,
+            'recurrence_interval': self.recurrence_interval or 1,
+            'recurrence_until': self.recurrence_until.isoformat() if self.recurrence_until else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'updated_by_id': self.updated_by_id,
             'updated_by_name': self.updated_by.name if self.updated_by else None
         }
 
+# Ordered dashboard quick chores / quick events per user (max 8 each)
+user_quick_chores = db.Table('user_quick_chores',
+    db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    db.Column('chore_id', db.Integer, db.ForeignKey('chores.id'), primary_key=True),
+    db.Column('position', db.Integer, nullable=False, default=0)
+)
+
+user_quick_events = db.Table('user_quick_events',
+    db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    db.Column('event_id', db.Integer, db.ForeignKey('events.id'), primary_key=True),
+    db.Column('position', db.Integer, nullable=False, default=0)
+)
+
 # Junction table for many-to-many: projects can have multiple assigned users
 project_users = db.Table('project_users',
     db.Column('project_id', db.Integer, db.ForeignKey('projects.id'), primary_key=True),
@@ -370,6 +524,7 @@ project_users = db.Table('project_users',
 
 class Project(db.Model):
     __tablename__ = 'projects'
+    __table_args__ = (db.Index('ix_projects_completed_completed_date', 'completed', 'completed_date'),)
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
@@ -386,6 +541,8 @@ class Project(db.Model):
     completed_by = db.relationship('User', foreign_keys=[completed_by_id])
     assigned_users = db.relationship('User', secondary=project_users, lazy='subquery', backref=db.backref('assigned_projects', lazy=True))
     
+    @raw_fields('id', 'name', 'user_id', 'description', 'severity', 'reward', 'completed', 'completed_date',
+                'assignee_notes', 'completed_photo', 'completed_by_id')
     def to_dict(self):
         # Primary assignee and list of all assignees
         user_ids = [u.id for u in self.assigned_users] if self.assigned_users else ([self.user_id] if self.user_id else [])
@@ -431,6 +588,7 @@ class ShoppingList(db.Model):
     user = db.relationship('User', backref='shopping_lists', lazy=True)
     items = db.relationship('ShoppingListItem', backref='shopping_list', lazy=True, cascade='all, delete-orphan')
     
+    @raw_fields('id', 'name', 'store_id', 'user_id', 'created_at', 'completed')
     def to_dict(self):
         budget_status = 'spot_on'
         if self.budget > 0:
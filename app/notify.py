@@ -0,0 +1,99 @@
+"""In-process wake-ups for /notifications/api/wait.
+
+Every user has a generation counter that is bumped when a commit in this process inserts a
+Notification for them, whether through the ORM (db.session.add) or a bulk db.insert(Notification)
+(the overdue sweep). Waiters block on one condition variable until their user's generation moves
+past the value they read before querying, so a waiting client costs no queries at all until a
+notification for it is committed.
+
+Inserts made by other processes (e.g. flask sweep-overdue from cron) or with raw SQL are not
+seen; those waiters simply time out and the client's next request picks the rows up.
+Listeners added with add_listener() are called with the household and the affected user ids
+after each such commit (the async server uses this to wake its event loop). Generations are kept
+per household in multi-household mode (app/tenancy.py); user ids are only meaningful within one.
+"""
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import tenancy
+from app.models import Notification
+
+_cond = threading.Condition()
+_generations = {}  # (household, user id) -> number of committed notification batches seen
+_listeners = []
+
+
+def generation(user_id, household=None):
+    """Current generation for a user (of household, default the current one); read it before
+    querying, then wait() on it."""
+    with _cond:
+        return _generations.get((household or tenancy.current(), user_id), 0)
+
+
+def wait(user_id, seen, timeout):
+    """Block until a notification for user_id is committed after generation `seen`, or timeout.
+
+    Returns True if woken by a new notification.
+    """
+    key = (tenancy.current(), user_id)
+    with _cond:
+        return _cond.wait_for(lambda: _generations.get(key, 0) != seen, timeout)
+
+
+def add_listener(callback):
+    """Call callback(household, user_ids) after every commit that inserted notifications."""
+    _listeners.append(callback)
+
+
+def remove_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def publish(user_ids):
+    """Wake waiters for these users (for writes the session events cannot see)."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    household = tenancy.current()
+    with _cond:
+        for user_id in user_ids:
+            key = (household, user_id)
+            _generations[key] = _generations.get(key, 0) + 1
+        _cond.notify_all()
+    for callback in _listeners:
+        callback(household, user_ids)
+
+
+def _pending(session):
+    return session.info.setdefault('_notify_users', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_new_notifications(session, flush_context):
+    users = {obj.user_id for obj in session.new if isinstance(obj, Notification)}
+    if users:
+        _pending(session).update(users)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_notifications(orm_execute_state):
+    if not orm_execute_state.is_insert or not any(m.class_ is Notification for m in orm_execute_state.all_mappers):
+        return
+    params = orm_execute_state.parameters
+    rows = params if isinstance(params, (list, tuple)) else [params or {}]
+    _pending(orm_execute_state.session).update(row.get('user_id') for row in rows if row.get('user_id'))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed(session):
+    users = session.info.pop('_notify_users', None)
+    if users:
+        publish(users)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop('_notify_users', None)
@@ -0,0 +1,111 @@
+"""Field selection (?fields=) and columnar encoding (?format=columns) for list APIs.
+
+    GET /items/api?fields=id,name                  -> [{"id": 1, "name": "Milk"}, ...]
+    GET /items/api?fields=id,name&format=columns   -> {"columns": ["id", "name"], "rows": [[1, "Milk"], ...]}
+
+Fields are the keys of the endpoint's normal JSON objects. When every requested field is one the
+serializer copies unchanged from a column (declared with @raw_fields), only those columns are
+SELECTed: no ORM objects, relationship loads or to_dict() calls. Otherwise rows are loaded (with
+the endpoint's eager-loading options) and each serialized dict is trimmed to the requested keys,
+so a field has the same value whichever way it is read.
+"""
+import datetime
+
+from flask import request, jsonify
+
+# Keys each serializer produces, learned from the first row it serializes
+_known_fields = {}
+# Keys each serializer copies unchanged from the model's column of the same name
+_raw_fields = {}
+
+
+def raw_fields(*keys):
+    """Decorator declaring the keys a serializer copies unchanged from same-named columns (dates
+    as ISO strings, times as HH:MM). Keys it normalizes (`x or None`, float(), bool()) must not
+    be listed."""
+    def register(serialize):
+        _raw_fields[serialize] = frozenset(keys)
+        return serialize
+    return register
+
+
+def requested_fields(args=None):
+    """List of fields from ?fields=a,b,c, or None when the parameter is absent."""
+    raw = (request.args if args is None else args).get('fields')
+    if raw is None:
+        return None
+    return [f for f in dict.fromkeys(part.strip() for part in raw.split(',')) if f]
+
+
+def _json_value(value):
+    if isinstance(value, datetime.datetime) or isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M')
+    return value
+
+
+def _field_names(query, model, serialize):
+    """Public keys of serialize() for this model; None when the table has no rows to learn from."""
+    if serialize not in _known_fields:
+        sample = query.first()
+        if sample is None:
+            return None
+        _known_fields[serialize] = set(serialize(sample))
+    return _known_fields[serialize]
+
+
+def _ordered(query, model):
+    """query with its ties broken by primary key, so the column-only SELECT (which SQLite may
+    answer from a covering index) returns rows in the same order as the full one. A query with
+    LIMIT/OFFSET already applied must carry a complete ORDER BY itself."""
+    if query._limit_clause is not None or query._offset_clause is not None:
+        return query
+    return query.order_by(*model.__mapper__.primary_key)
+
+
+def project(query, model, serialize, eager=(), args=None):
+    """Run query honouring ?fields= and ?format=. Returns (payload, error message or None).
+
+    args defaults to the Flask request's query string; the async API (app/asgi.py) passes its own.
+    """
+    args = request.args if args is None else args
+    query = _ordered(query, model)
+    fields = requested_fields(args)
+    columnar = args.get('format') == 'columns'
+    if fields is None:
+        data = [serialize(obj) for obj in query.options(*eager).all()]
+        if not columnar:
+            return data, None
+        columns = list(data[0]) if data else []
+        return {'columns': columns, 'rows': [[row[c] for c in columns] for row in data]}, None
+
+    if not fields:
+        return None, 'fields must name at least one field'
+    known = _field_names(query, model, serialize)
+    if known is None:
+        return ({'columns': fields, 'rows': []} if columnar else []), None
+    unknown = [f for f in fields if f not in known]
+    if unknown:
+        return None, f'Unknown field(s): {", ".join(unknown)}'
+
+    column_keys = {attr.key for attr in model.__mapper__.column_attrs} & _raw_fields.get(serialize, frozenset())
+    if all(f in column_keys for f in fields):
+        # Only the requested columns are read from the database
+        rows = [[_json_value(v) for v in row] for row in query.with_entities(*[getattr(model, f) for f in fields]).all()]
+    else:
+        rows = []
+        for obj in query.options(*eager).all():
+            full = serialize(obj)
+            rows.append([full[f] for f in fields])
+    if columnar:
+        return {'columns': fields, 'rows': rows}, None
+    return [dict(zip(fields, row)) for row in rows], None
+
+
+def list_response(query, model, serialize=None, eager=()):
+    """jsonify(project(...)), or a 400 for unknown fields. serialize defaults to model.to_dict."""
+    payload, error = project(query, model, serialize or model.to_dict, eager)
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify(payload)
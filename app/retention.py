@@ -0,0 +1,141 @@
+"""Retention: move old rows out of the high-churn tables into archived_rows.
+
+Each policy names a table, the column that dates a row and which rows are finished enough to
+archive. Rows older than the policy's number of days (environment variable, 0 keeps them
+forever) are copied into archived_rows as zlib-compressed JSON and deleted from the live table,
+ARCHIVE_CHUNK rows per transaction, so the routes that list these tables keep scanning a
+bounded amount of data while history stays readable through /archive/api/<kind>.
+
+    RETENTION_TRACKER_DAYS       completed/skipped chore tracker entries, by date (default 365);
+                                 each chore's latest completion stays (room "last cleaned")
+    RETENTION_NOTIFICATION_DAYS  notifications, by created_at (default 90)
+    RETENTION_PURCHASE_DAYS      store purchases, by purchased_at (default 730)
+    RETENTION_CASH_OUT_DAYS      paid cash-out requests, by created_at (default 730)
+
+Runs as the 'archive-old-rows' job (ARCHIVE_SECONDS, default daily) or `flask archive-old-rows`.
+Leaderboard totals are unaffected: they live in user_daily_stats, and analytics.rebuild() reads
+archived cash-outs too.
+"""
+import json
+import os
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy.orm import aliased
+
+from app.models import db, ArchivedRow, CashOutRequest, Chore, ChoreTracker, Notification, UserPurchase
+
+ARCHIVE_CHUNK = int(os.environ.get('ARCHIVE_CHUNK', 500))
+
+
+class Policy:
+    def __init__(self, kind, model, age_column, env, default_days, user=None, finished=None):
+        self.kind = kind
+        self.model = model
+        self.table = model.__table__
+        self.age_column = age_column
+        self.days = int(os.environ.get(env, default_days))
+        self.user = user if user is not None else model.user_id
+        self.finished = finished
+
+    def eligible(self, cutoff):
+        conds = [self.age_column < cutoff]
+        if self.finished is not None:
+            conds.append(self.finished)
+        return conds
+
+
+_newer = aliased(ChoreTracker)
+# A completion is only archived once the chore has a later one (ix_chore_tracker_chore_id_date),
+# so the room detail's last cleaning per chore always stays in the live table
+_superseded = db.or_(
+    ChoreTracker.status != 'completed',
+    db.exists().where(
+        _newer.chore_id == ChoreTracker.chore_id,
+        _newer.status == 'completed',
+        db.or_(_newer.date > ChoreTracker.date, db.and_(_newer.date == ChoreTracker.date, _newer.id > ChoreTracker.id)),
+    ),
+)
+
+_tracker_user = db.func.coalesce(
+    ChoreTracker.assigned_user_id,
+    db.select(Chore.assigned_user_id).where(Chore.id == ChoreTracker.chore_id).scalar_subquery(),
+)
+
+POLICIES = {p.kind: p for p in (
+    Policy('trackers', ChoreTracker, ChoreTracker.date, 'RETENTION_TRACKER_DAYS', 365, user=_tracker_user,
+           finished=db.and_(ChoreTracker.status.in_(('completed', 'skipped')), _superseded)),
+    Policy('notifications', Notification, Notification.created_at, 'RETENTION_NOTIFICATION_DAYS', 90),
+    Policy('purchases', UserPurchase, UserPurchase.purchased_at, 'RETENTION_PURCHASE_DAYS', 730),
+    Policy('cash-outs', CashOutRequest, CashOutRequest.created_at, 'RETENTION_CASH_OUT_DAYS', 730,
+           finished=CashOutRequest.status != 'pending'),
+)}
+
+
+def _jsonable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Cannot archive {type(value).__name__}')
+
+
+def encode(values):
+    return zlib.compress(json.dumps(values, default=_jsonable, separators=(',', ':')).encode())
+
+
+def decode(data):
+    return json.loads(zlib.decompress(data))
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime) or value is None:
+        return value
+    return datetime.combine(value, datetime.min.time())
+
+
+def archive_policy(policy, today=None, chunk=None):
+    """Move one policy's expired rows into archived_rows, committing per chunk. Returns rows moved."""
+    if policy.days <= 0:
+        return 0
+    chunk = chunk or ARCHIVE_CHUNK
+    cutoff = (today or date.today()) - timedelta(days=policy.days)
+    if isinstance(policy.age_column.type, db.DateTime):
+        cutoff = _as_datetime(cutoff)
+    columns = list(policy.table.c)
+    moved = 0
+    while True:
+        rows = db.session.execute(
+            db.select(*columns, policy.user.label('archive_user_id'))
+            .where(*policy.eligible(cutoff)).order_by(policy.table.c.id).limit(chunk)
+        ).all()
+        if not rows:
+            break
+        now = datetime.utcnow()
+        db.session.execute(db.insert(ArchivedRow), [{
+            'table_name': policy.table.name,
+            'row_id': row.id,
+            'user_id': row.archive_user_id,
+            'created_at': _as_datetime(getattr(row, policy.age_column.key)),
+            'archived_at': now,
+            'data': encode({c.key: getattr(row, c.key) for c in columns}),
+        } for row in rows])
+        db.session.execute(db.delete(policy.table).where(policy.table.c.id.in_([row.id for row in rows])))
+        db.session.commit()
+        moved += len(rows)
+        if len(rows) < chunk:
+            break
+    return moved
+
+
+def archive(today=None, chunk=None):
+    """Apply every retention policy. Returns {kind: rows moved}."""
+    return {kind: archive_policy(policy, today, chunk) for kind, policy in POLICIES.items()}
+
+
+def archived_rows(conn, table_name):
+    """Decoded rows archived from table_name, read through a Core connection (analytics.rebuild)."""
+    result = conn.execute(db.select(ArchivedRow.data).where(ArchivedRow.table_name == table_name))
+    for (data,) in result:
+        yield decode(data)
@@ -0,0 +1,127 @@
+"""Leaderboard and per-user earnings, summed from the user_daily_stats aggregates."""
+import calendar
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, jsonify, request
+from flask_login import login_required, current_user
+from app.analytics import STAT_COLUMNS
+from app.models import db, User, UserDailyStats
+
+analytics_bp = Blueprint('analytics', __name__)
+
+PERIODS = ('day', 'week', 'month', 'year', 'all')
+
+
+def _period_window(args):
+    """Resolve (start, end, period) from ?period=day|week|month|year|all&date= or start_date/end_date.
+
+    start and end are None for 'all'. Raises ValueError on a bad date or period.
+    """
+    if args.get('start_date') and args.get('end_date'):
+        start = datetime.strptime(args['start_date'], '%Y-%m-%d').date()
+        end = datetime.strptime(args['end_date'], '%Y-%m-%d').date()
+        return start, end, 'range'
+    period = args.get('period', 'week')
+    if period not in PERIODS:
+        raise ValueError(f'period must be one of {", ".join(PERIODS)}')
+    anchor = datetime.strptime(args['date'], '%Y-%m-%d').date() if args.get('date') else date.today()
+    if period == 'all':
+        return None, None, period
+    if period == 'day':
+        return anchor, anchor, period
+    if period == 'week':
+        # Weeks start on Sunday, matching the dashboard calendar grid
+        start = anchor - timedelta(days=(anchor.weekday() + 1) % 7)
+        return start, start + timedelta(days=6), period
+    if period == 'month':
+        start = anchor.replace(day=1)
+        return start, start.replace(day=calendar.monthrange(start.year, start.month)[1]), period
+    return date(anchor.year, 1, 1), date(anchor.year, 12, 31), period
+
+
+def _in_window(start, end):
+    conds = []
+    if start:
+        conds.append(UserDailyStats.day >= start)
+    if end:
+        conds.append(UserDailyStats.day <= end)
+    return conds
+
+
+def _totals(values):
+    """Stat totals dict from a row of SUM()s in STAT_COLUMNS order, plus tokens_earned."""
+    out = {c: (v or 0) for c, v in zip(STAT_COLUMNS, values)}
+    for c in ('chore_tokens', 'penalty_tokens', 'project_tokens', 'cash_out_tokens', 'cash_out_dollars'):
+        out[c] = round(float(out[c]), 2)
+    out['tokens_earned'] = round(out['chore_tokens'] + out['project_tokens'], 2)
+    return out
+
+
+def _sums():
+    return [db.func.sum(getattr(UserDailyStats, c)) for c in STAT_COLUMNS]
+
+
+def _window_json(start, end, period):
+    return {'period': period, 'start': start.isoformat() if start else None, 'end': end.isoformat() if end else None}
+
+
+@analytics_bp.route('/api/leaderboard', methods=['GET'])
+@login_required
+def leaderboard():
+    """Every family member's totals for the period, highest tokens earned first."""
+    try:
+        start, end, period = _period_window(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Outer join so members with nothing this period still appear with zeros
+    rows = db.session.query(User.id, User.name, User.color_code, User.profile_image, *_sums()).outerjoin(
+        UserDailyStats, db.and_(UserDailyStats.user_id == User.id, *_in_window(start, end))
+    ).group_by(User.id, User.name, User.color_code, User.profile_image).all()
+    users = []
+    for row in rows:
+        entry = {'user_id': row[0], 'name': row[1], 'color_code': row[2], 'profile_image': row[3]}
+        entry.update(_totals(row[4:]))
+        users.append(entry)
+    users.sort(key=lambda u: (-u['tokens_earned'], -u['chores_completed'], u['name'].lower()))
+    for rank, entry in enumerate(users, 1):
+        entry['rank'] = rank
+    return jsonify(dict(_window_json(start, end, period), users=users))
+
+
+@analytics_bp.route('/api/users/<int:user_id>', methods=['GET'])
+@login_required
+def user_earnings(user_id):
+    """One user's totals for the period plus a series grouped by ?group=day|week|month.
+
+    Users can see their own earnings; admins can see anyone's.
+    """
+    if user_id != current_user.id and not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    if not db.session.get(User, user_id):
+        return jsonify({'error': 'User not found'}), 404
+    group = request.args.get('group', 'day')
+    if group not in ('day', 'week', 'month'):
+        return jsonify({'error': 'group must be day, week or month'}), 400
+    try:
+        start, end, period = _period_window(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows = db.session.query(UserDailyStats.day, *[getattr(UserDailyStats, c) for c in STAT_COLUMNS]).filter(
+        UserDailyStats.user_id == user_id, *_in_window(start, end)
+    ).order_by(UserDailyStats.day).all()
+    buckets = {}
+    for row in rows:
+        day = row[0]
+        if group == 'week':
+            key = day - timedelta(days=(day.weekday() + 1) % 7)
+        elif group == 'month':
+            key = day.replace(day=1)
+        else:
+            key = day
+        sums = buckets.setdefault(key, [0] * len(STAT_COLUMNS))
+        for i, v in enumerate(row[1:]):
+            sums[i] += v or 0
+    series = [dict(_totals(sums), start=key.isoformat()) for key, sums in buckets.items()]
+    totals = _totals([sum(b[i] for b in buckets.values()) for i in range(len(STAT_COLUMNS))])
+    return jsonify(dict(_window_json(start, end, period), user_id=user_id, group=group, totals=totals, series=series))
@@ -0,0 +1,51 @@
+"""History of rows the retention job moved out of the live tables (see app/retention.py)."""
+from flask import Blueprint, jsonify, request
+from flask_login import login_required, current_user
+from app.models import db, ArchivedRow
+from app.retention import POLICIES, decode
+
+archive_bp = Blueprint('archive', __name__)
+
+PAGE_DEFAULT = 50
+PAGE_MAX = 200
+
+
+@archive_bp.route('/api', methods=['GET'])
+@login_required
+def archive_summary():
+    """Retention policy and archived row count per kind (admin only)."""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    counts = dict(db.session.query(ArchivedRow.table_name, db.func.count(ArchivedRow.id))
+                  .group_by(ArchivedRow.table_name).all())
+    return jsonify([{'kind': kind, 'table': p.table.name, 'retention_days': p.days,
+                     'archived': counts.get(p.table.name, 0)} for kind, p in POLICIES.items()])
+
+
+@archive_bp.route('/api/<kind>', methods=['GET'])
+@login_required
+def archived(kind):
+    """Archived rows of one kind, newest first.
+
+    Users see their own rows; admins see everyone's, or one user's with ?user_id=. Page with
+    ?limit= (default 50, max 200) and ?before=<next_before from the previous page>.
+    """
+    policy = POLICIES.get(kind)
+    if policy is None:
+        return jsonify({'error': f'kind must be one of {", ".join(POLICIES)}'}), 404
+    try:
+        user_id = request.args.get('user_id', type=int) if current_user.is_admin else current_user.id
+        before = int(request.args['before']) if request.args.get('before') else None
+        limit = min(max(int(request.args.get('limit', PAGE_DEFAULT)), 1), PAGE_MAX)
+    except ValueError:
+        return jsonify({'error': 'before and limit must be integers'}), 400
+
+    q = ArchivedRow.query.filter(ArchivedRow.table_name == policy.table.name)
+    if user_id is not None:
+        q = q.filter(ArchivedRow.user_id == user_id)
+    if before is not None:
+        q = q.filter(ArchivedRow.row_id < before)
+    rows = q.order_by(ArchivedRow.row_id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    items = [dict(decode(r.data), archived_at=r.archived_at.isoformat() if r.archived_at else None) for r in page]
+    return jsonify({'items': items, 'next_before': page[-1].row_id if len(rows) > limit else None})
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required
 from app.models import db, Category
+from app.projection import list_response
 
 categories_bp = Blueprint('categories', __name__)
 
@@ -8,8 +9,7 @@ categories_bp = Blueprint('categories', __name__)
 @login_required
 def get_categories():
     category_type = request.args.get('type', 'item')  # 'item' or 'store'
-    categories = Category.query.filter_by(type=category_type).all()
-    return jsonify([cat.to_dict() for cat in categories])
+    return list_response(Category.query.filter_by(type=category_type), Category)
 
 @categories_bp.route('/api', methods=['POST'])
 @login_required
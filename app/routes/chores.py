@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
-from app.models import db, Chore, ChoreTracker, ChoreHistory, User, Notification
+from app.models import db, Chore, ChoreTracker, ChoreHistory, User, Notification, Room, user_quick_chores
+from app.projection import list_response, project
+from app import completion
 from datetime import datetime, date
 
 chores_bp = Blueprint('chores', __name__)
@@ -16,21 +18,53 @@ def list_chores():
     users = User.query.all()
     return render_template('chores.html', chores=chores, users=users)
 
+def _chore_eager_options():
+    """Load everything Chore.to_dict() touches up front (2 queries in total)."""
+    return (
+        db.selectinload(Chore.rooms).lazyload(Room.chores),
+        db.joinedload(Chore.assigned_user),
+        db.joinedload(Chore.assigned_by),
+    )
+
+
+def _compact_chore(chore):
+    return {
+        'id': chore.id,
+        'task': chore.task,
+        'reward': chore.reward,
+        'frequency': chore.frequency,
+        'assigned_user_id': chore.assigned_user_id,
+        'room_ids': [r.id for r in chore.rooms],
+    }
+
+
+def chores_payload(session, args):
+    """(payload, error) for GET /chores/api on any session; the async API (app/asgi.py) shares it."""
+    query = session.query(Chore)
+    if args.get('all') != '1':
+        # Anti-join on an approved completion today; answered from ix_chore_tracker_date_status_chore_id
+        completed_today = session.query(ChoreTracker.id).filter(
+            ChoreTracker.date == date.today(),
+            ChoreTracker.status == 'completed',
+            ChoreTracker.chore_id == Chore.id,
+            ChoreTracker.approved_by_id.isnot(None)  # Only count as completed if approved
+        ).exists()
+        query = query.filter(~completed_today)
+    query = query.order_by(Chore.id)
+    if args.get('compact') == '1':
+        return [_compact_chore(chore) for chore in query.options(db.selectinload(Chore.rooms).lazyload(Room.chores))], None
+    return project(query, Chore, Chore.to_dict, _chore_eager_options(), args)
+
+
 @chores_bp.route('/api', methods=['GET'])
 def get_chores():
-    """Get chores. ?all=1 returns every chore (for dashboard dropdown); otherwise exclude completed-today."""
-    all_chores = request.args.get('all') == '1'
-    if all_chores:
-        chores = Chore.query.all()
-        return jsonify([chore.to_dict() for chore in chores])
-    today = date.today()
-    completed_today_ids = db.session.query(ChoreTracker.chore_id).filter(
-        ChoreTracker.date == today,
-        ChoreTracker.status == 'completed',
-        ChoreTracker.approved_by_id.isnot(None)  # Only count as completed if approved
-    ).subquery()
-    chores = Chore.query.filter(Chore.id.notin_(completed_today_ids)).all()
-    return jsonify([chore.to_dict() for chore in chores])
+    """Get chores. ?all=1 returns every chore (for dashboard dropdown); otherwise exclude completed-today.
+    ?compact=1 returns only id, task, reward, frequency, assigned_user_id and room_ids; ?fields= / ?format=columns
+    project the full objects (see app.projection)."""
+    payload, error = chores_payload(db.session, request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify(payload)
 
 @chores_bp.route('/api', methods=['POST'])
 @login_required
@@ -103,6 +137,7 @@ def delete_chore(chore_id):
     if not chore:
         return jsonify({'error': 'Chore not found'}), 404
     
+    db.session.execute(user_quick_chores.delete().where(user_quick_chores.c.chore_id == chore_id))
     db.session.delete(chore)
     db.session.commit()
     return jsonify({'success': True})
@@ -110,59 +145,34 @@ def delete_chore(chore_id):
 @chores_bp.route('/api/<int:chore_id>/complete', methods=['POST'])
 @login_required
 def complete_chore(chore_id):
-    from app.models import ChoreHistory, Room
     chore = db.session.get(Chore, chore_id)
     if not chore:
         return jsonify({'error': 'Chore not found'}), 404
     
-    # Get room name if exists
-    room_name = None
-    if chore.room_id:
-        room = db.session.get(Room, chore.room_id)
-        if room:
-            room_name = room.name
-    elif chore.rooms and len(chore.rooms) > 0:
-        room_name = chore.rooms[0].name
-    
-    # Get assigned user name
-    assigned_user_name = None
-    if chore.assigned_user:
-        assigned_user_name = chore.assigned_user.name
-    
-    # Create history entry (permanent record)
-    history = ChoreHistory(
-        chore_id=chore_id,
-        task=chore.task,
-        frequency=chore.frequency,
-        assigned_user_id=chore.assigned_user_id,
-        assigned_user_name=assigned_user_name,
-        room_id=chore.room_id,
-        room_name=room_name,
-        reward=chore.reward,
-        completed_date=date.today()
-    )
-    db.session.add(history)
-    
-    # Create tracker entry for today
-    tracker = ChoreTracker(
-        chore_id=chore_id,
-        date=date.today(),
-        status='completed'
-    )
-    db.session.add(tracker)
+    # Complete today's open tracker entry if there is one, otherwise record a new one
+    today = date.today()
+    tracker = ChoreTracker.query.filter(
+        ChoreTracker.chore_id == chore_id,
+        ChoreTracker.date == today,
+        ChoreTracker.status.in_(('pending', 'pending_approval'))
+    ).first()
+    if not tracker:
+        tracker = ChoreTracker(chore_id=chore_id, date=today)
+        db.session.add(tracker)
+    tracker.status = 'completed'
     
-    # Add reward to user's bank
-    if chore.assigned_user:
-        chore.assigned_user.bank += chore.reward
+    # History entry (permanent record) and reward, less any late penalty
+    result = completion.complete_trackers([tracker], today)[0]
     
     db.session.commit()
-    return jsonify({'success': True, 'message': 'Chore completed and reward added'})
+    message = 'Chore completed and reward added' if result['rewarded'] else 'Chore completed (already rewarded today)'
+    return jsonify({'success': True, 'message': message, 'reward': result['reward'], 'penalty': result['penalty']})
 
 @chores_bp.route('/tracker', methods=['GET'])
 def get_tracker():
     """Get chore tracker entries - public endpoint for viewing"""
-    trackers = ChoreTracker.query.order_by(ChoreTracker.date.desc()).all()
-    return jsonify([tracker.to_dict() for tracker in trackers])
+    query = ChoreTracker.query.order_by(ChoreTracker.date.desc())
+    return list_response(query, ChoreTracker)
 
 @chores_bp.route('/tracker/completed', methods=['GET'])
 def get_completed_tracker():
@@ -223,12 +233,9 @@ def create_tracker_entry():
     db.session.commit()
     return jsonify(tracker.to_dict()), 201
 
-LATE_PENALTY_PER_DAY = 2  # tokens deducted per day late
-
 @chores_bp.route('/tracker/<int:tracker_id>', methods=['PUT'])
 @login_required
 def update_tracker_entry(tracker_id):
-    from app.models import ChoreHistory, Room
     tracker = db.session.get(ChoreTracker, tracker_id)
     if not tracker:
         return jsonify({'error': 'Tracker entry not found'}), 404
@@ -290,38 +297,7 @@ def update_tracker_entry(tracker_id):
             
             # Handle completed status - only give reward if approved_by_id is set
             if new_status == 'completed' and tracker.approved_by_id:
-                today = date.today()
-                due_date = (tracker.due_by_datetime.date() if tracker.due_by_datetime else None) or tracker.date
-                days_late = max(0, (today - due_date).days)
-                penalty = LATE_PENALTY_PER_DAY * days_late
-                reward_to_add = max(0.0, float(chore.reward) - penalty)
-                existing = ChoreHistory.query.filter_by(
-                    chore_id=chore.id,
-                    completed_date=today
-                ).first()
-                if not existing:
-                    room_name = None
-                    if chore.room_id:
-                        room = db.session.get(Room, chore.room_id)
-                        if room:
-                            room_name = room.name
-                    elif chore.rooms and len(chore.rooms) > 0:
-                        room_name = chore.rooms[0].name
-                    assigned_name = chore.assigned_user.name if chore.assigned_user else None
-                    history = ChoreHistory(
-                        chore_id=chore.id,
-                        task=chore.task,
-                        frequency=chore.frequency,
-                        assigned_user_id=chore.assigned_user_id,
-                        assigned_user_name=assigned_name,
-                        room_id=chore.room_id,
-                        room_name=room_name,
-                        reward=reward_to_add,
-                        completed_date=today
-                    )
-                    db.session.add(history)
-                    if chore.assigned_user:
-                        chore.assigned_user.bank += reward_to_add
+                completion.complete_trackers([tracker])
             
             # Handle reinstatement - when status changes from pending_approval back to pending
             if new_status == 'pending' and old_status == 'pending_approval':
@@ -345,7 +321,6 @@ def update_tracker_entry(tracker_id):
 @login_required
 def approve_chore_completion(tracker_id):
     """Approve a chore that's pending approval. Only the assigner can approve."""
-    from app.models import ChoreHistory, Room
     tracker = db.session.get(ChoreTracker, tracker_id)
     if not tracker:
         return jsonify({'error': 'Tracker entry not found'}), 404
@@ -370,39 +345,7 @@ def approve_chore_completion(tracker_id):
     tracker.approved_by_id = current_user.id
     
     # Now give the reward
-    today = date.today()
-    due_date = (tracker.due_by_datetime.date() if tracker.due_by_datetime else None) or tracker.date
-    days_late = max(0, (today - due_date).days)
-    penalty = LATE_PENALTY_PER_DAY * days_late
-    reward_to_add = max(0.0, float(chore.reward) - penalty)
-    
-    existing = ChoreHistory.query.filter_by(
-        chore_id=chore.id,
-        completed_date=today
-    ).first()
-    if not existing:
-        room_name = None
-        if chore.room_id:
-            room = db.session.get(Room, chore.room_id)
-            if room:
-                room_name = room.name
-        elif chore.rooms and len(chore.rooms) > 0:
-            room_name = chore.rooms[0].name
-        assigned_name = chore.assigned_user.name if chore.assigned_user else None
-        history = ChoreHistory(
-            chore_id=chore.id,
-            task=chore.task,
-            frequency=chore.frequency,
-            assigned_user_id=chore.assigned_user_id,
-            assigned_user_name=assigned_name,
-            room_id=chore.room_id,
-            room_name=room_name,
-            reward=reward_to_add,
-            completed_date=today
-        )
-        db.session.add(history)
-        if chore.assigned_user:
-            chore.assigned_user.bank += reward_to_add
+    completion.complete_trackers([tracker])
     
     tracker.updated_at = datetime.utcnow()
     tracker.updated_by_id = current_user.id
@@ -410,6 +353,53 @@ def approve_chore_completion(tracker_id):
     db.session.commit()
     return jsonify(tracker.to_dict())
 
+MAX_BULK_APPROVE = 500
+
+@chores_bp.route('/tracker/approve', methods=['POST'])
+@login_required
+def approve_chore_completions():
+    """Approve many pending-approval entries at once: {"tracker_ids": [...]}.
+
+    Entries the current user may not approve (same rule as the single approve) or that are not
+    pending approval are listed in `skipped`; the rest are approved and rewarded in one transaction.
+    """
+    data = request.get_json() or {}
+    raw_ids = data.get('tracker_ids')
+    if not isinstance(raw_ids, list) or not raw_ids:
+        return jsonify({'error': 'tracker_ids must be a non-empty list'}), 400
+    try:
+        tracker_ids = list(dict.fromkeys(int(i) for i in raw_ids))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'tracker_ids must be integers'}), 400
+    if len(tracker_ids) > MAX_BULK_APPROVE:
+        return jsonify({'error': f'At most {MAX_BULK_APPROVE} entries can be approved at once'}), 400
+    
+    trackers = {t.id: t for t in ChoreTracker.query.options(db.joinedload(ChoreTracker.chore))
+                .filter(ChoreTracker.id.in_(tracker_ids))}
+    approved, skipped = [], []
+    now = datetime.utcnow()
+    for tracker_id in tracker_ids:
+        tracker = trackers.get(tracker_id)
+        chore = tracker.chore if tracker else None
+        if not tracker or not chore:
+            error = 'Tracker entry not found' if not tracker else 'Chore not found'
+        elif not (chore.assigned_by_id == current_user.id if chore.assigned_by_id else current_user.is_admin):
+            error = 'Only the assigner or admin can approve completion'
+        elif tracker.status != 'pending_approval':
+            error = 'Chore is not pending approval'
+        else:
+            tracker.status = 'completed'
+            tracker.approved_by_id = current_user.id
+            tracker.updated_at = now
+            tracker.updated_by_id = current_user.id
+            approved.append(tracker)
+            continue
+        skipped.append({'tracker_id': tracker_id, 'error': error})
+    
+    results = completion.complete_trackers(approved)
+    db.session.commit()
+    return jsonify({'approved': results, 'skipped': skipped})
+
 @chores_bp.route('/tracker/<int:tracker_id>/reinstate', methods=['POST'])
 @login_required
 def reinstate_chore(tracker_id):
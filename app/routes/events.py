@@ -1,10 +1,93 @@
 from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
-from app.models import db, Event
-from datetime import datetime
+from sqlalchemy.orm import joinedload
+from app.models import db, Event, ChoreTracker, user_quick_events
+from app.projection import project
+from datetime import datetime, date, timedelta
+import calendar
 
 events_bp = Blueprint('events', __name__)
 
+RECURRENCES = ('daily', 'weekly', 'monthly', 'yearly')
+MAX_CALENDAR_DAYS = 62  # a month view plus leading/trailing weeks
+
+
+def _apply_recurrence(event, data):
+    """Apply recurrence fields from request data to event. Returns an error message or None."""
+    if 'recurrence' in data:
+        val = (data.get('recurrence') or '').strip().lower() or None
+        if val and val not in RECURRENCES:
+            return f'recurrence must be one of: {", ".join(RECURRENCES)}'
+        event.recurrence = val
+    if 'recurrence_interval' in data:
+        try:
+            event.recurrence_interval = max(1, int(data.get('recurrence_interval') or 1))
+        except (TypeError, ValueError):
+            return 'Invalid recurrence_interval'
+    if 'recurrence_until' in data:
+        val = data.get('recurrence_until')
+        try:
+            event.recurrence_until = datetime.strptime(val, '%Y-%m-%d').date() if val else None
+        except ValueError:
+            return 'recurrence_until must be YYYY-MM-DD'
+    return None
+
+
+def _add_months(d, months):
+    """Same day-of-month N months later, or None when that month is too short (e.g. the 31st)."""
+    month_index = d.month - 1 + months
+    year, month = d.year + month_index // 12, month_index % 12 + 1
+    if d.day > calendar.monthrange(year, month)[1]:
+        return None
+    return d.replace(year=year, month=month)
+
+
+def occurrences(event, start, end):
+    """Dates on which event falls within [start, end], expanding recurrence."""
+    if not event.recurrence:
+        return [event.date] if start <= event.date <= end else []
+    last = min(end, event.recurrence_until) if event.recurrence_until else end
+    step = event.recurrence_interval or 1
+    out = []
+    if event.recurrence in ('daily', 'weekly'):
+        step_days = step * (7 if event.recurrence == 'weekly' else 1)
+        # Jump straight to the first occurrence on/after start instead of walking from event.date
+        skip = max(0, (start - event.date).days + step_days - 1) // step_days
+        d = event.date + timedelta(days=skip * step_days)
+        while d <= last:
+            out.append(d)
+            d += timedelta(days=step_days)
+        return out
+    months = step * (12 if event.recurrence == 'yearly' else 1)
+    n = max(0, (start.year - event.date.year) * 12 + start.month - event.date.month) // months
+    while _add_months(event.date.replace(day=1), n * months) <= last:
+        d = _add_months(event.date, n * months)
+        if d and start <= d <= last:
+            out.append(d)
+        n += 1
+    return out
+
+
+def occurs_on(event, day):
+    """Whether event (or its recurrence) falls on day."""
+    return bool(occurrences(event, day, day))
+
+
+def _calendar_window(args):
+    """Resolve (start, end, view) from ?view=month|week&date= or explicit start_date/end_date."""
+    view = args.get('view', 'month')
+    if args.get('start_date') and args.get('end_date'):
+        start = datetime.strptime(args['start_date'], '%Y-%m-%d').date()
+        end = datetime.strptime(args['end_date'], '%Y-%m-%d').date()
+        return start, end, 'range'
+    anchor = datetime.strptime(args['date'], '%Y-%m-%d').date() if args.get('date') else date.today()
+    if view == 'week':
+        # Weeks start on Sunday, matching the dashboard calendar grid
+        start = anchor - timedelta(days=(anchor.weekday() + 1) % 7)
+        return start, start + timedelta(days=6), 'week'
+    start = anchor.replace(day=1)
+    return start, start.replace(day=calendar.monthrange(start.year, start.month)[1]), 'month'
+
 
 @events_bp.route('/')
 @login_required
@@ -13,20 +96,106 @@ def list_events():
     return render_template('events.html')
 
 
-@events_bp.route('/api', methods=['GET'])
-def get_events():
-    """Get events - public endpoint for calendar"""
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+def events_payload(session, args):
+    """(payload, error) for GET /events/api on any session; the async API (app/asgi.py) shares it.
+
+    Recurring events are returned once, as the series (date is the first occurrence, with the
+    recurrence fields), when they overlap the range; /events/api/calendar expands them into dates.
+    """
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
     
-    query = Event.query
+    query = session.query(Event)
     if start_date:
-        query = query.filter(Event.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        # Recurring series that started earlier but are still running overlap the range too
+        query = query.filter(db.or_(
+            Event.date >= start,
+            db.and_(Event.recurrence.isnot(None), db.or_(Event.recurrence_until.is_(None), Event.recurrence_until >= start)),
+        ))
     if end_date:
         query = query.filter(Event.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
     
-    events = query.all()
-    return jsonify([event.to_dict() for event in events])
+    return project(query, Event, Event.to_dict, (joinedload(Event.updated_by),), args)
+
+
+@events_bp.route('/api', methods=['GET'])
+def get_events():
+    """Get events (recurring ones as series, not occurrences) - public endpoint for the events list"""
+    payload, error = events_payload(db.session, request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify(payload)
+
+
+@events_bp.route('/api/calendar', methods=['GET'])
+def get_calendar():
+    """Events (recurring ones expanded) and chore trackers bucketed by day for a month/week/range.
+
+    Trackers go on the day they are due, or on their date when they have no due time.
+    """
+    try:
+        start, end, view = _calendar_window(request.args)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    if end < start:
+        return jsonify({'error': 'end_date must not be before start_date'}), 400
+    if (end - start).days >= MAX_CALENDAR_DAYS:
+        return jsonify({'error': f'Range is limited to {MAX_CALENDAR_DAYS} days'}), 400
+
+    days = {}
+    d = start
+    while d <= end:
+        days[d.isoformat()] = {'events': [], 'chores': []}
+        d += timedelta(days=1)
+
+    # One-off events hit the date index directly; recurring events are few and expanded here
+    events = Event.query.options(joinedload(Event.updated_by)).filter(db.or_(
+        db.and_(Event.recurrence.is_(None), Event.date >= start, Event.date <= end),
+        db.and_(
+            Event.recurrence.isnot(None),
+            Event.date <= end,
+            db.or_(Event.recurrence_until.is_(None), Event.recurrence_until >= start),
+        ),
+    )).order_by(Event.time).all()
+    for event in events:
+        ev = event.to_dict()
+        for occurrence in occurrences(event, start, end):
+            days[occurrence.isoformat()]['events'].append(dict(ev, occurrence_date=occurrence.isoformat()))
+
+    trackers = ChoreTracker.query.options(
+        joinedload(ChoreTracker.chore), joinedload(ChoreTracker.assigned_user)
+    ).filter(db.or_(
+        db.and_(
+            ChoreTracker.due_by_datetime >= datetime.combine(start, datetime.min.time()),
+            ChoreTracker.due_by_datetime < datetime.combine(end + timedelta(days=1), datetime.min.time()),
+        ),
+        db.and_(ChoreTracker.due_by_datetime.is_(None), ChoreTracker.date >= start, ChoreTracker.date <= end),
+    )).order_by(ChoreTracker.due_by_datetime, ChoreTracker.id).all()
+    for t in trackers:
+        day = t.due_by_datetime.date() if t.due_by_datetime else t.date
+        days[day.isoformat()]['chores'].append({
+            'id': t.id,
+            'chore_id': t.chore_id,
+            'chore_task': t.chore.task if t.chore else None,
+            'date': t.date.isoformat(),
+            'due_by_datetime': t.due_by_datetime.isoformat() if t.due_by_datetime else None,
+            'due_by_time': t.due_by_datetime.time().strftime('%H:%M') if t.due_by_datetime else None,
+            'frequency': t.frequency,
+            'assigned_user_id': t.assigned_user_id,
+            'assigned_user_name': t.assigned_user.name if t.assigned_user else None,
+            'room_id': t.room_id,
+            'status': t.status,
+            'is_overdue': bool(t.is_overdue),
+            'accrued_penalty': t.accrued_penalty or 0.0,
+        })
+
+    return jsonify({
+        'view': view,
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'days': days,
+    })
 
 @events_bp.route('/api', methods=['POST'])
 @login_required
@@ -40,6 +209,9 @@ def create_event():
         user_id=current_user.id if current_user.is_authenticated else None,
         event_type=data.get('event_type')
     )
+    error = _apply_recurrence(event, data)
+    if error:
+        return jsonify({'error': error}), 400
     db.session.add(event)
     db.session.commit()
     return jsonify(event.to_dict()), 201
@@ -59,6 +231,9 @@ def update_event(event_id):
         event.date = datetime.strptime(data['date'], '%Y-%m-%d').date()
     if data.get('time'):
         event.time = datetime.strptime(data['time'], '%H:%M').time()
+    error = _apply_recurrence(event, data)
+    if error:
+        return jsonify({'error': error}), 400
     event.updated_at = datetime.utcnow()
     event.updated_by_id = current_user.id
 
@@ -72,6 +247,7 @@ def delete_event(event_id):
     if not event:
         return jsonify({'error': 'Event not found'}), 404
     
+    db.session.execute(user_quick_events.delete().where(user_quick_events.c.event_id == event_id))
     db.session.delete(event)
     db.session.commit()
     return jsonify({'success': True})
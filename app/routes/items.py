@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for
 from flask_login import login_required, current_user
 from app.models import db, Item, Category, Store
+from app.projection import list_response
 from app.utils import save_uploaded_file, delete_uploaded_file
 from datetime import datetime
 import json
@@ -46,13 +47,12 @@ def list_items():
 @login_required
 def get_items():
     store_id = request.args.get('store_id', type=int)
+    query = Item.query
     if store_id is not None:
-        items = Item.query.filter(
+        query = query.filter(
             (Item.store_id == store_id) | Item.stores.any(Store.id == store_id)
-        ).all()
-    else:
-        items = Item.query.all()
-    return jsonify([item.to_dict() for item in items])
+        )
+    return list_response(query, Item)
 
 @items_bp.route('/api', methods=['POST'])
 @login_required
@@ -1,9 +1,17 @@
+import math
+
 from flask import Blueprint, render_template, jsonify, request
 from flask_login import login_required, current_user
+from app import notify
 from app.models import Notification, db
+from app.projection import project, raw_fields
 
 notifications_bp = Blueprint('notifications', __name__)
 
+WAIT_DEFAULT_SECONDS = 25
+WAIT_MAX_SECONDS = 60
+WAIT_BATCH = 100
+
 
 @notifications_bp.route('/')
 @login_required
@@ -12,23 +20,85 @@ def list_notifications():
     return render_template('notifications.html')
 
 
+@raw_fields('id', 'message', 'link', 'read', 'created_at')
+def _notification_dict(n):
+    return {'id': n.id, 'message': n.message, 'link': n.link, 'read': n.read, 'created_at': n.created_at.isoformat() if n.created_at else None}
+
+
+def notifications_payload(session, user_id, args):
+    """(payload, error) for GET /notifications/api on any session; the async API (app/asgi.py) shares it."""
+    unread_only = args.get('unread') == '1'
+    q = session.query(Notification).filter_by(user_id=user_id)
+    if unread_only:
+        q = q.filter_by(read=False)
+    q = q.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(100)
+    items, error = project(q, Notification, _notification_dict, args=args)
+    if error:
+        return None, error
+    count = session.query(Notification).filter_by(user_id=user_id, read=False).count()
+    return {
+        'count': count,
+        'items': items
+    }, None
+
+
 @notifications_bp.route('/api')
 @login_required
 def get_notifications():
     """Get notifications for current user (count + items)."""
-    unread_only = request.args.get('unread') == '1'
-    q = Notification.query.filter_by(user_id=current_user.id)
-    if unread_only:
-        q = q.filter_by(read=False)
-    items = q.order_by(Notification.created_at.desc()).limit(100).all()
-    count = Notification.query.filter_by(user_id=current_user.id, read=False).count()
-    return jsonify({
-        'count': count,
-        'items': [
-            {'id': n.id, 'message': n.message, 'link': n.link, 'read': n.read, 'created_at': n.created_at.isoformat() if n.created_at else None}
-            for n in items
-        ]
-    })
+    payload, error = notifications_payload(db.session, current_user.id, request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify(payload)
+
+
+def wait_args(args):
+    """(after, timeout, error) from ?after=<id>&timeout=<seconds>; after is None when omitted."""
+    try:
+        after = int(args['after']) if args.get('after') not in (None, '') else None
+        timeout = float(args.get('timeout', WAIT_DEFAULT_SECONDS))
+        if not math.isfinite(timeout):
+            raise ValueError(timeout)  # nan would make the wait block forever
+    except ValueError:
+        return None, None, 'after must be a notification id and timeout a number of seconds'
+    return after, min(max(timeout, 0.0), WAIT_MAX_SECONDS), None
+
+
+def notifications_after(session, user_id, after):
+    """{'cursor', 'items'} for the user's notifications with id > after, oldest first.
+
+    With after None, items is empty and cursor is the newest id, so a client can start waiting.
+    """
+    if after is None:
+        latest = session.query(db.func.max(Notification.id)).filter(Notification.user_id == user_id).scalar()
+        return {'cursor': latest or 0, 'items': []}
+    rows = session.query(Notification).filter(Notification.user_id == user_id, Notification.id > after).order_by(
+        Notification.id).limit(WAIT_BATCH).all()
+    return {'cursor': rows[-1].id if rows else after, 'items': [_notification_dict(n) for n in rows]}
+
+
+@notifications_bp.route('/api/wait')
+@login_required
+def wait_notifications():
+    """Long-poll: hold until the current user has notifications newer than ?after=<id>.
+
+    Answers immediately if there already are some (or after is omitted), otherwise after a
+    commit inserts one for this user or ?timeout= seconds (default 25, max 60) pass, with empty
+    items. No queries run while waiting; pass the returned cursor as the next request's after.
+    """
+    after, timeout, error = wait_args(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    user_id = current_user.id
+    seen = notify.generation(user_id)
+    payload = notifications_after(db.session, user_id, after)
+    if payload['items'] or after is None or timeout <= 0:
+        return jsonify(payload)
+    # Give the pooled connection back while this thread sleeps
+    db.session.close()
+    if notify.wait(user_id, seen, timeout):
+        payload = notifications_after(db.session, user_id, after)
+    return jsonify(payload)
 
 
 @notifications_bp.route('/api/<int:notification_id>/read', methods=['PATCH', 'POST'])
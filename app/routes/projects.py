@@ -1,11 +1,16 @@
 from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
-from datetime import date
+from datetime import date, datetime
 from app.models import db, Project, User, Notification, project_users
-from app.utils import save_uploaded_file, delete_uploaded_file
+from app.projection import list_response
+from app import analytics
+from app.utils import save_uploaded_file, delete_uploaded_file, save_thumbnail, thumbnail_path
 
 projects_bp = Blueprint('projects', __name__)
 
+HISTORY_DAYS_DEFAULT = 14
+HISTORY_DAYS_MAX = 90
+
 @projects_bp.route('/')
 @login_required
 def list_projects():
@@ -16,26 +21,61 @@ def list_projects():
 @projects_bp.route('/api', methods=['GET'])
 @login_required
 def get_projects():
-    projects = Project.query.filter_by(completed=False).all()
-    return jsonify([project.to_dict() for project in projects])
+    return list_response(Project.query.filter_by(completed=False), Project)
+
+def _history_dict(project):
+    data = project.to_dict()
+    photo = data.pop('completed_photo')
+    thumb = save_thumbnail(photo) if photo else None
+    data['photo_url'] = f'/static/uploads/{photo}' if photo else None
+    data['thumbnail_url'] = f'/static/uploads/{thumb}' if thumb else data['photo_url']
+    return data
+
 
 @projects_bp.route('/api/completed', methods=['GET'])
 @login_required
 def get_completed_projects():
-    """Get completed projects grouped by date"""
-    from datetime import date
-    completed_projects = Project.query.filter_by(completed=True).order_by(Project.completed_date.desc()).all()
-    
-    # Group by date
-    grouped = {}
-    for project in completed_projects:
-        date_str = project.completed_date.isoformat() if project.completed_date else None
-        if date_str:
-            if date_str not in grouped:
-                grouped[date_str] = []
-            grouped[date_str].append(project.to_dict())
-    
-    return jsonify(grouped)
+    """Completed projects grouped by completion date, newest day first.
+
+    Each page holds up to ?days= dates (default 14, max 90); filter with ?start_date=&end_date=
+    (YYYY-MM-DD) and continue with ?before=<next_before>. Photos are returned as thumbnail_url
+    (generated on first use) plus photo_url for the original.
+    """
+    args = request.args
+    try:
+        days = min(max(int(args.get('days', HISTORY_DAYS_DEFAULT)), 1), HISTORY_DAYS_MAX)
+        start = datetime.strptime(args['start_date'], '%Y-%m-%d').date() if args.get('start_date') else None
+        end = datetime.strptime(args['end_date'], '%Y-%m-%d').date() if args.get('end_date') else None
+        before = datetime.strptime(args['before'], '%Y-%m-%d').date() if args.get('before') else None
+    except ValueError:
+        return jsonify({'error': 'days must be an integer, dates YYYY-MM-DD'}), 400
+
+    conds = [Project.completed.is_(True), Project.completed_date.isnot(None)]
+    if start:
+        conds.append(Project.completed_date >= start)
+    if end:
+        conds.append(Project.completed_date <= end)
+    if before:
+        conds.append(Project.completed_date < before)
+    day_counts = db.session.execute(
+        db.select(Project.completed_date, db.func.count(Project.id)).where(*conds)
+        .group_by(Project.completed_date).order_by(Project.completed_date.desc()).limit(days + 1)
+    ).all()
+    page = day_counts[:days]
+    if not page:
+        return jsonify({'days': [], 'next_before': None})
+
+    projects = Project.query.options(
+        db.joinedload(Project.user), db.joinedload(Project.completed_by), db.selectinload(Project.assigned_users),
+    ).filter(*conds, Project.completed_date >= page[-1][0]).order_by(Project.completed_date.desc(), Project.id.desc())
+    by_day = {}
+    for project in projects:
+        by_day.setdefault(project.completed_date, []).append(_history_dict(project))
+    return jsonify({
+        'days': [{'date': day.isoformat(), 'count': count, 'projects': by_day.get(day, [])} for day, count in page],
+        'next_before': page[-1][0].isoformat() if len(day_counts) > days else None,
+    })
+
 
 def _parse_user_ids(data):
     """Parse user_ids from request: single id or list of ids."""
@@ -152,11 +192,14 @@ def complete_project(project_id):
             photo_path = save_uploaded_file(f, 'projects')
             if project.completed_photo:
                 delete_uploaded_file(project.completed_photo)
+                delete_uploaded_file(thumbnail_path(project.completed_photo))
             project.completed_photo = photo_path
+            save_thumbnail(photo_path)
     
     # Add reward to primary assignee's bank
     if project.user:
         project.user.bank += project.reward
+        analytics.record(project.user_id, projects_completed=1, project_tokens=project.reward or 0)
     
     project.completed = True
     project.completed_date = date.today()
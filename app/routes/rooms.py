@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required
-from app.models import db, Room, Chore, ChoreTracker, ChoreHistory
+from app.models import db, Room, Chore, ChoreTracker, ChoreHistory, DEFAULT_CLEAN_INTERVAL_DAYS, DEFAULT_DEEP_CLEAN_INTERVAL_DAYS
+from app.projection import list_response
 from datetime import datetime, date, timedelta
 
 rooms_bp = Blueprint('rooms', __name__)
@@ -15,8 +16,51 @@ def list_rooms():
 @rooms_bp.route('/api', methods=['GET'])
 @login_required
 def get_rooms():
-    rooms = Room.query.all()
-    return jsonify([room.to_dict() for room in rooms])
+    return list_response(Room.query, Room)
+
+def _apply_intervals(room, data):
+    """Set clean/deep-clean intervals from request data (days; null or 0 = unscheduled). Returns an error or None."""
+    for key in ('clean_interval_days', 'deep_clean_interval_days'):
+        if key in data:
+            value = data[key]
+            try:
+                value = int(value) if value not in (None, '') else None
+            except (TypeError, ValueError):
+                return f'{key} must be a whole number of days'
+            if value is not None and value < 0:
+                return f'{key} cannot be negative'
+            setattr(room, key, value or 0)
+    return None
+
+@rooms_bp.route('/api/stale', methods=['GET'])
+@login_required
+def get_stale_rooms():
+    """Rooms due for cleaning, most overdue first. ?within=N also includes rooms due in the next N days."""
+    try:
+        within = int(request.args.get('within', 0))
+    except ValueError:
+        return jsonify({'error': 'within must be a whole number of days'}), 400
+    today = date.today()
+    horizon = today + timedelta(days=within)
+    rooms = Room.query.options(db.lazyload(Room.chores)).filter(
+        Room.next_due_date <= horizon
+    ).order_by(Room.next_due_date, Room.id).all()
+    result = []
+    for room in rooms:
+        clean_due, deep_clean_due = room.clean_due(today), room.deep_clean_due(today)
+        result.append({
+            'id': room.id,
+            'name': room.name,
+            'last_cleaned': room.last_cleaned.isoformat() if room.last_cleaned else None,
+            'last_deep_cleaned': room.last_deep_cleaned.isoformat() if room.last_deep_cleaned else None,
+            'next_due_date': room.next_due_date.isoformat(),
+            'days_overdue': (today - room.next_due_date).days,
+            'clean_due': clean_due.isoformat() if clean_due else None,
+            'deep_clean_due': deep_clean_due.isoformat() if deep_clean_due else None,
+            'needs': [kind for kind, due in (('clean', clean_due), ('deep_clean', deep_clean_due))
+                      if due and due <= horizon],
+        })
+    return jsonify(result)
 
 @rooms_bp.route('/api', methods=['POST'])
 @login_required
@@ -25,8 +69,14 @@ def create_room():
     room = Room(
         name=data.get('name'),
         last_deep_cleaned=datetime.strptime(data['last_deep_cleaned'], '%Y-%m-%d').date() if data.get('last_deep_cleaned') else None,
-        last_cleaned=datetime.strptime(data['last_cleaned'], '%Y-%m-%d').date() if data.get('last_cleaned') else None
+        last_cleaned=datetime.strptime(data['last_cleaned'], '%Y-%m-%d').date() if data.get('last_cleaned') else None,
+        clean_interval_days=DEFAULT_CLEAN_INTERVAL_DAYS,
+        deep_clean_interval_days=DEFAULT_DEEP_CLEAN_INTERVAL_DAYS,
     )
+    error = _apply_intervals(room, data)
+    if error:
+        return jsonify({'error': error}), 400
+    room.schedule()
     
     # Add associated chores
     if data.get('chore_ids'):
@@ -62,7 +112,7 @@ def get_room_detail(room_id):
     for c in room.chores:
         last = (
             ChoreTracker.query.filter_by(chore_id=c.id, status='completed')
-            .order_by(ChoreTracker.date.desc())
+            .order_by(ChoreTracker.date.desc(), ChoreTracker.id.desc())
             .first()
         )
         if last:
@@ -108,6 +158,10 @@ def update_room(room_id):
         room.last_deep_cleaned = datetime.strptime(data['last_deep_cleaned'], '%Y-%m-%d').date()
     if data.get('last_cleaned'):
         room.last_cleaned = datetime.strptime(data['last_cleaned'], '%Y-%m-%d').date()
+    error = _apply_intervals(room, data)
+    if error:
+        return jsonify({'error': error}), 400
+    room.schedule()
     
     # Update associated chores
     if 'chore_ids' in data:
@@ -136,6 +190,7 @@ def mark_cleaned(room_id):
         return jsonify({'error': 'Room not found'}), 404
     
     room.last_cleaned = datetime.now().date()
+    room.schedule()
     db.session.commit()
     return jsonify(room.to_dict())
 
@@ -147,5 +202,6 @@ def mark_deep_cleaned(room_id):
         return jsonify({'error': 'Room not found'}), 404
     
     room.last_deep_cleaned = datetime.now().date()
+    room.schedule()
     db.session.commit()
     return jsonify(room.to_dict())
@@ -1,7 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
 from flask_login import login_required, current_user
-from app.models import db, User
+from sqlalchemy import select, and_
+from app.models import db, User, Chore, ChoreTracker, Event, user_quick_chores, user_quick_events
+from app.routes.events import occurs_on
 from app.utils import save_uploaded_file, delete_uploaded_file
+from datetime import date
 import os
 import json
 
@@ -87,75 +90,96 @@ def update_settings():
     
     return jsonify({'success': True, 'profile_image': user.profile_image, 'background_image': user.background_image})
 
+MAX_QUICK_ITEMS = 8
+
+
+def _quick_ids(table, column, user_id):
+    """Ordered ids from a user_quick_* link table."""
+    return [row[0] for row in db.session.execute(
+        select(table.c[column]).where(table.c.user_id == user_id).order_by(table.c.position)
+    )]
+
+
+def _save_quick_ids(table, column, target, user_id, raw_ids, label):
+    """Replace a user's quick list. Returns (saved ids, None) or (None, error response)."""
+    if len(raw_ids) > MAX_QUICK_ITEMS:
+        return None, (jsonify({'error': f'Maximum {MAX_QUICK_ITEMS} quick {label} allowed'}), 400)
+    try:
+        ids = list(dict.fromkeys(int(i) for i in raw_ids))
+    except (ValueError, TypeError):
+        return None, (jsonify({'error': f'Invalid {label[:-1]} IDs'}), 400)
+    # Ids of deleted chores/events are dropped rather than rejected
+    existing = set(db.session.execute(select(target.id).where(target.id.in_(ids))).scalars()) if ids else set()
+    ids = [i for i in ids if i in existing]
+    db.session.execute(table.delete().where(table.c.user_id == user_id))
+    if ids:
+        db.session.execute(table.insert(), [{'user_id': user_id, column: i, 'position': pos} for pos, i in enumerate(ids)])
+    db.session.commit()
+    return ids, None
+
+
 @settings_bp.route('/api/quick-chores', methods=['GET'])
 @login_required
 def get_quick_chores():
     """Get user's selected quick chore IDs"""
-    user = db.session.get(User, current_user.id)
-    if user.quick_chores:
-        try:
-            chore_ids = json.loads(user.quick_chores)
-            return jsonify({'chore_ids': chore_ids})
-        except:
-            return jsonify({'chore_ids': []})
-    return jsonify({'chore_ids': []})
+    return jsonify({'chore_ids': _quick_ids(user_quick_chores, 'chore_id', current_user.id)})
 
 @settings_bp.route('/api/quick-chores', methods=['PUT'])
 @login_required
 def update_quick_chores():
     """Update user's selected quick chore IDs (max 8)"""
-    user = db.session.get(User, current_user.id)
-    data = request.json
-    chore_ids = data.get('chore_ids', [])
-    
-    # Limit to 8 chores
-    if len(chore_ids) > 8:
-        return jsonify({'error': 'Maximum 8 quick chores allowed'}), 400
-    
-    # Validate that all IDs are integers
-    try:
-        chore_ids = [int(id) for id in chore_ids]
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Invalid chore IDs'}), 400
-    
-    user.quick_chores = json.dumps(chore_ids)
-    db.session.commit()
-    
+    data = request.json or {}
+    chore_ids, error = _save_quick_ids(user_quick_chores, 'chore_id', Chore, current_user.id, data.get('chore_ids', []), 'chores')
+    if error:
+        return error
     return jsonify({'success': True, 'chore_ids': chore_ids})
 
 @settings_bp.route('/api/quick-events', methods=['GET'])
 @login_required
 def get_quick_events():
     """Get user's selected quick event IDs"""
-    user = db.session.get(User, current_user.id)
-    if user.quick_events:
-        try:
-            event_ids = json.loads(user.quick_events)
-            return jsonify({'event_ids': event_ids})
-        except:
-            return jsonify({'event_ids': []})
-    return jsonify({'event_ids': []})
+    return jsonify({'event_ids': _quick_ids(user_quick_events, 'event_id', current_user.id)})
 
 @settings_bp.route('/api/quick-events', methods=['PUT'])
 @login_required
 def update_quick_events():
     """Update user's selected quick event IDs (max 8)"""
-    user = db.session.get(User, current_user.id)
-    data = request.json
-    event_ids = data.get('event_ids', [])
-    
-    # Limit to 8 events
-    if len(event_ids) > 8:
-        return jsonify({'error': 'Maximum 8 quick events allowed'}), 400
-    
-    # Validate that all IDs are integers
-    try:
-        event_ids = [int(id) for id in event_ids]
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Invalid event IDs'}), 400
-    
-    user.quick_events = json.dumps(event_ids)
-    db.session.commit()
-    
+    data = request.json or {}
+    event_ids, error = _save_quick_ids(user_quick_events, 'event_id', Event, current_user.id, data.get('event_ids', []), 'events')
+    if error:
+        return error
     return jsonify({'success': True, 'event_ids': event_ids})
 
+@settings_bp.route('/api/quick', methods=['GET'])
+@login_required
+def get_quick_items():
+    """User's quick chores (with today's tracker status) and quick events, resolved in order."""
+    today = date.today()
+    rows = db.session.execute(
+        select(Chore.id, Chore.task, Chore.reward, Chore.frequency, Chore.room_id,
+               ChoreTracker.id, ChoreTracker.status, ChoreTracker.assigned_user_id)
+        .join(user_quick_chores, user_quick_chores.c.chore_id == Chore.id)
+        .outerjoin(ChoreTracker, and_(ChoreTracker.chore_id == Chore.id, ChoreTracker.date == today))
+        .where(user_quick_chores.c.user_id == current_user.id)
+        .order_by(user_quick_chores.c.position, ChoreTracker.id)
+    ).all()
+    chores = {}
+    for chore_id, task, reward, frequency, room_id, tracker_id, status, assignee_id in rows:
+        # Several trackers today: prefer the one assigned to this user
+        if chore_id in chores and not (assignee_id == current_user.id and chores[chore_id]['assigned_user_id'] != current_user.id):
+            continue
+        chores[chore_id] = {'id': chore_id, 'task': task, 'reward': reward, 'frequency': frequency, 'room_id': room_id,
+                            'tracker_id': tracker_id, 'status': status, 'assigned_user_id': assignee_id}
+    events = db.session.execute(
+        select(Event)
+        .join(user_quick_events, user_quick_events.c.event_id == Event.id)
+        .where(user_quick_events.c.user_id == current_user.id)
+        .order_by(user_quick_events.c.position)
+    ).scalars().all()
+    return jsonify({
+        'chores': list(chores.values()),
+        'events': [{'id': e.id, 'title': e.title, 'event_type': e.event_type, 'date': e.date.isoformat(),
+                    'time': e.time.strftime('%H:%M') if e.time else None, 'recurrence': e.recurrence,
+                    'today': occurs_on(e, today)} for e in events],
+    })
+
@@ -1,10 +1,108 @@
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for
 from flask_login import login_required, current_user
-from app.models import db, ShoppingList, ShoppingListItem, Store, Item
+from app.models import db, ShoppingList, ShoppingListItem, Store, Item, normalize_item_name
+from app.projection import list_response
 from datetime import datetime
 
 shopping_lists_bp = Blueprint('shopping_lists', __name__)
 
+
+def _resolve_items(names, store_id):
+    """Map normalized names to Items with one indexed lookup, creating Items that don't exist yet.
+    When several items share a name, prefer one sold at store_id."""
+    wanted = {}
+    for name in names:
+        key = normalize_item_name(name)
+        if key:
+            wanted.setdefault(key, ' '.join(name.split()))
+    if not wanted:
+        return {}
+    candidates = Item.query.options(db.selectinload(Item.stores)).filter(
+        Item.name_normalized.in_(list(wanted))
+    ).order_by(Item.id).all()
+    matched = {}
+    for item in candidates:
+        at_store = item.store_id == store_id or bool(store_id and any(s.id == store_id for s in item.stores))
+        if item.name_normalized not in matched or (at_store and not matched[item.name_normalized][1]):
+            matched[item.name_normalized] = (item, at_store)
+    resolved = {key: item for key, (item, _) in matched.items()}
+    store = db.session.get(Store, store_id) if store_id else None
+    for key, name in wanted.items():
+        if key not in resolved:
+            item = Item(name=name, quantity=0, store_id=store_id)
+            if store:
+                item.stores.append(store)
+            db.session.add(item)
+            resolved[key] = item
+    db.session.flush()
+    return resolved
+
+
+def _sync_list_items(shopping_list, entries, prune=True):
+    """Upsert entries into shopping_list in the current transaction and return (created, updated, removed).
+    Each entry matches an existing row by id, then item_id, then normalized name; rows no entry
+    matched are deleted when prune is true."""
+    existing = ShoppingListItem.query.filter_by(shopping_list_id=shopping_list.id).all()
+    by_id = {row.id: row for row in existing}
+    by_item_id, by_name = {}, {}
+    for row in existing:
+        if row.item_id:
+            by_item_id.setdefault(row.item_id, row)
+        by_name.setdefault(normalize_item_name(row.name), row)
+
+    matched, unmatched, kept = [], [], set()
+    for entry in entries:
+        name = (entry.get('name') or '').strip()
+        candidates = (by_id.get(entry.get('id')), by_item_id.get(entry.get('item_id')), by_name.get(normalize_item_name(name)))
+        row = next((r for r in candidates if r is not None and r.id not in kept), None)
+        if row is None:
+            unmatched.append(entry)
+        else:
+            kept.add(row.id)
+            matched.append((row, entry))
+
+    for row, entry in matched:
+        if (entry.get('name') or '').strip():
+            row.name = entry['name'].strip()
+        if entry.get('item_id'):
+            row.item_id = entry['item_id']
+        if 'quantity' in entry:
+            row.quantity = float(entry.get('quantity') or 1.0)
+        if 'unit' in entry:
+            row.unit = entry.get('unit')
+        if 'checked' in entry:
+            row.checked = bool(entry.get('checked'))
+
+    # New rows: one lookup for items referenced by id, one for items matched by name
+    item_ids = [e['item_id'] for e in unmatched if e.get('item_id')]
+    items_by_id = {i.id: i for i in Item.query.filter(Item.id.in_(item_ids)).all()} if item_ids else {}
+    resolved = _resolve_items([(e.get('name') or '') for e in unmatched if not e.get('item_id')], shopping_list.store_id)
+    for entry in unmatched:
+        name = (entry.get('name') or '').strip()
+        item = items_by_id.get(entry.get('item_id')) or resolved.get(normalize_item_name(name))
+        db.session.add(ShoppingListItem(
+            shopping_list_id=shopping_list.id,
+            item_id=item.id if item else None,
+            name=name or (item.name if item else None) or 'Item',
+            quantity=float(entry.get('quantity') or 1.0),
+            unit=entry.get('unit'),
+            checked=bool(entry.get('checked', False))
+        ))
+
+    removed = 0
+    stale_ids = [row.id for row in existing if row.id not in kept]
+    if prune and stale_ids:
+        removed = ShoppingListItem.query.filter(ShoppingListItem.id.in_(stale_ids)).delete(synchronize_session='fetch')
+    return len(unmatched), len(matched), removed
+
+
+def _parse_item_entries(data):
+    """Return the list of item dicts from data['items'], or None if it is malformed."""
+    entries = data.get('items')
+    if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+        return None
+    return entries
+
 @shopping_lists_bp.route('/')
 def list_shopping_lists():
     """Redirect to Shopping page (lists section is there)."""
@@ -13,8 +111,8 @@ def list_shopping_lists():
 @shopping_lists_bp.route('/api', methods=['GET'])
 def get_shopping_lists():
     """Get all active shopping lists"""
-    shopping_lists = ShoppingList.query.filter_by(completed=False).order_by(ShoppingList.created_at.desc()).all()
-    return jsonify([sl.to_dict() for sl in shopping_lists])
+    query = ShoppingList.query.filter_by(completed=False).order_by(ShoppingList.created_at.desc())
+    return list_response(query, ShoppingList)
 
 @shopping_lists_bp.route('/api/completed', methods=['GET'])
 def get_completed_shopping_lists():
@@ -46,6 +144,12 @@ def create_shopping_list():
         actual_spent=float(data.get('actual_spent', 0))
     )
     db.session.add(shopping_list)
+    if 'items' in data:
+        entries = _parse_item_entries(data)
+        if entries is None:
+            return jsonify({'error': 'items must be a list of objects'}), 400
+        db.session.flush()
+        _sync_list_items(shopping_list, entries)
     db.session.commit()
     return jsonify(shopping_list.to_dict()), 201
 
@@ -72,6 +176,11 @@ def update_shopping_list(list_id):
         shopping_list.completed = data.get('completed', shopping_list.completed)
     shopping_list.budget = float(data.get('budget', shopping_list.budget))
     shopping_list.actual_spent = float(data.get('actual_spent', shopping_list.actual_spent))
+    if 'items' in data:
+        entries = _parse_item_entries(data)
+        if entries is None:
+            return jsonify({'error': 'items must be a list of objects'}), 400
+        _sync_list_items(shopping_list, entries)
     
     db.session.commit()
     return jsonify(shopping_list.to_dict())
@@ -100,6 +209,29 @@ def clear_list_items(list_id):
     return jsonify({'success': True})
 
 
+@shopping_lists_bp.route('/api/<int:list_id>/items', methods=['PUT'])
+@login_required
+def sync_list_items(list_id):
+    """Bulk upsert: bring the list's items in line with {"items": [...]} in one transaction.
+    Pass "prune": false to only add/update without removing rows missing from the payload."""
+    shopping_list = db.session.get(ShoppingList, list_id)
+    if not shopping_list:
+        return jsonify({'error': 'Shopping list not found'}), 404
+    data = request.json or {}
+    entries = _parse_item_entries(data)
+    if entries is None:
+        return jsonify({'error': 'items must be a list of objects'}), 400
+    created, updated, removed = _sync_list_items(shopping_list, entries, prune=data.get('prune', True) is not False)
+    db.session.commit()
+    rows = ShoppingListItem.query.filter_by(shopping_list_id=list_id).order_by(ShoppingListItem.id).all()
+    return jsonify({
+        'items': [row.to_dict() for row in rows],
+        'created': created,
+        'updated': updated,
+        'removed': removed
+    })
+
+
 @shopping_lists_bp.route('/api/<int:list_id>/items', methods=['POST'])
 @login_required
 def add_item_to_list(list_id):
@@ -115,20 +247,7 @@ def add_item_to_list(list_id):
     unit = data.get('unit')
     
     if not item_id and name:
-        store_id = shopping_list.store_id
-        existing = Item.query.filter(Item.name.ilike(name)).all()
-        item_obj = next((i for i in existing if (i.store_id == store_id or (store_id and any(s.id == store_id for s in i.stores)))), None)
-        if not item_obj and existing:
-            item_obj = existing[0]
-        if not item_obj:
-            item_obj = Item(name=name, quantity=0, store_id=store_id)
-            db.session.add(item_obj)
-            db.session.flush()
-            if store_id:
-                store = db.session.get(Store, store_id)
-                if store and store not in item_obj.stores:
-                    item_obj.stores.append(store)
-        item_id = item_obj.id
+        item_id = _resolve_items([name], shopping_list.store_id)[normalize_item_name(name)].id
     
     item_name = name
     if item_id:
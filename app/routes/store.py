@@ -1,10 +1,22 @@
 """Chore Store: spend tokens, cash out, admin token settings and store items."""
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, render_template, request, jsonify, redirect, url_for
 from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
 from app.models import db, User, SiteSettings, CashOutRequest, StoreItem, UserPurchase, Notification
+from app import analytics, catalog
+from app.completion import PENALTY_SETTINGS
 
 store_bp = Blueprint('store', __name__)
 
+# Admin-editable numeric settings and their defaults (late penalties are applied by app.completion)
+TOKEN_SETTINGS = dict({'tokens_per_dollar': '100', 'cash_out_interest_rate': '1.0'}, **PENALTY_SETTINGS)
+IDEMPOTENCY_KEY_MAX = 64  # user_purchases.idempotency_key
+CASH_OUT_STATUSES = ('pending', 'paid')
+CASH_OUT_PAGE_DEFAULT = 50
+CASH_OUT_PAGE_MAX = 200
+
 
 def get_setting(key, default=None):
     s = SiteSettings.query.get(key)
@@ -26,41 +38,74 @@ def store_page():
     return render_template('store.html')
 
 
+def _catalog_response(view):
+    body, _ = catalog.get(view)
+    return current_app.response_class(body, mimetype='application/json')
+
+
 @store_bp.route('/api/items', methods=['GET'])
 @login_required
 def list_items():
     admin = getattr(current_user, 'is_admin', False)
-    q = StoreItem.query.filter_by(active=True) if not admin else StoreItem.query
-    items = q.order_by(StoreItem.sort_order, StoreItem.id).all()
-    return jsonify([{
-        'id': i.id,
-        'title': i.title,
-        'description': i.description or '',
-        'rules': i.rules or '',
-        'cost_tokens': float(i.cost_tokens),
-        'active': i.active,
-    } for i in items])
+    return _catalog_response('all' if admin else 'active')
+
+
+def _purchase_replay(purchase_record):
+    item = purchase_record.store_item
+    return jsonify({'success': True, 'balance': float(db.session.get(User, purchase_record.user_id).bank),
+                    'message': f'Purchased {item.title if item else "item"}', 'purchase_id': purchase_record.id,
+                    'replayed': True})
 
 
 @store_bp.route('/api/purchase', methods=['POST'])
 @login_required
 def purchase():
+    """Buy a store item.
+
+    The balance is checked and debited in one conditional UPDATE, so concurrent purchases can
+    never overdraw the bank. Clients should send an Idempotency-Key header (or idempotency_key
+    in the body); a retry with the same key returns the original purchase instead of buying twice.
+    """
     data = request.get_json() or {}
     item_id = data.get('store_item_id')
     if not item_id:
         return jsonify({'error': 'store_item_id required'}), 400
-    item = db.session.get(StoreItem, item_id)
-    if not item or not item.active:
+    key = (request.headers.get('Idempotency-Key') or data.get('idempotency_key') or '').strip() or None
+    if key is not None and len(key) > IDEMPOTENCY_KEY_MAX:
+        return jsonify({'error': f'Idempotency key must be at most {IDEMPOTENCY_KEY_MAX} characters'}), 400
+    if key is not None:
+        existing = UserPurchase.query.filter_by(user_id=current_user.id, idempotency_key=key).first()
+        if existing:
+            return _purchase_replay(existing)
+    try:
+        item = catalog.get('active')[1].get(int(item_id))
+    except (TypeError, ValueError):
+        item = None
+    if not item:
         return jsonify({'error': 'Item not found or inactive'}), 404
-    user = db.session.get(User, current_user.id)
-    cost = float(item.cost_tokens)
-    if user.bank < cost:
+
+    cost = item['cost_tokens']
+    balance = db.session.execute(
+        db.update(User).where(User.id == current_user.id, User.bank >= cost)
+        .values(bank=User.bank - cost).returning(User.bank)
+    ).scalar()
+    if balance is None:
+        db.session.rollback()
         return jsonify({'error': 'Not enough tokens'}), 400
-    user.bank -= cost
-    purchase_record = UserPurchase(user_id=user.id, store_item_id=item.id, status='pending')
+    purchase_record = UserPurchase(user_id=current_user.id, store_item_id=item['id'], status='pending',
+                                   idempotency_key=key)
     db.session.add(purchase_record)
-    db.session.commit()
-    return jsonify({'success': True, 'balance': float(user.bank), 'message': f'Purchased {item.title}'})
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request with the same key won; undo this debit and answer with its purchase
+        db.session.rollback()
+        existing = UserPurchase.query.filter_by(user_id=current_user.id, idempotency_key=key).first()
+        if existing is None:
+            raise
+        return _purchase_replay(existing)
+    return jsonify({'success': True, 'balance': float(balance), 'message': f'Purchased {item["title"]}',
+                    'purchase_id': purchase_record.id})
 
 
 @store_bp.route('/api/cash-out-info', methods=['GET'])
@@ -101,23 +146,32 @@ def submit_cash_out():
         return jsonify({'error': 'Invalid token amount'}), 400
     if tokens <= 0:
         return jsonify({'error': 'Amount must be positive'}), 400
-    user = db.session.get(User, current_user.id)
-    if user.bank < tokens:
+    # Checked and debited in one conditional UPDATE, as for purchases
+    balance = db.session.execute(
+        db.update(User).where(User.id == current_user.id, User.bank >= tokens)
+        .values(bank=User.bank - tokens).returning(User.bank)
+    ).scalar()
+    if balance is None:
+        db.session.rollback()
         return jsonify({'error': 'Not enough tokens'}), 400
     dollar_value = tokens_to_dollars(tokens)
-    user.bank -= tokens
-    req = CashOutRequest(user_id=user.id, tokens=tokens, dollar_value=dollar_value, status='pending')
+    req = CashOutRequest(user_id=current_user.id, tokens=tokens, dollar_value=dollar_value, status='pending')
     db.session.add(req)
+    analytics.record(current_user.id, cash_outs=1, cash_out_tokens=tokens, cash_out_dollars=dollar_value)
     db.session.flush()
     # Notify all admins about the cash-out request
     admins = User.query.filter_by(is_admin=True).all()
-    msg = f'{user.name} requested cash-out of {int(tokens)} tokens (${dollar_value:.2f}).'
+    msg = f'{current_user.name} requested cash-out of {int(tokens)} tokens (${dollar_value:.2f}).'
     link = '/store/token-settings'
     for admin in admins:
-        if admin.id != user.id:
+        if admin.id != current_user.id:
             db.session.add(Notification(user_id=admin.id, message=msg, link=link))
     db.session.commit()
-    return jsonify({'success': True, 'balance': float(user.bank), 'dollar_value': round(dollar_value, 2)})
+    return jsonify({'success': True, 'balance': float(balance), 'dollar_value': round(dollar_value, 2)})
+
+
+def _token_settings():
+    return {key: get_setting(key, default) for key, default in TOKEN_SETTINGS.items()}
 
 
 @store_bp.route('/api/token-settings', methods=['GET'])
@@ -125,10 +179,7 @@ def submit_cash_out():
 def get_token_settings():
     if not current_user.is_admin:
         return jsonify({'error': 'Access denied'}), 403
-    return jsonify({
-        'tokens_per_dollar': get_setting('tokens_per_dollar', '100'),
-        'cash_out_interest_rate': get_setting('cash_out_interest_rate', '1.0'),
-    })
+    return jsonify(_token_settings())
 
 
 @store_bp.route('/api/token-settings', methods=['PUT'])
@@ -137,24 +188,19 @@ def update_token_settings():
     if not current_user.is_admin:
         return jsonify({'error': 'Access denied'}), 403
     data = request.get_json() or {}
-    for key in ('tokens_per_dollar', 'cash_out_interest_rate'):
+    for key, default in TOKEN_SETTINGS.items():
         if key in data:
             val = str(data[key]).strip() if data[key] is not None else ''
             try:
-                if key == 'tokens_per_dollar' and val:
-                    float(val)
-                if key == 'cash_out_interest_rate' and val:
-                    float(val)
+                if val and float(val) < 0:
+                    continue
             except ValueError:
                 continue
             s = SiteSettings.query.get(key) or SiteSettings(key=key)
-            s.value = val or (get_setting(key, '100' if key == 'tokens_per_dollar' else '1.0'))
+            s.value = val or get_setting(key, default)
             db.session.merge(s)
     db.session.commit()
-    return jsonify({
-        'tokens_per_dollar': get_setting('tokens_per_dollar', '100'),
-        'cash_out_interest_rate': get_setting('cash_out_interest_rate', '1.0'),
-    })
+    return jsonify(_token_settings())
 
 
 @store_bp.route('/token-settings')
@@ -165,13 +211,8 @@ def token_settings_page():
     return render_template('token_settings.html')
 
 
-@store_bp.route('/api/cash-out-requests', methods=['GET'])
-@login_required
-def list_cash_out_requests():
-    if not current_user.is_admin:
-        return jsonify({'error': 'Access denied'}), 403
-    reqs = CashOutRequest.query.order_by(CashOutRequest.created_at.desc()).all()
-    return jsonify([{
+def _cash_out_dict(r):
+    return {
         'id': r.id,
         'user_id': r.user_id,
         'user_name': r.user.name,
@@ -180,7 +221,89 @@ def list_cash_out_requests():
         'dollar_value': round(r.dollar_value, 2),
         'status': r.status,
         'created_at': r.created_at.isoformat() if r.created_at else None,
-    } for r in reqs])
+    }
+
+
+@store_bp.route('/api/cash-out-requests', methods=['GET'])
+@login_required
+def list_cash_out_requests():
+    """Cash-out requests, newest first (admin only).
+
+    Filter with ?status=pending|paid, ?user_id= and ?start_date=/&end_date= (YYYY-MM-DD, inclusive).
+    Page with ?limit= (default 50, max 200) and ?before=<next_before from the previous page>.
+    """
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    args = request.args
+    status = args.get('status')
+    if status and status not in CASH_OUT_STATUSES:
+        return jsonify({'error': f'status must be one of {", ".join(CASH_OUT_STATUSES)}'}), 400
+    try:
+        user_id = args.get('user_id', type=int)
+        before = int(args['before']) if args.get('before') else None
+        limit = min(max(int(args.get('limit', CASH_OUT_PAGE_DEFAULT)), 1), CASH_OUT_PAGE_MAX)
+        start = datetime.strptime(args['start_date'], '%Y-%m-%d') if args.get('start_date') else None
+        end = datetime.strptime(args['end_date'], '%Y-%m-%d') + timedelta(days=1) if args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'before and limit must be integers, dates YYYY-MM-DD'}), 400
+
+    q = CashOutRequest.query.options(db.joinedload(CashOutRequest.user))
+    if status:
+        q = q.filter(CashOutRequest.status == status)
+    if user_id is not None:
+        q = q.filter(CashOutRequest.user_id == user_id)
+    if start is not None:
+        q = q.filter(CashOutRequest.created_at >= start)
+    if end is not None:
+        q = q.filter(CashOutRequest.created_at < end)
+    if before is not None:
+        # Keyset on (created_at, id): continue after the last row of the previous page
+        after = db.session.get(CashOutRequest, before)
+        if after is not None and after.created_at is not None:
+            q = q.filter(db.or_(CashOutRequest.created_at < after.created_at,
+                                db.and_(CashOutRequest.created_at == after.created_at, CashOutRequest.id < before)))
+        else:
+            q = q.filter(CashOutRequest.id < before)
+    rows = q.order_by(CashOutRequest.created_at.desc(), CashOutRequest.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    return jsonify({'items': [_cash_out_dict(r) for r in page],
+                    'next_before': page[-1].id if len(rows) > limit else None})
+
+
+@store_bp.route('/api/cash-out-requests/totals', methods=['GET'])
+@login_required
+def cash_out_totals():
+    """Pending and paid tokens/dollars per user, summed in SQL (admin only).
+
+    Paid requests moved to the archive by the retention job are not included.
+    """
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+
+    def total(status, column):
+        return db.func.coalesce(db.func.sum(db.case((CashOutRequest.status == status, column), else_=0)), 0)
+
+    def count(status):
+        return db.func.count(db.case((CashOutRequest.status == status, 1)))
+
+    rows = db.session.execute(
+        db.select(CashOutRequest.user_id, User.name, User.username,
+                  count('pending'), total('pending', CashOutRequest.tokens), total('pending', CashOutRequest.dollar_value),
+                  count('paid'), total('paid', CashOutRequest.tokens), total('paid', CashOutRequest.dollar_value))
+        .join(User, User.id == CashOutRequest.user_id)
+        .group_by(CashOutRequest.user_id, User.name, User.username)
+        .order_by(User.name)
+    ).all()
+    users = [{
+        'user_id': r[0], 'user_name': r[1], 'username': r[2],
+        'pending': {'count': r[3], 'tokens': float(r[4]), 'dollar_value': round(float(r[5]), 2)},
+        'paid': {'count': r[6], 'tokens': float(r[7]), 'dollar_value': round(float(r[8]), 2)},
+    } for r in rows]
+    overall = {key: {'count': sum(u[key]['count'] for u in users),
+                     'tokens': sum(u[key]['tokens'] for u in users),
+                     'dollar_value': round(sum(u[key]['dollar_value'] for u in users), 2)}
+               for key in CASH_OUT_STATUSES}
+    return jsonify({'users': users, 'totals': overall})
 
 
 @store_bp.route('/api/cash-out-requests/<int:req_id>/paid', methods=['PATCH'])
@@ -213,16 +336,7 @@ def admin_items_page():
 def admin_list_items():
     if not current_user.is_admin:
         return jsonify({'error': 'Access denied'}), 403
-    items = StoreItem.query.order_by(StoreItem.sort_order, StoreItem.id).all()
-    return jsonify([{
-        'id': i.id,
-        'title': i.title,
-        'description': i.description or '',
-        'rules': i.rules or '',
-        'cost_tokens': float(i.cost_tokens),
-        'active': i.active,
-        'sort_order': i.sort_order or 0,
-    } for i in items])
+    return _catalog_response('all')
 
 
 @store_bp.route('/admin/items/api', methods=['POST'])
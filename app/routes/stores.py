@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required
 from app.models import db, Store, Category
+from app.projection import list_response
 from app.utils import save_uploaded_file, delete_uploaded_file
 import json
 
@@ -15,8 +16,7 @@ def list_stores():
 @stores_bp.route('/api', methods=['GET'])
 @login_required
 def get_stores():
-    stores = Store.query.all()
-    return jsonify([store.to_dict() for store in stores])
+    return list_response(Store.query, Store)
 
 @stores_bp.route('/api', methods=['POST'])
 @login_required
@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from datetime import date, datetime
-from app.models import db, User, Chore, ChoreTracker, ChoreHistory, Project, Event, project_users
+from app.models import db, User, Chore, ChoreTracker, ChoreHistory, Project, Event, project_users, user_quick_chores, user_quick_events
+from app.projection import project, raw_fields
 from app.auth import hash_password, hash_security_answer
 from app.utils import save_uploaded_file, delete_uploaded_file
 
@@ -36,11 +37,9 @@ def list_users():
     } for u in users]
     return render_template('users.html', users=users_data)
 
-@users_bp.route('/api', methods=['GET'])
-def get_users():
-    """Get users - public endpoint for display purposes (profile images, names, status)"""
-    users = User.query.all()
-    return jsonify([{
+@raw_fields('id', 'username', 'name', 'is_admin', 'profile_image', 'background_gradient', 'status')
+def _public_user_dict(u):
+    return {
         'id': u.id,
         'username': u.username,
         'name': u.name,
@@ -51,7 +50,19 @@ def get_users():
         'background_gradient': u.background_gradient,
         'status': u.status,
         'title': u.title or None,
-    } for u in users])
+    }
+
+def users_payload(session, args):
+    """(payload, error) for GET /users/api on any session; the async API (app/asgi.py) shares it."""
+    return project(session.query(User), User, _public_user_dict, args=args)
+
+@users_bp.route('/api', methods=['GET'])
+def get_users():
+    """Get users - public endpoint for display purposes (profile images, names, status)"""
+    payload, error = users_payload(db.session, request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify(payload)
 
 @users_bp.route('/create', methods=['GET', 'POST'])
 @login_required
@@ -106,6 +117,8 @@ def delete_user(user_id):
     if user.id == current_user.id:
         return jsonify({'error': 'Cannot delete your own account'}), 400
     
+    db.session.execute(user_quick_chores.delete().where(user_quick_chores.c.user_id == user_id))
+    db.session.execute(user_quick_events.delete().where(user_quick_events.c.user_id == user_id))
     db.session.delete(user)
     db.session.commit()
     
@@ -0,0 +1,88 @@
+"""Engine routing for db.session.
+
+Flask-SQLAlchemy gives each app context its own session. RoutingSession sends everything that
+session runs (ORM queries, db.session.execute, db.session.connection()) to the engine bound to the
+current app context with bind(), and to the app's configured database otherwise. app.tenancy binds
+each request to its household's database this way. Code that needs a raw connection outside the
+session should use db.session.get_bind() rather than db.engine so it follows the same routing.
+
+Read routing (DB_READ_ONLY=1 or DATABASE_READ_URL, see app.database.read_database_url): during GET
+and HEAD requests, plain SELECTs go to a separate read engine, a mode=ro pool on the same SQLite
+file or a replica of a server database. Everything else stays on the primary: flushes, UPDATE /
+INSERT / DELETE, SELECT ... FOR UPDATE, text() statements, session.connection(), and other
+methods' requests. Once a GET has used the primary, the rest of its reads follow it there, so a
+request always sees its own writes. SQLite databases are switched to WAL journaling for this, so
+readers and the writer never wait for each other.
+"""
+import sqlite3
+
+from flask import g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+READ_BIND = 'read'
+READ_METHODS = ('GET', 'HEAD')
+
+
+def bind(engine, read_engine=None):
+    """Route this app context's session to engine (None restores the default database), and the
+    reads of its GET requests to read_engine when given."""
+    g._routing_engine = engine
+    g._routing_read_engine = read_engine
+
+
+def bound_engine():
+    return g.get('_routing_engine') if has_app_context() else None
+
+
+def reads_enabled(app):
+    return READ_BIND in (app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def _use_wal(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA journal_mode = WAL')
+
+
+def use_wal(engine):
+    """Switch a primary SQLite engine's database to WAL on connect, so read-only connections never
+    block its commits. Connects once to do it now."""
+    if engine.url.get_backend_name() != 'sqlite' or event.contains(engine, 'connect', _use_wal):
+        return
+    event.listen(engine, 'connect', _use_wal)
+    with engine.connect():
+        pass
+
+
+def init_app(app):
+    """Put the default SQLite database in WAL mode when GET requests read from a read-only pool."""
+    if not reads_enabled(app):
+        return
+    from app.models import db
+    with app.app_context():
+        use_wal(db.engines[None])
+
+
+class RoutingSession(Session):
+    def _read_engine(self, clause):
+        if not isinstance(clause, Select) or clause._for_update_arg is not None or self._flushing:
+            return None
+        if self.info.get('_routing_primary') or not has_request_context() or request.method not in READ_METHODS:
+            return None
+        if bound_engine() is not None:
+            return g.get('_routing_read_engine')
+        return self._db.engines.get(READ_BIND)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engine = self._read_engine(clause)
+            if engine is not None:
+                return engine
+            if has_request_context():
+                # Read-your-writes: the rest of this request reads from the primary
+                self.info['_routing_primary'] = True
+            engine = bound_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
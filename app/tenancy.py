@@ -0,0 +1,215 @@
+"""Multi-household mode: one SQLite database file per household, chosen per request.
+
+Off unless TENANT_MODE is set. Each household (tenant) is a database file <name>.db in
+TENANT_DIR (default data/tenants next to the default database), created with
+`flask create-tenant <name>`. Every request is bound to its household's engine before any route
+runs (see app.routing), so households share one process but never a table, a cache entry or a
+SQLite write lock.
+
+    TENANT_MODE=host   household from the first label of the host name: smith.chores.example.com
+                       (with TENANT_DOMAIN=chores.example.com, other hosts are refused)
+    TENANT_MODE=path   household from a /t/<name>/ URL prefix. It is remembered in the login
+                       session, so the pages' own /chores/api etc. requests need no prefix; one
+                       browser is signed in to one household at a time.
+
+At most TENANT_ENGINES (default 32) engines stay open; the least recently used one is disposed
+when another household needs a slot. Background jobs, migrations and the maintenance commands
+run once per household. Unknown households get a 404. Uploaded files keep sharing
+UPLOAD_FOLDER (their names are random). With DB_READ_ONLY=1 each household also gets a read-only
+pool for its GET requests (see app.routing); DATABASE_READ_URL names a single replica and cannot
+be used here.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from flask import current_app, g, has_app_context, jsonify, request, session
+from sqlalchemy import create_engine
+
+from app import routing
+from app.database import sqlite_read_only_url
+
+MODE = os.environ.get('TENANT_MODE', '').strip().lower()
+DOMAIN = os.environ.get('TENANT_DOMAIN', '').strip().lower().strip('.')
+MAX_ENGINES = int(os.environ.get('TENANT_ENGINES', 32))
+PATH_PREFIX = 't'
+NAME_RE = re.compile(r'^[a-z0-9][a-z0-9-]{0,62}$')
+
+# Endpoints that never touch a household's data (and must work before one is chosen). /metrics
+# covers the whole process, so here it only accepts METRICS_TOKEN (see app.instrumentation)
+SHARED_ENDPOINTS = {'static', 'uploaded_file', 'health', 'metrics'}
+
+_ENVIRON_KEY = 'thechores.tenant'
+
+_lock = threading.Lock()
+_engines = OrderedDict()  # name -> (Engine, read-only Engine or None), least recently used first
+
+
+def enabled():
+    return bool(MODE)
+
+
+def tenant_dir():
+    if os.environ.get('TENANT_DIR'):
+        return os.path.abspath(os.environ['TENANT_DIR'])
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, 'data', 'tenants')
+
+
+def database_path(name):
+    return os.path.join(tenant_dir(), f'{name}.db')
+
+
+def valid_name(name):
+    return bool(name) and bool(NAME_RE.match(name))
+
+
+def exists(name):
+    return valid_name(name) and os.path.exists(database_path(name))
+
+
+def names():
+    """Every household with a database file, sorted."""
+    if not os.path.isdir(tenant_dir()):
+        return []
+    return sorted(f[:-3] for f in os.listdir(tenant_dir()) if f.endswith('.db') and valid_name(f[:-3]))
+
+
+def current():
+    """Name of the household this app context is bound to (None when tenancy is off)."""
+    return g.get('tenant') if has_app_context() else None
+
+
+def _open(name):
+    url = f'sqlite:///{database_path(name)}'
+    options = current_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    primary = create_engine(url, **options)
+    if not routing.reads_enabled(current_app):
+        return primary, None
+    routing.use_wal(primary)
+    return primary, create_engine(sqlite_read_only_url(url), **options)
+
+
+def engines(name):
+    """The household's (engine, read-only engine or None), opened on first use and kept in a
+    bounded LRU."""
+    with _lock:
+        found = _engines.get(name)
+        if found is not None:
+            _engines.move_to_end(name)
+            return found
+    created = _open(name)
+    evicted = []
+    with _lock:
+        found = _engines.get(name)
+        if found is not None:
+            # Another thread opened it first
+            evicted.append(created)
+        else:
+            found = _engines[name] = created
+            while len(_engines) > max(MAX_ENGINES, 1):
+                evicted.append(_engines.popitem(last=False)[1])
+    for pair in evicted:
+        # Requests still holding a connection finish normally; it is closed when returned
+        for old in pair:
+            if old is not None:
+                old.dispose()
+    return found
+
+
+def engine(name):
+    """The household's engine (see engines())."""
+    return engines(name)[0]
+
+
+def open_engines():
+    with _lock:
+        return list(_engines)
+
+
+def activate(name):
+    """Bind this app context (and its db.session) to a household's database."""
+    g.tenant = name
+    routing.bind(*(engines(name) if name else (None,)))
+
+
+def each(app):
+    """Yield every household name inside its own app context bound to it; once with None when
+    tenancy is off. Work done per iteration must be committed before the next one."""
+    for name in (names() if enabled() else [None]):
+        with app.app_context():
+            if name:
+                activate(name)
+            yield name
+
+
+def create(app, name):
+    """Create and initialize a new household database. Returns its path."""
+    from app.__main__ import prepare_database
+    if not valid_name(name):
+        raise ValueError('Household names are lowercase letters, digits and dashes (max 63)')
+    path = database_path(name)
+    if os.path.exists(path):
+        raise ValueError(f'Household {name} already exists')
+    os.makedirs(tenant_dir(), exist_ok=True)
+    open(path, 'a').close()
+    prepare_database(app, name)
+    return path
+
+
+def host_household(host):
+    """Household named by a Host header in host mode (None when the host is refused)."""
+    host = host.split(':', 1)[0].lower().rstrip('.')
+    if DOMAIN:
+        if not host.endswith('.' + DOMAIN):
+            return None
+        label = host[:-len(DOMAIN) - 1]
+        return label if '.' not in label else None
+    return host.split('.', 1)[0]
+
+
+def _select_tenant():
+    if request.endpoint in SHARED_ENDPOINTS:
+        return None
+    if MODE == 'host':
+        name = host_household(request.host)
+    else:
+        name = request.environ.get(_ENVIRON_KEY) or session.get('tenant')
+    if not exists(name):
+        return jsonify({'error': 'Unknown household'}), 404
+    if session.get('tenant') != name:
+        # A login belongs to one household: never let a session cross into another one
+        session.clear()
+        session['tenant'] = name
+    activate(name)
+    return None
+
+
+class _PathPrefix:
+    """WSGI middleware moving /t/<name> from PATH_INFO to SCRIPT_NAME, so url_for() and redirects
+    keep the prefix while routes see their usual paths."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        parts = environ.get('PATH_INFO', '').split('/', 3)
+        if len(parts) >= 3 and parts[1] == PATH_PREFIX and parts[2]:
+            environ[_ENVIRON_KEY] = parts[2]
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + f'/{PATH_PREFIX}/{parts[2]}'
+            environ['PATH_INFO'] = '/' + (parts[3] if len(parts) > 3 else '')
+        return self.wsgi_app(environ, start_response)
+
+
+def init_app(app):
+    """Select the household before every request. Register before anything that queries."""
+    if not enabled():
+        return
+    if MODE not in ('host', 'path'):
+        raise ValueError(f'TENANT_MODE must be host or path, not {MODE}')
+    if os.environ.get('DATABASE_READ_URL'):
+        raise ValueError('DATABASE_READ_URL names one replica; use DB_READ_ONLY=1 with TENANT_MODE')
+    if MODE == 'path':
+        app.wsgi_app = _PathPrefix(app.wsgi_app)
+    app.before_request(_select_tenant)
@@ -0,0 +1,101 @@
+"""Current-user loading with a small cross-request cache.
+
+Flask-Login calls load_user on every authenticated request. The user's column values are kept
+in-process for USER_CACHE_TTL seconds (default 60, 0 disables) and merged into the request's
+session without a SELECT. Because the merged instance sits in the session's identity map, routes
+that follow up with db.session.get(User, current_user.id) get the same object back for free.
+
+bank is never cached: it is loaded from the database the first time a request reads it, so code
+that adjusts a balance never starts from a value another request or process has since changed.
+
+Entries are dropped when a commit includes an ORM insert, change or delete of that user, or a
+bulk UPDATE/DELETE on users, and a load that overlaps such a commit is not cached. Writes that
+bypass the ORM (raw SQL) must call invalidate(); other processes' writes show up when the entry
+expires. Entries are kept per household in multi-household mode (app/tenancy.py), since user ids
+repeat across them.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app import tenancy
+from app.models import db, User
+
+_lock = threading.Lock()
+_version = 0
+_entries = {}  # (household, user id) -> (expires_at, column values)
+_ttl = float(os.environ.get('USER_CACHE_TTL', 60))
+_columns = [attr.key for attr in User.__mapper__.column_attrs if attr.key != 'bank']
+
+
+def get_user(user_id):
+    """The User with this id, attached to the current session; None if it does not exist."""
+    user_id = int(user_id)
+    if _ttl <= 0:
+        return db.session.get(User, user_id)
+    key = (tenancy.current(), user_id)
+    with _lock:
+        seen = _version
+        entry = _entries.get(key)
+    if entry and entry[0] > time.monotonic():
+        user = User(**entry[1])
+        make_transient_to_detached(user)  # bank stays unloaded until read
+        return db.session.merge(user, load=False)
+    user = db.session.get(User, user_id)
+    if user is not None:
+        values = {column: getattr(user, column) for column in _columns}
+        with _lock:
+            # Only cache if no commit invalidated users while this was loading
+            if _version == seen:
+                _entries[key] = (time.monotonic() + _ttl, values)
+    return user
+
+
+def invalidate(user_id=None):
+    """Forget one cached user of the current household, or every cached user."""
+    global _version
+    with _lock:
+        _version += 1
+        if user_id is None:
+            _entries.clear()
+        else:
+            _entries.pop((tenancy.current(), int(user_id)), None)
+
+
+def _pending(session):
+    return session.info.setdefault('_user_cache_stale', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_users(session, flush_context):
+    stale = _pending(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            stale.add(obj.id)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_user_writes(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and \
+            any(m.class_ is User for m in orm_execute_state.all_mappers):
+        _pending(orm_execute_state.session).add(None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    stale = session.info.pop('_user_cache_stale', None)
+    if not stale:
+        return
+    if None in stale:
+        invalidate()
+    else:
+        for user_id in stale:
+            invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_users(session):
+    session.info.pop('_user_cache_stale', None)
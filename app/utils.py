@@ -1,12 +1,12 @@
 import os
 from werkzeug.utils import secure_filename
-from PIL import Image
 import uuid
 
 # Use /data/uploads in HA (writable); static/uploads for local dev
 UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'static/uploads')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+THUMBNAIL_SIZE = (240, 240)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -30,8 +30,9 @@ def save_uploaded_file(file, subfolder='', crop_data=None):
     # Save file
     file.save(filepath)
     
-    # Process image
+    # Process image (Pillow is imported here so app startup doesn't pay for it)
     try:
+        from PIL import Image
         img = Image.open(filepath)
         
         # Apply crop if provided
@@ -85,3 +86,32 @@ def delete_uploaded_file(filepath):
                 os.remove(full_path)
             except Exception as e:
                 print(f"Error deleting file: {e}")
+
+def thumbnail_path(filepath):
+    """Relative path of the thumbnail for an uploaded file, e.g. projects/thumbs/xxx.jpg"""
+    folder, filename = os.path.split(filepath)
+    return os.path.join(folder, 'thumbs', filename).replace('\\', '/')
+
+def save_thumbnail(filepath):
+    """Create the THUMBNAIL_SIZE thumbnail of an uploaded file if it doesn't exist yet.
+    Returns its relative path, or None if the original is missing or can't be read.
+    """
+    if not filepath:
+        return None
+    thumb = thumbnail_path(filepath)
+    thumb_full = os.path.join(UPLOAD_FOLDER, thumb)
+    if os.path.exists(thumb_full):
+        return thumb
+    original = os.path.join(UPLOAD_FOLDER, filepath)
+    if not os.path.exists(original):
+        return None
+    try:
+        from PIL import Image
+        os.makedirs(os.path.dirname(thumb_full), exist_ok=True)
+        with Image.open(original) as img:
+            img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+            img.save(thumb_full, optimize=True, quality=80)
+    except Exception as e:
+        print(f"Error creating thumbnail: {e}")
+        return None
+    return thumb
@@ -0,0 +1 @@
+"""Benchmark harness: synthetic data generator (seed) and route driver (run)."""
@@ -0,0 +1,297 @@
+"""Hold hundreds of concurrent polling clients against a real server process.
+
+    python -m benchmarks.loadtest                          # both servers, 300 clients, 20 s
+    python -m benchmarks.loadtest --server asgi --clients 500 --mode long-poll
+    python -m benchmarks.loadtest --path '/users/api' --interval 2
+    python -m benchmarks.loadtest --mode notify --notify-every 2
+    python -m benchmarks.loadtest --database-url postgresql://bench@localhost/bench
+
+Each client is one socket in this process (asyncio) acting like a wall tablet: "poll" clients
+fetch the endpoint every --interval seconds with If-None-Match; "long-poll" clients send
+?wait=--wait and re-request as soon as an answer arrives, so the server holds them idle. A
+separate probe fetches /users/api every 0.1 s on its own connection to show how responsive the
+server stays while those clients are held. Server RSS and thread count are sampled from /proc.
+
+"notify" clients long-poll /notifications/api/wait?after=<cursor> as the admin while a writer
+submits a cash-out request as user2 every --notify-every seconds, which notifies the admin; the
+report adds how long waiters took to answer after each write.
+
+"flask" is python -m app (threaded dev server, one thread per in-flight request); "asgi" is
+python -m app.asgi (requires requirements-async.txt). Flask answers ?wait= immediately, so there
+long-poll clients fall back to sleeping --interval between requests.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import json
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import _percentile
+from benchmarks.startup import ROOT, _free_port, _wait_healthy
+
+SERVERS = {'flask': 'app', 'asgi': 'app.asgi'}
+
+
+def sqlite_url(db_path):
+    return 'sqlite:///' + os.path.abspath(db_path).replace('\\', '/')
+
+
+def seed_database(database_url):
+    """Seed a benchmark household into an empty database (same data as benchmarks.run)."""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('LOG_LEVEL', 'warning')
+    from app import create_app
+    from app.models import db, User
+    from benchmarks.seed import seed
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if User.query.first() is None:
+            seed()
+
+
+async def _request(reader, writer, host, path, headers, method='GET', body=b''):
+    """Send one request on an open connection. Returns (status, headers dict, keep_alive, body)."""
+    if body:
+        headers = dict(headers, **{'Content-Length': str(len(body))})
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}'] + [f'{k}: {v}' for k, v in headers.items() if v]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    version, status = status_line.decode().split()[:2]
+    resp_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        resp_headers[name.strip().lower()] = value.strip()
+    length = int(resp_headers.get('content-length', 0))
+    data = await reader.readexactly(length) if length else b''
+    keep_alive = version == 'HTTP/1.1' and resp_headers.get('connection', '').lower() != 'close'
+    return int(status), resp_headers, keep_alive, data
+
+
+class Stats:
+    def __init__(self):
+        self.responses = self.errors = self.reconnects = self.open = self.peak_open = 0
+        self.statuses = {}
+        self.probe = []
+        self.wakes = []
+        self.written_at = None
+
+    def opened(self):
+        self.open += 1
+        self.peak_open = max(self.peak_open, self.open)
+
+
+def _poll_url(args, path, cursor):
+    if args.mode == 'notify':
+        base = '/notifications/api/wait'
+        return base if cursor is None else f'{base}?after={cursor}&timeout={args.wait:g}'
+    sep = '&' if '?' in path else '?'
+    return f'{path}{sep}wait={args.wait:g}' if args.mode == 'long-poll' else path
+
+
+async def poller(port, path, args, cookie, stats, stop):
+    reader = writer = None
+    etag, reused, cursor = None, False, None
+    while not stop.is_set():
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                stats.opened()
+                reused = False
+            started = time.perf_counter()
+            status, headers, keep_alive, body = await _request(
+                reader, writer, f'127.0.0.1:{port}', _poll_url(args, path, cursor),
+                {'Cookie': cookie, 'If-None-Match': etag})
+            stats.responses += 1
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            etag = headers.get('etag', etag)
+            reused = True
+            held = False
+            if args.mode == 'notify' and status == 200:
+                payload = json.loads(body)
+                # The first request only fetches the cursor; after that every request is held
+                held = True
+                if payload['items'] and cursor is not None and stats.written_at:
+                    stats.wakes.append((time.perf_counter() - stats.written_at) * 1000)
+                cursor = payload['cursor']
+            if not keep_alive:
+                writer.close()
+                writer = None
+                stats.open -= 1
+            # Poll clients pause between requests; long-poll clients only when the server did not hold them
+            if args.mode == 'poll' or (not held and time.perf_counter() - started < 1):
+                await asyncio.wait_for(stop.wait(), args.interval)
+        except asyncio.TimeoutError:
+            continue
+        except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+            if writer is not None:
+                writer.close()
+                writer = None
+                stats.open -= 1
+            if reused:
+                # The server closed an idle keep-alive connection; reconnect like a browser would
+                stats.reconnects += 1
+                continue
+            stats.errors += 1
+            await asyncio.sleep(0.5)
+    if writer is not None:
+        writer.close()
+
+
+async def probe(port, cookie, stats, stop):
+    """Latency of a plain /users/api fetch while the pollers are connected."""
+    while not stop.is_set():
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            started = time.perf_counter()
+            await _request(reader, writer, f'127.0.0.1:{port}', '/users/api',
+                           {'Cookie': cookie, 'Connection': 'close'})
+            stats.probe.append((time.perf_counter() - started) * 1000)
+            writer.close()
+        except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+            stats.errors += 1
+        await asyncio.sleep(0.1)
+
+
+async def writer_task(port, cookie, stats, stop, every):
+    """Submit a tiny cash-out as user2 every `every` seconds; each one notifies the admin."""
+    body = json.dumps({'tokens': 0.01}).encode()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), every)
+            break
+        except asyncio.TimeoutError:
+            pass
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            stats.written_at = time.perf_counter()
+            await _request(reader, writer, f'127.0.0.1:{port}', '/store/api/cash-out',
+                           {'Cookie': cookie, 'Connection': 'close', 'Content-Type': 'application/json'},
+                           method='POST', body=body)
+            writer.close()
+        except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+            stats.errors += 1
+
+
+def _proc_stats(pid):
+    """(RSS in MB, thread count) of a running process, from /proc (Linux only)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['VmRSS'].split()[0]) / 1024.0, int(fields['Threads'])
+    except (OSError, KeyError, ValueError):
+        return 0.0, 0
+
+
+async def sample(pid, peaks, stop):
+    while not stop.is_set():
+        rss, threads = _proc_stats(pid)
+        peaks['rss'] = max(peaks['rss'], rss)
+        peaks['threads'] = max(peaks['threads'], threads)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+def login(port, password, username='admin'):
+    """Session cookie for a seeded user."""
+    import http.client
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request('POST', '/auth/login', urllib.parse.urlencode({'username': username, 'password': password}),
+                 {'Content-Type': 'application/x-www-form-urlencoded', 'Accept': 'application/json'})
+    resp = conn.getresponse()
+    resp.read()
+    if resp.status != 200:
+        raise SystemExit(f'Could not log in as {username}: {resp.status}')
+    return '; '.join(c.split(';', 1)[0] for c in resp.headers.get_all('Set-Cookie') or [])
+
+
+async def drive(port, pid, args, cookie, writer_cookie):
+    stats, peaks, stop = Stats(), {'rss': 0.0, 'threads': 0}, asyncio.Event()
+    tasks = [asyncio.ensure_future(sample(pid, peaks, stop))]
+    for i in range(args.clients):
+        tasks.append(asyncio.ensure_future(poller(port, args.path, args, cookie, stats, stop)))
+        if i % 50 == 49:
+            await asyncio.sleep(0.05)  # ramp up instead of a single SYN flood
+    tasks.append(asyncio.ensure_future(probe(port, cookie, stats, stop)))
+    if writer_cookie:
+        tasks.append(asyncio.ensure_future(writer_task(port, writer_cookie, stats, stop, args.notify_every)))
+    await asyncio.sleep(args.duration)
+    held = stats.open
+    stop.set()
+    # Requests still held by the server are abandoned, not counted as errors
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return stats, peaks, held
+
+
+def run_server(server, database_url, upload_dir, args):
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=database_url, HOST='127.0.0.1',
+               PORT=str(port), LOG_LEVEL='warning', JOBS_ENABLED='0', UPLOAD_FOLDER=upload_dir)
+    proc = subprocess.Popen([sys.executable, '-m', SERVERS[server]], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_healthy(port, proc, 120)
+        cookie = login(port, args.password)
+        writer_cookie = login(port, args.password, 'user2') if args.mode == 'notify' else None
+        return asyncio.run(drive(port, proc.pid, args, cookie, writer_cookie))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent polling clients against python -m app / app.asgi.')
+    parser.add_argument('--server', choices=['flask', 'asgi', 'both'], default='both')
+    parser.add_argument('--mode', choices=['poll', 'long-poll', 'notify'], default='long-poll')
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds to hold the clients')
+    parser.add_argument('--interval', type=float, default=5.0, help='seconds between polls')
+    parser.add_argument('--wait', type=float, default=25.0, help='?wait= / ?timeout= for long-poll clients')
+    parser.add_argument('--notify-every', type=float, default=3.0, help='seconds between writes in notify mode')
+    parser.add_argument('--path', default='/chores/api')
+    parser.add_argument('--db', help='existing benchmark database (default: seed a temp file)')
+    parser.add_argument('--database-url', help='SQLAlchemy URL of an empty or previously seeded database (overrides --db)')
+    parser.add_argument('--password', default='bench')
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='thechores-load-')
+    if args.database_url:
+        database_url = args.database_url
+    else:
+        database_url = sqlite_url(args.db or os.path.join(work_dir, 'load.db'))
+    if args.database_url or not args.db:
+        seed_database(database_url)
+
+    servers = ['flask', 'asgi'] if args.server == 'both' else [args.server]
+    path = '/notifications/api/wait' if args.mode == 'notify' else args.path
+    print(f'{args.clients} {args.mode} clients on {path} for {args.duration:g}s')
+    print(f'{"server":<8}{"held":>6}{"resp":>8}{"reconn":>8}{"errors":>8}{"probe p50":>11}{"probe p99":>11}'
+          f'{"wake p50":>10}{"wake p99":>10}{"RSS MB":>9}{"threads":>9}')
+    for server in servers:
+        stats, peaks, held = run_server(server, database_url, work_dir, args)
+        probe_ms, wake_ms = sorted(stats.probe), sorted(stats.wakes)
+        print(f'{server:<8}{held:>6}{stats.responses:>8}{stats.reconnects:>8}{stats.errors:>8}{_percentile(probe_ms, 50):>11.1f}'
+              f'{_percentile(probe_ms, 99):>11.1f}{_percentile(wake_ms, 50):>10.1f}{_percentile(wake_ms, 99):>10.1f}'
+              f'{peaks["rss"]:>9.1f}{peaks["threads"]:>9}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""Drive the main routes through Flask's test client against a seeded database.
+
+    python -m benchmarks.run                         # default scale, temp SQLite file
+    python -m benchmarks.run --years 5 --chores 80 --iterations 100
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --baseline before.json  # exit 1 if any scenario regressed
+    python -m benchmarks.run --database-url postgresql://bench@localhost/bench  # same data on PostgreSQL
+
+Each scenario reports latency percentiles, SQL queries per request (from the Server-Timing
+header added by app.instrumentation) and peak Python memory allocated while it ran.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, time as dtime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.seed import DEFAULT_SCALE
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+BULK_SIZE = 200
+
+
+def _pending_trackers(ctx, count, status):
+    """Create `count` fresh trackers in `status` for write scenarios; returns their ids."""
+    from app.models import db, ChoreTracker
+    today = date.today()
+    rows = [ChoreTracker(chore_id=ctx['chore_ids'][i % len(ctx['chore_ids'])], date=today - timedelta(days=i % 5),
+                         due_by_datetime=datetime.combine(today - timedelta(days=i % 5), dtime(20, 0)), status=status)
+            for i in range(count)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [t.id for t in rows]
+
+
+def scenarios(ctx):
+    """(name, request builder, prepare) tuples. Builders take the iteration index and return
+    (method, url, json_body); prepare, if set, runs once before timing with the iteration count."""
+    today = date.today()
+    month_start = today.replace(day=1).isoformat()
+    month_end = (today.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    users, rooms = ctx['user_ids'], ctx['room_ids']
+    return [
+        ('chores available today', lambda i: ('GET', '/chores/api', None), None),
+        ('chores all', lambda i: ('GET', '/chores/api?all=1', None), None),
+        ('chores today compact', lambda i: ('GET', '/chores/api?compact=1', None), None),
+        ('chore tracker list', lambda i: ('GET', '/chores/tracker', None), None),
+        ('chore tracker columns', lambda i: ('GET', '/chores/tracker?fields=id,chore_id,date,status&format=columns', None), None),
+        ('completed history', lambda i: ('GET', '/chores/tracker/completed', None), None),
+        ('users list', lambda i: ('GET', '/users/api', None), None),
+        ('events month', lambda i: ('GET', f'/events/api?start_date={month_start}&end_date={month_end.isoformat()}', None), None),
+        ('calendar month', lambda i: ('GET', f'/events/api/calendar?view=month&date={today.isoformat()}', None), None),
+        ('leaderboard month', lambda i: ('GET', f'/analytics/api/leaderboard?period=month&date={today.isoformat()}', None), None),
+        ('earnings year by month', lambda i: ('GET', f'/analytics/api/users/{users[i % len(users)]}?period=year&group=month', None), None),
+        ('notifications', lambda i: ('GET', '/notifications/api', None), None),
+        ('projects', lambda i: ('GET', '/projects/api', None), None),
+        ('shopping lists', lambda i: ('GET', '/shopping-lists/api', None), None),
+        ('items', lambda i: ('GET', '/items/api', None), None),
+        ('low stock', lambda i: ('GET', '/items/api/low-stock', None), None),
+        ('stale rooms', lambda i: ('GET', '/rooms/api/stale?within=3', None), None),
+        ('room detail', lambda i: ('GET', f'/rooms/api/{rooms[i % len(rooms)]}/detail', None), None),
+        ('user detail', lambda i: ('GET', f'/users/{users[i % len(users)]}/api/detail', None), None),
+        ('tracker update', lambda i: ('PUT', f'/chores/tracker/{ctx["update_ids"][i]}', {'status': 'pending_approval'}),
+         lambda n: ctx.__setitem__('update_ids', _pending_trackers(ctx, n, 'pending'))),
+        ('tracker approve', lambda i: ('POST', f'/chores/tracker/{ctx["approve_ids"][i]}/approve', None),
+         lambda n: ctx.__setitem__('approve_ids', _pending_trackers(ctx, n, 'pending_approval'))),
+        ('tracker approve bulk 200', lambda i: ('POST', '/chores/tracker/approve',
+                                               {'tracker_ids': ctx['bulk_ids'][i * BULK_SIZE:(i + 1) * BULK_SIZE]}),
+         lambda n: ctx.__setitem__('bulk_ids', _pending_trackers(ctx, n * BULK_SIZE, 'pending_approval'))),
+    ]
+
+
+def run(args):
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='thechores-bench-'), 'bench.db')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(db_path).replace('\\', '/')
+    os.environ.setdefault('LOG_LEVEL', 'warning')
+    os.environ.setdefault('SLOW_QUERY_MS', '10000')
+
+    from app import create_app
+    from app.models import db, User, Room, Chore
+    from benchmarks.seed import seed
+
+    app = create_app()
+    scale = {k: getattr(args, k) for k in DEFAULT_SCALE}
+    with app.app_context():
+        db.create_all()
+        if User.query.first() is None:
+            started = time.perf_counter()
+            info = seed(scale, rng_seed=args.seed)
+            print(f'Seeded {info["trackers"]} trackers / {info["history"]} history rows in {time.perf_counter() - started:.1f}s')
+        ctx = {
+            'user_ids': [u.id for u in User.query.order_by(User.id)],
+            'room_ids': [r.id for r in Room.query.order_by(Room.id)],
+            'chore_ids': [c.id for c in Chore.query.order_by(Chore.id)],
+        }
+
+    client = app.test_client()
+    headers = {'Accept-Encoding': 'gzip'} if args.gzip else {}
+    resp = client.post('/auth/login', data={'username': 'admin', 'password': args.password}, headers={'Accept': 'application/json'})
+    if resp.status_code != 200:
+        raise SystemExit(f'Could not log in as admin: {resp.status_code}')
+
+    results = {}
+    selected = [s for s in scenarios(ctx) if not args.only or any(o in s[0] for o in args.only)]
+    for name, build, prepare in selected:
+        total = args.warmup + args.iterations
+        if prepare:
+            with app.app_context():
+                prepare(total + 1)
+        for i in range(args.warmup):
+            method, url, body = build(i)
+            client.open(url, method=method, json=body, headers=headers)
+        timings, queries = [], []
+        for i in range(args.warmup, total):
+            method, url, body = build(i)
+            started = time.perf_counter()
+            resp = client.open(url, method=method, json=body, headers=headers)
+            timings.append((time.perf_counter() - started) * 1000)
+            if resp.status_code >= 400:
+                raise SystemExit(f'{name}: {method} {url} returned {resp.status_code}')
+            match = QUERIES_RE.search(resp.headers.get('Server-Timing', ''))
+            queries.append(int(match.group(1)) if match else 0)
+        # Memory is measured on one extra request; tracing would distort the timings above
+        method, url, body = build(total)
+        tracemalloc.start()
+        client.open(url, method=method, json=body, headers=headers)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        timings.sort()
+        results[name] = {
+            'p50_ms': round(_percentile(timings, 50), 3),
+            'p90_ms': round(_percentile(timings, 90), 3),
+            'p99_ms': round(_percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'max_ms': round(timings[-1], 3),
+            'queries': round(sum(queries) / len(queries), 1),
+            'peak_kb': round(peak / 1024, 1),
+            'bytes': len(resp.get_data()),
+        }
+
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': os.environ['DATABASE_URL'].split(':', 1)[0],
+            'scale': scale,
+            'iterations': args.iterations,
+            'max_rss_kb': _max_rss_kb(),
+        },
+        'scenarios': results,
+    }
+    return report
+
+
+def _max_rss_kb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def compare(report, baseline, tolerance, floor_ms):
+    """Scenarios slower than baseline by more than tolerance (and floor_ms), or issuing more queries."""
+    regressions = []
+    for name, cur in report['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        if cur['p50_ms'] > base['p50_ms'] * (1 + tolerance) and cur['p50_ms'] - base['p50_ms'] > floor_ms:
+            regressions.append(f'{name}: p50 {base["p50_ms"]:.2f} -> {cur["p50_ms"]:.2f} ms')
+        # Averages over a few sampled ids wobble slightly, so only flag real growth in query count
+        if cur['queries'] > base['queries'] + max(1.0, base['queries'] * 0.1):
+            regressions.append(f'{name}: queries {base["queries"]} -> {cur["queries"]}')
+    return regressions
+
+
+def print_report(report, baseline=None):
+    base = (baseline or {}).get('scenarios', {})
+    print(f'\n{"scenario":<26}{"p50":>9}{"p90":>9}{"p99":>9}{"queries":>9}{"peak KB":>10}{"bytes":>10}' + ('   vs baseline p50' if base else ''))
+    for name, r in report['scenarios'].items():
+        line = f'{name:<26}{r["p50_ms"]:>9.2f}{r["p90_ms"]:>9.2f}{r["p99_ms"]:>9.2f}{r["queries"]:>9}{r["peak_kb"]:>10}{r["bytes"]:>10}'
+        if name in base and base[name]['p50_ms']:
+            line += f'   {(r["p50_ms"] / base[name]["p50_ms"] - 1) * 100:+.0f}%'
+        print(line)
+    print(f'\nmax RSS: {report["meta"]["max_rss_kb"]} KB')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark The Chores routes against synthetic household data.')
+    for key, default in DEFAULT_SCALE.items():
+        parser.add_argument(f'--{key.replace("_", "-")}', dest=key, type=float if key == 'years' else int, default=default)
+    parser.add_argument('--iterations', type=int, default=30, help='timed requests per scenario')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the data generator')
+    parser.add_argument('--db', help='SQLite file to use (seeded only when empty); default is a fresh temp file')
+    parser.add_argument('--database-url', help='SQLAlchemy URL of an empty or previously seeded database (overrides --db)')
+    parser.add_argument('--gzip', action='store_true', help='send Accept-Encoding: gzip (bytes column shows wire size)')
+    parser.add_argument('--password', default='bench', help='admin password (for pre-existing databases)')
+    parser.add_argument('--only', nargs='*', help='run only scenarios whose name contains one of these strings')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='JSON report to compare against; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown vs baseline (fraction)')
+    parser.add_argument('--floor-ms', type=float, default=1.0, help='ignore p50 slowdowns smaller than this')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if baseline:
+        regressions = compare(report, baseline, args.tolerance, args.floor_ms)
+        if regressions:
+            print('\nRegressions:')
+            for r in regressions:
+                print('  ' + r)
+            return 1
+        print('\nNo regressions against baseline.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
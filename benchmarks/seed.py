@@ -0,0 +1,163 @@
+"""Synthetic household data generator for benchmarks.
+
+Everything is inserted with bulk executemany statements, so seeding years of tracker and history
+rows takes seconds rather than minutes. Generation is deterministic for a given random seed.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+from app import analytics
+from app.auth import hash_password
+from app.models import (
+    db, User, Chore, ChoreTracker, ChoreHistory, Room, Item, Store, Event, Notification,
+    Project, ShoppingList, ShoppingListItem, room_chores, item_stores, project_users, normalize_item_name,
+    room_next_due,
+)
+
+DEFAULT_SCALE = {
+    'users': 6,
+    'rooms': 10,
+    'chores': 40,
+    'years': 2,
+    'items': 300,
+    'stores': 8,
+    'events': 500,
+    'notifications': 5000,
+    'projects': 200,
+    'shopping_lists': 100,
+}
+
+TASKS = ['Dishes', 'Vacuum', 'Laundry', 'Trash', 'Dust', 'Mop', 'Feed pets', 'Water plants', 'Wipe counters', 'Make bed']
+ROOMS = ['Kitchen', 'Living room', 'Bathroom', 'Bedroom', 'Garage', 'Office', 'Laundry', 'Hallway', 'Dining room', 'Yard']
+FREQUENCIES = ['daily', 'weekly', 'monthly']
+EVENT_TYPES = ['shopping', 'appointment', 'birthday', 'meeting', 'reminder', 'travel', 'event']
+
+
+def _insert(model_or_table, rows, chunk=5000):
+    """Bulk insert rows (list of dicts) in chunks of executemany."""
+    table = getattr(model_or_table, '__table__', model_or_table)
+    for start in range(0, len(rows), chunk):
+        db.session.execute(table.insert(), rows[start:start + chunk])
+
+
+def _sync_sequences(models):
+    """Move PostgreSQL id sequences past rows inserted with explicit ids (SQLite needs nothing)."""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(db.text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                   f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"))
+
+
+def seed(scale=None, rng_seed=1, today=None):
+    """Populate an empty database. Returns a dict of the ids benchmarks need to build URLs.
+
+    Must be called inside an app context, after db.create_all().
+    """
+    scale = dict(DEFAULT_SCALE, **(scale or {}))
+    rng = random.Random(rng_seed)
+    today = today or date.today()
+    password_hash = hash_password('bench')  # one bcrypt round for everyone
+
+    users = [{'id': 1, 'username': 'admin', 'password_hash': password_hash, 'name': 'Administrator',
+              'is_admin': True, 'bank': 500.0}]
+    for i in range(2, scale['users'] + 1):
+        users.append({'id': i, 'username': f'user{i}', 'password_hash': password_hash, 'name': f'Family Member {i}',
+                      'is_admin': False, 'bank': float(rng.randint(0, 2000)), 'color_code': '#%06x' % rng.randint(0, 0xFFFFFF)})
+    _insert(User, users)
+    user_ids = [u['id'] for u in users]
+
+    rooms = [{'id': i, 'name': ROOMS[(i - 1) % len(ROOMS)] + ('' if i <= len(ROOMS) else f' {i}'),
+              'last_cleaned': today - timedelta(days=rng.randint(0, 30)),
+              'last_deep_cleaned': today - timedelta(days=rng.randint(0, 180)),
+              'clean_interval_days': 7, 'deep_clean_interval_days': 90}
+             for i in range(1, scale['rooms'] + 1)]
+    for room in rooms:
+        room['next_due_date'] = room_next_due(room['last_cleaned'], room['last_deep_cleaned'], 7, 90, today)
+    _insert(Room, rooms)
+
+    chores, links = [], []
+    for i in range(1, scale['chores'] + 1):
+        room_id = rng.randint(1, scale['rooms'])
+        chores.append({'id': i, 'task': f'{TASKS[i % len(TASKS)]} #{i}', 'reward': float(rng.choice([5, 10, 15, 20])),
+                       'assigned_user_id': rng.choice(user_ids), 'assigned_by_id': 1, 'room_id': room_id,
+                       'frequency': rng.choice(FREQUENCIES)})
+        links.append({'room_id': room_id, 'chore_id': i})
+    _insert(Chore, chores)
+    _insert(room_chores, links)
+
+    # One tracker per chore per due day for `years` of history; history rows for completed ones
+    trackers, history = [], []
+    days = int(365 * scale['years'])
+    for chore in chores:
+        step = {'daily': 1, 'weekly': 7, 'monthly': 30}[chore['frequency']]
+        for back in range(days, -8, -step):
+            day = today - timedelta(days=back)
+            past = back > 0
+            status = 'completed' if past and rng.random() < 0.85 else ('pending' if not past or rng.random() < 0.5 else 'skipped')
+            trackers.append({'chore_id': chore['id'], 'date': day, 'status': status,
+                             'due_by_datetime': datetime.combine(day, time(20, 0)), 'frequency': chore['frequency'],
+                             'assigned_user_id': chore['assigned_user_id'], 'room_id': chore['room_id'],
+                             'approved_by_id': 1 if status == 'completed' else None})
+            if status == 'completed':
+                history.append({'chore_id': chore['id'], 'task': chore['task'], 'frequency': chore['frequency'],
+                                'assigned_user_id': chore['assigned_user_id'],
+                                'assigned_user_name': f'Family Member {chore["assigned_user_id"]}',
+                                'room_id': chore['room_id'], 'room_name': ROOMS[(chore['room_id'] - 1) % len(ROOMS)],
+                                'reward': chore['reward'], 'completed_date': day})
+    _insert(ChoreTracker, trackers)
+    _insert(ChoreHistory, history)
+
+    _insert(Store, [{'id': i, 'name': f'Store {i}', 'budget': 200.0} for i in range(1, scale['stores'] + 1)])
+    items, item_links = [], []
+    for i in range(1, scale['items'] + 1):
+        store_id = rng.randint(1, scale['stores'])
+        name = f'Item {i}'
+        items.append({'id': i, 'name': name, 'name_normalized': normalize_item_name(name), 'quantity': float(rng.randint(0, 10)),
+                      'full_amount': 10, 'low_amount': rng.randint(1, 4), 'store_id': store_id})
+        item_links.append({'item_id': i, 'store_id': store_id})
+    _insert(Item, items)
+    _insert(item_stores, item_links)
+
+    _insert(Event, [{'title': f'Event {i}', 'date': today + timedelta(days=rng.randint(-days, 60)),
+                     'time': time(rng.randint(7, 21), 0), 'user_id': rng.choice(user_ids),
+                     'event_type': rng.choice(EVENT_TYPES)} for i in range(scale['events'])])
+
+    _insert(Notification, [{'user_id': rng.choice(user_ids), 'message': f'Notification {i}', 'read': rng.random() < 0.9,
+                            'created_at': datetime.combine(today, time(12, 0)) - timedelta(minutes=i * 7)}
+                           for i in range(scale['notifications'])])
+
+    projects, assignees = [], []
+    for i in range(1, scale['projects'] + 1):
+        done = rng.random() < 0.8
+        owner = rng.choice(user_ids)
+        projects.append({'id': i, 'name': f'Project {i}', 'user_id': owner, 'severity': rng.choice(['low', 'medium', 'high']),
+                         'reward': float(rng.randint(10, 100)), 'completed': done,
+                         'completed_date': today - timedelta(days=rng.randint(0, days)) if done else None,
+                         'completed_by_id': owner if done else None})
+        assignees.append({'project_id': i, 'user_id': owner})
+    _insert(Project, projects)
+    _insert(project_users, assignees)
+
+    lists, list_items = [], []
+    for i in range(1, scale['shopping_lists'] + 1):
+        lists.append({'id': i, 'name': f'List {i}', 'store_id': rng.randint(1, scale['stores']), 'user_id': rng.choice(user_ids),
+                      'created_at': datetime.combine(today - timedelta(days=rng.randint(0, days)), time(9, 0)),
+                      'completed': i > 5, 'budget': 100.0, 'actual_spent': float(rng.randint(50, 150))})
+        for item_id in rng.sample(range(1, scale['items'] + 1), min(10, scale['items'])):
+            list_items.append({'shopping_list_id': i, 'item_id': item_id, 'name': f'Item {item_id}', 'quantity': 1.0})
+    _insert(ShoppingList, lists)
+    _insert(ShoppingListItem, list_items)
+
+    _sync_sequences([User, Room, Chore, Store, Item, Project, ShoppingList])
+    # Rows were inserted in bulk, bypassing the analytics.record() calls in the routes
+    analytics.rebuild(db.session.connection())
+    db.session.commit()
+    return {
+        'user_ids': user_ids,
+        'room_ids': list(range(1, scale['rooms'] + 1)),
+        'chore_ids': [c['id'] for c in chores],
+        'trackers': len(trackers),
+        'history': len(history),
+    }
@@ -0,0 +1,85 @@
+"""Cold/warm boot time to a healthy /health endpoint.
+
+    python -m benchmarks.startup                 # single-process boot (python -m app)
+    python -m benchmarks.startup --legacy        # also time init_db + migrate_database.py + flask run
+    python -m benchmarks.startup --repeat 5
+
+"cold" boots against a database file that does not exist yet; "warm" boots again against the
+database the cold boot created, which is the normal container restart.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_healthy(port, proc, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'server exited with {proc.returncode}')
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError('server did not become healthy in time')
+
+
+def boot(db_path, legacy=False, timeout=60):
+    """Seconds from launching startup until /health answers 200."""
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path.replace('\\', '/'), FLASK_APP='app',
+               HOST='127.0.0.1', PORT=str(port), LOG_LEVEL='warning', UPLOAD_FOLDER=os.path.dirname(db_path))
+    quiet = {'cwd': ROOT, 'env': env, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+    started = time.perf_counter()
+    if legacy:
+        # What run.sh used to do: three interpreters, each building the app
+        if not os.path.exists(db_path):
+            subprocess.run([sys.executable, '-c', 'from app.database import init_db; init_db()'], check=True, **quiet)
+        subprocess.run([sys.executable, 'migrate_database.py'], check=True, **quiet)
+        cmd = [sys.executable, '-m', 'flask', 'run', '--host=127.0.0.1', f'--port={port}']
+    else:
+        cmd = [sys.executable, '-m', 'app']
+    proc = subprocess.Popen(cmd, **quiet)
+    try:
+        _wait_healthy(port, proc, timeout)
+        return time.perf_counter() - started
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time cold and warm boots to /health.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy', action='store_true', help='also time the old three-process startup')
+    args = parser.parse_args(argv)
+
+    modes = [('python -m app', False)] + ([('legacy run.sh', True)] if args.legacy else [])
+    print(f'{"startup":<16}{"cold s":>10}{"warm s":>10}')
+    for label, legacy in modes:
+        cold, warm = [], []
+        for _ in range(args.repeat):
+            db_path = os.path.join(tempfile.mkdtemp(prefix='thechores-boot-'), 'chores.db')
+            cold.append(boot(db_path, legacy))
+            warm.append(boot(db_path, legacy))
+        print(f'{label:<16}{sorted(cold)[len(cold) // 2]:>10.2f}{sorted(warm)[len(warm) // 2]:>10.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,23 +22,9 @@ REM Create data directory if it doesn't exist
 if not exist "data" mkdir data
 if not exist "data\uploads" mkdir data\uploads
 
-REM Initialize database if it doesn't exist
-if not exist "%DB_PATH%" (
-    echo [The Chores] Initializing database...
-    python -c "from app.database import init_db; init_db()"
-    if errorlevel 1 (
-        echo [The Chores] init_db failed
-        exit /b 1
-    )
-    echo [The Chores] Default login: admin / admin
-)
-
-REM Run migrations if database exists
-if exist "%DB_PATH%" (
-    echo [The Chores] Running migrations...
-    python migrate_database.py 2>nul
-)
-
-REM Run Flask application
+REM Initialize (if missing), migrate (single-row check when current) and serve in one process
+if not exist "%DB_PATH%" echo [The Chores] Initializing database... Default login: admin / admin
 echo [The Chores] Starting Flask on 0.0.0.0:5050...
-python -u -m flask run --host=0.0.0.0 --port=5050
+set HOST=0.0.0.0
+set PORT=5050
+python -u -m app
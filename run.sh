@@ -34,19 +34,11 @@ else
     _log "using local data: DB=$DB_PATH"
 fi
 
-# Initialize database if it doesn't exist
+# Initialize (if missing), migrate (single-row check when current) and serve in one process,
+# so the app is only built once per boot
 if [ ! -f "$DB_PATH" ]; then
-    _log "Initializing database..."
-    python3 -c "from app.database import init_db; init_db()" || { _log "init_db failed"; exit 1; }
-    _log "Default login: admin / admin"
+    _log "Initializing database... Default login: admin / admin"
 fi
-
-# Run migrations if database exists (adds new columns/tables)
-if [ -f "$DB_PATH" ]; then
-    _log "Running migrations..."
-    python3 migrate_database.py 2>/dev/null || true
-fi
-
-# Run Flask application
 _log "Starting Flask on 0.0.0.0:5050..."
-exec python3 -u -m flask run --host=0.0.0.0 --port=5050
+export HOST=0.0.0.0 PORT=5050
+exec python3 -u -m app
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from app.database import init_db
+from app.migrations import migrate
+from app.models import db, ArchivedRow, Notification, User
+from app import retention
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/chores.db')
+    monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    app = create_app()
+    init_db(app)
+    with app.app_context():
+        migrate()
+        yield app
+
+
+def _old_notification(user):
+    note = Notification(user_id=user.id, message='old', created_at=datetime.utcnow() - timedelta(days=365))
+    db.session.add(note)
+    db.session.commit()
+    return note.id
+
+
+def test_archived_ids_are_not_reused(app):
+    user = User.query.first()
+    first = _old_notification(user)
+    assert retention.archive()['notifications'] == 1
+
+    # The table is empty again; a new row must not take the archived row's id
+    second = _old_notification(user)
+    assert second > first
+    assert retention.archive()['notifications'] == 1
+    assert sorted(r.row_id for r in ArchivedRow.query.filter_by(table_name='notifications')) == [first, second]